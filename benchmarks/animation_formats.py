@@ -0,0 +1,47 @@
+"""
+Compare the animated output formats on the same animation.
+
+    python benchmarks/animation_formats.py
+    python benchmarks/animation_formats.py --size 1000 --frames 12 --repeat 5
+
+Uses the animation from gif_encoding.py. Formats that can't be written here (mp4
+without ffmpeg) are skipped. The legacy row is the per-frame-quantized GIF
+save_composition used to write.
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gif_encoding import make_frames, legacy_save_gif, best_time  # noqa: E402
+from src.utils.animation_encoders import save_animation, get_animation_formats  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=2000, help="Frame width and height in pixels")
+    parser.add_argument('--frames', type=int, default=8, help="Frames in the animation")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args(argv)
+
+    frames, durations = make_frames(args.size, args.frames)
+
+    print(f"{args.frames}-frame animation at {args.size}x{args.size} (best of {args.repeat})")
+    print(f"{'format':<12}{'time':>10}{'size':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'legacy.gif')
+        elapsed = best_time(lambda: legacy_save_gif(frames, durations, path), args.repeat)
+        print(f"{'legacy gif':<12}{elapsed:>9.3f}s{os.path.getsize(path) / 1024:>10.0f}KB")
+
+        for animation_format in get_animation_formats():
+            path_base = os.path.join(directory, animation_format)
+            outputs = []
+            elapsed = best_time(lambda: outputs.append(save_animation(frames, durations, path_base, animation_format)),
+                                args.repeat)
+            print(f"{animation_format:<12}{elapsed:>9.3f}s{os.path.getsize(outputs[-1]) / 1024:>10.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
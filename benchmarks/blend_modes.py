@@ -0,0 +1,117 @@
+"""
+Benchmark the NumPy blend engine against the previous PIL blend implementations.
+
+    python benchmarks/blend_modes.py
+    python benchmarks/blend_modes.py --size 1000 --layers 6 --repeat 5
+
+The legacy functions below are the apply_blend_mode implementations the engine
+replaced (ImageChops on RGBA and a per-pixel Python overlay), kept here as the
+baseline. The legacy overlay is very slow at full size; --skip-legacy-overlay
+leaves it out.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.blend_engine import BlendCanvas, BLEND_MODES  # noqa: E402
+from src.utils.image_utils import apply_blend_mode  # noqa: E402
+
+
+def legacy_apply_blend_mode(background, foreground, layer_config):
+    blend_mode = layer_config.get('blend_mode', 'normal')
+    if blend_mode == 'multiply':
+        return ImageChops.multiply(background, foreground)
+    elif blend_mode == 'screen':
+        return ImageChops.screen(background, foreground)
+    elif blend_mode == 'overlay':
+        return legacy_overlay_blend(background, foreground)
+    return Image.alpha_composite(background, foreground)
+
+
+def legacy_overlay_blend(background, foreground):
+    blended_rgb = Image.blend(background.convert('RGB'), foreground.convert('RGB'), 0.5)
+    alpha = foreground.split()[3]
+    final_data = [
+        (r, g, b, a)
+        for (r, g, b, _), a in zip(blended_rgb.convert('RGBA').getdata(), alpha.getdata())
+    ]
+    result = Image.new('RGBA', background.size)
+    result.putdata(final_data)
+    return result
+
+
+def make_layer(size, seed):
+    """Random colors under a soft-edged disc of alpha, like a typical trait layer"""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    y, x = np.ogrid[:size, :size]
+    distance = np.hypot(x - size / 2, y - size / 2) / (size / 2)
+    pixels[..., 3] = (np.clip(1.2 - distance, 0.0, 1.0) * 255).astype(np.uint8)
+    return Image.fromarray(pixels, 'RGBA')
+
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=2000, help="Layer width and height in pixels")
+    parser.add_argument('--layers', type=int, default=4, help="Layers per composition")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument('--skip-legacy-overlay', action='store_true')
+    args = parser.parse_args(argv)
+
+    background = make_layer(args.size, 0)
+    foreground = make_layer(args.size, 1)
+    layers = [make_layer(args.size, seed) for seed in range(args.layers)]
+
+    print(f"Two-layer blend at {args.size}x{args.size} (best of {args.repeat})")
+    print(f"{'mode':<12}{'legacy':>10}{'engine':>10}")
+    for mode in BLEND_MODES:
+        config = {'blend_mode': mode}
+        engine = best_time(lambda: apply_blend_mode(background, foreground, config), args.repeat)
+        if mode in ('normal', 'multiply', 'screen') or (mode == 'overlay' and not args.skip_legacy_overlay):
+            repeat = 1 if mode == 'overlay' else args.repeat
+            legacy = f"{best_time(lambda: legacy_apply_blend_mode(background, foreground, config), repeat):.3f}s"
+        else:
+            legacy = '-'
+        print(f"{mode:<12}{legacy:>10}{engine:>9.3f}s")
+
+    print(f"\n{args.layers}-layer composition at {args.size}x{args.size}")
+    for mode in ('normal', 'multiply', 'overlay'):
+        config = {'blend_mode': mode}
+
+        def legacy_compose():
+            canvas = Image.new('RGBA', background.size, (0, 0, 0, 0))
+            for layer in layers:
+                canvas = legacy_apply_blend_mode(canvas, layer, config)
+            return canvas
+
+        def engine_compose():
+            canvas = BlendCanvas(background.size)
+            for layer in layers:
+                canvas.blend(layer, mode)
+            return canvas.to_image()
+
+        engine = best_time(engine_compose, args.repeat)
+        if mode == 'overlay' and args.skip_legacy_overlay:
+            legacy = '-'
+        else:
+            legacy = f"{best_time(legacy_compose, 1 if mode == 'overlay' else args.repeat):.3f}s"
+        print(f"{mode:<12}{legacy:>10}{engine:>9.3f}s")
+
+
+if __name__ == "__main__":
+    main()
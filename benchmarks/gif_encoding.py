@@ -0,0 +1,102 @@
+"""
+Benchmark the shared-palette GIF encoder against the previous Pillow save call.
+
+    python benchmarks/gif_encoding.py
+    python benchmarks/gif_encoding.py --size 1000 --frames 12 --repeat 5
+
+The animation is a textured opaque background and body with a small sprite moving
+across it, like a typical edition with one animated trait. The legacy encoder is the
+frames[0].save(..., save_all=True, optimize=True) call save_composition used to make,
+which quantizes every frame independently.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageSequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.gif_encoder import save_gif, GIF_PRESETS  # noqa: E402
+
+
+def legacy_save_gif(frames, durations, output_path):
+    frames[0].save(
+        output_path,
+        format='GIF',
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        optimize=True
+    )
+    return output_path
+
+
+def make_frames(size, frame_count, seed=0):
+    """Gradient-and-noise background, a flat body and a sprite that moves every frame"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[:size, :size] / size
+    noise = rng.normal(0.0, 6.0, (size, size))
+    background = np.stack([x * 200 + noise, y * 180 + 40 + noise, 255 - (x + y) * 100,
+                           np.full((size, size), 255.0)], axis=-1)
+    base = Image.fromarray(background.clip(0, 255).astype(np.uint8), 'RGBA')
+    ImageDraw.Draw(base).ellipse((size * 0.2, size * 0.2, size * 0.8, size * 0.95), fill=(210, 150, 90, 255))
+
+    frames = []
+    sprite = size // 10
+    for index in range(frame_count):
+        frame = base.copy()
+        left = int((size - sprite) * index / max(1, frame_count - 1))
+        ImageDraw.Draw(frame).ellipse((left, sprite, left + sprite, sprite * 2), fill=(255, 240, 80, 255))
+        frames.append(frame)
+    return frames, [100] * frame_count
+
+
+def mean_error(path, frames):
+    """Mean absolute RGB difference between the decoded GIF and the source frames"""
+    with Image.open(path) as gif:
+        decoded = [np.asarray(frame.convert('RGB'), dtype=np.int16) for frame in ImageSequence.Iterator(gif)]
+    errors = [np.abs(output - np.asarray(frame.convert('RGB'), dtype=np.int16)).mean()
+              for output, frame in zip(decoded, frames)]
+    return sum(errors) / len(errors)
+
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=2000, help="Frame width and height in pixels")
+    parser.add_argument('--frames', type=int, default=8, help="Frames in the animation")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args(argv)
+
+    frames, durations = make_frames(args.size, args.frames)
+
+    print(f"{args.frames}-frame GIF at {args.size}x{args.size} (best of {args.repeat})")
+    print(f"{'encoder':<12}{'time':>10}{'size':>12}{'error':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        encoders = [('legacy', legacy_save_gif)]
+        for preset in GIF_PRESETS:
+            encoders.append((preset, lambda frames, durations, path, preset=preset:
+                             save_gif(frames, durations, path, preset)))
+
+        for name, encode in encoders:
+            path = os.path.join(directory, f'{name}.gif')
+            elapsed = best_time(lambda: encode(frames, durations, path), args.repeat)
+            print(f"{name:<12}{elapsed:>9.3f}s{os.path.getsize(path) / 1024:>10.0f}KB"
+                  f"{mean_error(path, frames):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Headless command-line entry point for gayy-nft-factory.
+
+Runs generation on servers without a display: PyQt6 is never imported. Every
+line written to stdout is a JSON object; library log output goes to stderr.
+
+    python cli.py PROJECT_DIR stats
+    python cli.py PROJECT_DIR generate --count 100 --workers 16
+    python cli.py PROJECT_DIR generate --all
+    python cli.py PROJECT_DIR generate --resume
+    python cli.py PROJECT_DIR preview
+    python cli.py PROJECT_DIR validate
+    python cli.py PROJECT_DIR storage --backend sqlite
+    python cli.py PROJECT_DIR storage --export project-backup.json
+"""
+import sys
+import json
+import time
+import argparse
+from contextlib import redirect_stdout
+from src.core.project_manager import ProjectManager
+from src.core.project_store import PROJECT_STORES
+from src.utils.gif_encoder import GIF_PRESETS
+from src.utils.animation_encoders import get_animation_formats
+
+
+def emit(event, **fields):
+    """Write one machine-readable JSON line to stdout"""
+    sys.__stdout__.write(json.dumps(dict(event=event, **fields)) + "\n")
+    sys.__stdout__.flush()
+
+
+def command_stats(project_manager, args):
+    stats = project_manager.get_generation_stats()
+    emit('stats', **stats)
+    return 0
+
+
+def command_generate(project_manager, args):
+    start_time = time.perf_counter()
+    if args.seed is not None:
+        project_manager.set_random_seed(args.seed)
+    # Output overrides apply to this run only; the project's saved settings are left alone
+    overrides = {'output_options': project_manager.get_output_options(animation_format=args.animation_format,
+                                                                      gif_preset=args.gif_preset),
+                 'max_loop_ms': args.max_loop_ms}
+    total = args.count
+    if args.resume:
+        batch = project_manager.get_interrupted_batch()
+        if not batch:
+            emit('generate', requested=0, generated=0, elapsed=0.0, message="No interrupted batch to resume")
+            return 0
+        total = batch['remaining']
+        if total is None:
+            total = project_manager.get_generation_stats()['remaining_unique']
+    elif args.all:
+        total = project_manager.get_generation_stats()['remaining_unique']
+        if args.count is not None:
+            total = min(total, args.count)
+
+    def on_progress(done, count, edition):
+        elapsed = time.perf_counter() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 and total else None
+        emit('progress', done=done, total=total, edition=edition,
+             elapsed=round(elapsed, 3), rate=round(rate, 4), eta=round(eta, 1) if eta is not None else None)
+
+    if args.resume:
+        generated = project_manager.resume_interrupted_batch(workers=args.workers, progress_callback=on_progress,
+                                                             **overrides)
+    elif args.all:
+        generated = project_manager.generate_all_unique_nfts(max_count=args.count, seed=args.seed,
+                                                             workers=args.workers, progress_callback=on_progress,
+                                                             **overrides)
+    else:
+        generated = project_manager.generate_batch_nfts(args.count, workers=args.workers,
+                                                        progress_callback=on_progress, **overrides)
+
+    elapsed = time.perf_counter() - start_time
+    emit('generate', requested=total, generated=generated, elapsed=round(elapsed, 3),
+         rate=round(generated / elapsed, 4) if elapsed > 0 else 0.0,
+         current_edition=project_manager.project_data['generation_state']['current_edition'],
+         last_batch=project_manager.last_batch_stats)
+    return 0 if generated == total else 1
+
+
+def command_preview(project_manager, args):
+    start_time = time.perf_counter()
+    combination, combination_key = project_manager.generate_random_combination()
+    preview_path = project_manager.generate_preview_for_combination(combination) if combination else None
+    emit('preview', path=preview_path, combination_key=combination_key,
+         elapsed=round(time.perf_counter() - start_time, 3))
+    return 0 if preview_path else 1
+
+
+def command_validate(project_manager, args):
+    valid = project_manager.validate_all_layer_files()
+    emit('validate', valid=valid)
+    return 0 if valid else 1
+
+
+def command_storage(project_manager, args):
+    ok = True
+    if args.import_path:
+        ok = project_manager.import_project_json(args.import_path) and ok
+    if args.backend:
+        ok = project_manager.set_storage_backend(args.backend) and ok
+    if args.export_path:
+        ok = project_manager.export_project_json(args.export_path) and ok
+    emit('storage', backend=project_manager.get_storage_backend(), ok=ok)
+    return 0 if ok else 1
+
+
+def command_normalize(project_manager, args):
+    if args.off or args.on:
+        project_manager.set_derived_layers(args.on)
+        project_manager.flush_project()
+    start_time = time.perf_counter()
+    normalized, failed = project_manager.normalize_all_layers(args.profiles)
+    emit('normalize', enabled=project_manager.get_derived_layer_dir() is not None, normalized=normalized,
+         failed=failed, elapsed=round(time.perf_counter() - start_time, 3))
+    return 0 if not failed else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless batch generation for gayy-nft-factory projects")
+    parser.add_argument('project', help="Project directory (containing config/project.json or project.sqlite)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('stats', help="Print generation statistics")
+
+    generate = subparsers.add_parser('generate', help="Generate NFTs")
+    generate.add_argument('--count', type=int, help="Number of editions to generate")
+    generate.add_argument('--all', action='store_true', help="Generate all remaining unique combinations")
+    generate.add_argument('--workers', type=int, help="Render processes (default: project setting or CPU count)")
+    generate.add_argument('--seed', type=int, help="Seed for reproducible combination draws and --all order")
+    generate.add_argument('--resume', action='store_true', help="Continue a batch interrupted by a crash")
+    generate.add_argument('--gif-preset', choices=sorted(GIF_PRESETS),
+                          help="GIF encoder speed/quality preset for animated editions (this run only)")
+    generate.add_argument('--animation-format', choices=get_animation_formats(available_only=False),
+                          help="Output format of animated editions for this run (mp4 needs ffmpeg on the PATH)")
+    generate.add_argument('--max-loop-ms', type=int,
+                          help="Longest loop (ms) of an animated edition before layers stop being kept in sync "
+                               "(this run only)")
+
+    subparsers.add_parser('preview', help="Render a preview of a random combination")
+    subparsers.add_parser('validate', help="Check that all layer files exist and are readable")
+
+    storage = subparsers.add_parser('storage', help="Switch the project store or import/export project.json")
+    storage.add_argument('--backend', choices=sorted(PROJECT_STORES), help="Move the project to this store")
+    storage.add_argument('--import', dest='import_path', metavar='PATH',
+                         help="Replace settings, artists and layers with a project.json file")
+    storage.add_argument('--export', dest='export_path', metavar='PATH',
+                         help="Write settings, artists and layers to a project.json file")
+
+    normalize = subparsers.add_parser('normalize', help="Pre-resize layers into workspace/derived for fast loading")
+    normalize.add_argument('--profiles', nargs='+', default=['final', 'preview'],
+                           help="Render profiles to normalize for (default: final preview)")
+    switch = normalize.add_mutually_exclusive_group()
+    switch.add_argument('--on', action='store_true', help="Use normalized layers for this project (the default)")
+    switch.add_argument('--off', action='store_true', help="Stop using normalized layers for this project")
+    return parser
+
+
+COMMANDS = {
+    'stats': command_stats,
+    'generate': command_generate,
+    'preview': command_preview,
+    'validate': command_validate,
+    'storage': command_storage,
+    'normalize': command_normalize,
+}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'generate' and args.count is None and not args.all and not args.resume:
+        parser.error("generate needs --count N, --all or --resume")
+    if args.command == 'generate' and args.max_loop_ms is not None and args.max_loop_ms <= 0:
+        parser.error("--max-loop-ms must be positive")
+
+    # Keep stdout machine-readable: library progress prints go to stderr
+    with redirect_stdout(sys.stderr):
+        project_manager = ProjectManager()
+        load_start = time.perf_counter()
+        if not project_manager.load_project(args.project):
+            emit('error', message=f"Failed to load project at {args.project}")
+            return 1
+        emit('loaded', project=args.project, elapsed=round(time.perf_counter() - load_start, 3))
+
+        try:
+            return COMMANDS[args.command](project_manager, args)
+        finally:
+            project_manager.close_project()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from ..utils.file_utils import ensure_directory, file_sha256
+from ..utils.image_utils import (compose_with_prefix_cache, composition_trie_path, composition_palette_key,
+                                 save_composition, get_poster_path, configure_layer_cache, configure_prefix_cache,
+                                 clear_prefix_cache, configure_derived_layers,
+                                 RenderCancelled, DEFAULT_LAYER_CACHE_MB, DEFAULT_PREFIX_CACHE_MB)
+from ..utils.animation_timeline import DEFAULT_MAX_LOOP_MS
+
+# Size of a promoted BlendCanvas pixel: four float32 planes
+FLOAT_CANVAS_BYTES_PER_PIXEL = 16
+
+# Cancellation flag shared with the render workers, set up by _init_worker
+_cancel_event = None
+
+# Render processes are started from a fresh server process (or spawned) rather than forked:
+# batches start while GUI threads (previews, thumbnail loaders, the save timer) may hold
+# locks that a forked child would inherit held and wait on forever
+_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def _init_worker(cancel_event, layer_cache_mb, prefix_cache_mb, derived_layer_dir):
+    """
+    Render worker initializer: install the shared cancel flag, size the caches and point
+    the worker at the project's normalized layers, whose mapped pages all workers share
+    """
+    global _cancel_event
+    _cancel_event = cancel_event
+    if layer_cache_mb is not None:
+        configure_layer_cache(layer_cache_mb)
+    configure_prefix_cache(prefix_cache_mb)
+    configure_derived_layers(derived_layer_dir)
+
+
+def _worker_cancelled():
+    return _cancel_event is not None and _cancel_event.is_set()
+
+
+def render_editions(jobs, size, output_options, max_loop_ms=DEFAULT_MAX_LOOP_MS):
+    """
+    Compose and encode a run of editions in order at size x size (runs in a render worker)
+    jobs is a list of (layer_composition, output_base, share_depth) in trie order, so each
+    edition can start from the cached composite of the bottom layers it shares with the
+    previous ones; max_loop_ms caps the loop of animated editions and output_options are
+    passed on to save_composition along with each edition's palette key.
+    Returns (results, error): one (image path, SHA-256 checksum, reused layer count) per
+    edition rendered before the run was cancelled or failed, and the error message of the
+    edition that failed, if any
+    """
+    results = []
+    for layer_composition, output_base, share_depth in jobs:
+        try:
+            result, reused = compose_with_prefix_cache(layer_composition, share_depth,
+                                                       cancel_check=_worker_cancelled, size=size,
+                                                       max_loop_ms=max_loop_ms)
+            if _worker_cancelled():
+                raise RenderCancelled()
+            # Editions repeating a trait set reuse its GIF palette
+            nft_path = save_composition(result, output_base, palette_key=composition_palette_key(layer_composition),
+                                        **output_options)
+            results.append((nft_path, file_sha256(nft_path), reused))
+        except RenderCancelled:
+            break
+        except Exception as e:
+            return results, str(e)
+    return results, None
+
+
+def plan_render_order(layer_compositions):
+    """
+    Order compositions along a trie of their z-sorted layers
+    Returns (position, share_depth) pairs in render order; share_depth is the number of
+    bottom layers the composition shares with the next one, i.e. the prefixes worth caching
+    """
+    paths = [composition_trie_path(layer_composition) for layer_composition in layer_compositions]
+    order = sorted(range(len(paths)), key=lambda position: paths[position])
+
+    plan = []
+    for rank, position in enumerate(order):
+        share_depth = 0
+        if rank + 1 < len(order):
+            path, next_path = paths[position], paths[order[rank + 1]]
+            while share_depth < min(len(path), len(next_path)) and path[share_depth] == next_path[share_depth]:
+                share_depth += 1
+        plan.append((position, share_depth))
+    return plan
+
+
+class BatchRenderer:
+    """
+    Render a batch of editions in parallel.
+    The parent process picks combinations and assigns edition numbers in order, a pool
+    of workers composes and writes the image files, and the parent commits metadata
+    and generation state strictly in edition order as results come back.
+
+    Editions are planned in windows: a window's combinations get their edition numbers in
+    the order they were picked, but are rendered in trie order of their z-sorted layers and
+    handed to workers in runs, so editions sharing a background and body reuse that partial
+    composite and only pay for their top layers (see render_editions). An edition is only
+    committed once every lower-numbered one is, so a window spans one run per worker: larger
+    ones would keep most of their finished editions uncommitted until the whole window is
+    done, and a crash or cancel discards those.
+    """
+
+    # Most editions planned (and trie-ordered) at a time, and editions per worker task
+    PLAN_WINDOW = 256
+    RUN_SIZE = 16
+
+    def __init__(self, project_manager, workers=1):
+        self.project_manager = project_manager
+        self.workers = max(1, workers)
+        self.plan_window = min(self.PLAN_WINDOW, self.workers * self.RUN_SIZE)
+        self.stats = {'editions': 0, 'layers': 0, 'reused_layers': 0, 'reuse_ratio': 0.0}
+
+        # A single worker renders on a thread in this process and shares its layer cache
+        if self.workers > 1:
+            self._cancel_event = _MP_CONTEXT.Event()
+        else:
+            self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Request cancellation; in-flight renders stop at their next layer or frame"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _create_executor(self):
+        settings = self.project_manager.project_data['generation_settings']
+        prefix_cache_mb = settings.get('prefix_cache_mb', DEFAULT_PREFIX_CACHE_MB)
+        derived_layer_dir = self.project_manager.get_derived_layer_dir()
+        if self.workers == 1:
+            return ThreadPoolExecutor(max_workers=1, initializer=_init_worker,
+                                      initargs=(self._cancel_event, None, prefix_cache_mb, derived_layer_dir))
+
+        # Split the project's cache budgets between the worker processes. The layer cache floor
+        # keeps a few layers per worker without many workers adding up to far more than the
+        # budget. The prefix cache floor is two final-size float canvases (what a prefix becomes
+        # once a layer has opacity below 1 or a blend mode); below that, prefix reuse stops, so
+        # with many workers prefix caches may use more than prefix_cache_mb in total
+        cache_mb = max(32, settings.get('layer_cache_mb', DEFAULT_LAYER_CACHE_MB) // self.workers)
+        output_size = self.project_manager.get_render_size('final')
+        min_prefix_cache_mb = -(-2 * output_size * output_size * FLOAT_CANVAS_BYTES_PER_PIXEL // (1024 * 1024))
+        prefix_cache_mb = max(min_prefix_cache_mb, prefix_cache_mb // self.workers)
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=_MP_CONTEXT, initializer=_init_worker,
+                                   initargs=(self._cancel_event, cache_mb, prefix_cache_mb, derived_layer_dir))
+
+    def _next_combination(self, combinations, reserved_keys):
+        if combinations is None:
+            return self.project_manager.select_random_combination(reserved_keys)
+
+        for combination, combination_key in combinations:
+            if combination_key not in reserved_keys:
+                return combination, combination_key
+        return None, None
+
+    def _record_reuse(self, layer_count, reused):
+        stats = self.stats
+        stats['editions'] += 1
+        stats['layers'] += layer_count
+        stats['reused_layers'] += reused
+        stats['reuse_ratio'] = stats['reused_layers'] / stats['layers'] if stats['layers'] else 0.0
+
+    def run(self, count=None, combinations=None, progress_callback=None, should_cancel=None,
+            mode='random', resume_batch_id=None, output_options=None, max_loop_ms=None):
+        """
+        Render up to count editions (all of combinations when count is None)
+        Combinations are drawn at random unless an iterator of (combination, key) is given.
+        The batch is bracketed in the generation journal; pass resume_batch_id to continue
+        an interrupted one. output_options and max_loop_ms default to the project's settings.
+        Returns the number of editions committed.
+        """
+        pm = self.project_manager
+        ensure_uniqueness = pm.project_data['generation_settings'].get('ensure_uniqueness', True)
+        start_edition = pm.project_data['generation_state']['current_edition'] + 1
+        output_size = pm.get_render_size('final')
+        if output_options is None:
+            output_options = pm.get_output_options()
+        if max_loop_ms is None:
+            max_loop_ms = pm.get_max_loop_ms()
+        ensure_directory(os.path.dirname(pm.get_edition_path_base(start_edition)))
+
+        # A new batch supersedes one left unfinished by a crash
+        interrupted = pm.get_interrupted_batch()
+        if interrupted and interrupted['batch_id'] != resume_batch_id:
+            pm.journal.end_batch(interrupted['batch_id'], interrupted['committed'], 'abandoned')
+        pm.interrupted_batch = None
+        batch_id = pm.journal.begin_batch(count, mode, start_edition, resumes=resume_batch_id)
+
+        reserved_keys = set()
+        planned = {}  # edition -> (combination_key, layer_composition)
+        runs = deque()  # Planned runs of (edition, share_depth) in render order, not yet submitted
+        completed = {}  # edition -> (image path, checksum, reused layers), waiting for earlier editions
+        pending = {}  # future -> editions of its run
+        next_edition = start_edition
+        next_commit = start_edition
+        exhausted = False
+        failed = False
+        success_count = 0
+
+        # Keep every worker busy with one queued run behind the one it is rendering
+        max_in_flight = self.workers * 2
+
+        with self._create_executor() as executor:
+            while True:
+                if should_cancel is not None and should_cancel():
+                    self.cancel()
+
+                halted = failed or self.is_cancelled()
+                if not halted and not exhausted and not runs:
+                    # Plan the next window: number editions in pick order, render in trie order
+                    window = []
+                    while len(window) < self.plan_window:
+                        if count is not None and next_edition - start_edition >= count:
+                            exhausted = True
+                            break
+
+                        combination, combination_key = self._next_combination(combinations, reserved_keys)
+                        if combination is None:
+                            exhausted = True
+                            break
+
+                        if ensure_uniqueness:
+                            reserved_keys.add(combination_key)
+                        planned[next_edition] = (combination_key, pm.build_layer_composition(combination))
+                        window.append(next_edition)
+                        next_edition += 1
+
+                    # Split the window evenly so a short one still keeps every worker busy
+                    order = plan_render_order([planned[edition][1] for edition in window])
+                    run_size = max(1, min(self.RUN_SIZE, -(-len(order) // self.workers)))
+                    for run_start in range(0, len(order), run_size):
+                        runs.append([(window[position], share_depth)
+                                     for position, share_depth in order[run_start:run_start + run_size]])
+
+                while not halted and runs and len(pending) < max_in_flight:
+                    run = runs.popleft()
+                    jobs = []
+                    for edition, share_depth in run:
+                        layer_composition = planned[edition][1]
+                        print(f"Generating NFT #{edition} with {len(layer_composition)} layers...")
+                        jobs.append((layer_composition, pm.get_edition_path_base(edition), share_depth))
+                    future = executor.submit(render_editions, jobs, output_size, output_options, max_loop_ms)
+                    pending[future] = [edition for edition, _ in run]
+
+                if self.is_cancelled():
+                    for future in list(pending):
+                        if future.cancel():
+                            del pending[future]
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    editions = pending.pop(future)
+                    try:
+                        results, error = future.result()
+                    except RenderCancelled:
+                        continue
+                    except Exception as e:
+                        results, error = [], str(e)
+                    completed.update(zip(editions, results))
+                    if error is not None:
+                        print(f"Error rendering NFT #{editions[len(results)]}: {error}")
+                        failed = True
+
+                # Commit the contiguous run of finished editions
+                while next_commit in completed:
+                    combination_key, layer_composition = planned.pop(next_commit)
+                    nft_path, checksum, reused = completed.pop(next_commit)
+                    pm.commit_edition(next_commit, combination_key, layer_composition, nft_path,
+                                      checksum=checksum, batch_id=batch_id)
+                    self._record_reuse(len(layer_composition), reused)
+                    success_count += 1
+                    if progress_callback is not None:
+                        progress_callback(success_count, count, next_commit)
+                    next_commit += 1
+
+        if self.workers == 1:
+            clear_prefix_cache()
+
+        if failed:
+            status = 'failed'
+        elif self.is_cancelled():
+            status = 'cancelled'
+        else:
+            status = 'complete'
+        pm.journal.end_batch(batch_id, success_count, status)
+
+        # Batch boundary: persist the generation state of everything committed above
+        pm.save_project()
+
+        # Outputs rendered after a failed or cancelled edition are never committed
+        for nft_path, _, _ in completed.values():
+            for path in {nft_path, get_poster_path(nft_path)}:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        return success_count
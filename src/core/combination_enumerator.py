@@ -0,0 +1,77 @@
+import random
+
+
+class CombinationEnumerator:
+    """
+    Walk every combination of per-artist layer choices exactly once.
+    A combination index is a mixed-radix number whose digits are the chosen layer
+    index for each artist, so the whole space is range(size). With shuffle enabled
+    the indices are visited in a seeded pseudo-random order without materializing it.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, radices, shuffle=False, seed=None):
+        self.radices = list(radices)
+        self.size = 1 if self.radices else 0
+        for radix in self.radices:
+            self.size *= radix
+
+        self.shuffle = shuffle
+        rng = random.Random(seed)
+
+        # Balanced Feistel network over the smallest even-bit domain covering size
+        bits = max(self.size - 1, 1).bit_length()
+        self._half_bits = (bits + 1) // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        self._round_keys = [rng.getrandbits(32) for _ in range(self.ROUNDS)]
+
+    def decode(self, index):
+        """Convert a combination index into per-artist layer indices"""
+        digits = []
+        for radix in reversed(self.radices):
+            index, digit = divmod(index, radix)
+            digits.append(digit)
+        digits.reverse()
+        return digits
+
+    def encode(self, digits):
+        """Convert per-artist layer indices into a combination index"""
+        index = 0
+        for digit, radix in zip(digits, self.radices):
+            index = index * radix + digit
+        return index
+
+    def permute(self, index):
+        """Map an index to its position in the visiting order (a bijection on range(size))"""
+        if not self.shuffle:
+            return index
+
+        # Cycle-walk until the Feistel output lands back inside the space
+        value = self._feistel(index)
+        while value >= self.size:
+            value = self._feistel(value)
+        return value
+
+    def _feistel(self, value):
+        left = value >> self._half_bits
+        right = value & self._half_mask
+        for key in self._round_keys:
+            mixed = (right * 0x9E3779B1 + key) & 0xFFFFFFFF
+            mixed ^= mixed >> 15
+            mixed = (mixed * 0x85EBCA6B) & 0xFFFFFFFF
+            mixed ^= mixed >> 13
+            left, right = right, left ^ (mixed & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def iter_indices(self):
+        """Yield every combination index in visiting order"""
+        for position in range(self.size):
+            yield self.permute(position)
+
+    def __iter__(self):
+        for index in self.iter_indices():
+            yield self.decode(index)
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import struct
+import hashlib
+from array import array
+from ..utils.file_utils import write_file_atomic
+
+
+class CombinationIndex:
+    """
+    Set of generated combinations stored as integers.
+    A combination is encoded as the mixed-radix number of its per-artist layer indices
+    (the same numbering CombinationEnumerator walks). Small spaces use a bitset with one
+    bit per possible combination, larger ones a set of ints. Text keys are only parsed
+    when rebuilding from the journal; the index is tied to a layer layout and has to be
+    rebuilt when layers are added or removed.
+    """
+
+    FILE_NAME = 'combination_index.bin'
+    MAGIC = b'NFTCIDX1'
+    BITSET_MAX_SIZE = 1 << 27  # 16MB of bits
+
+    def __init__(self, artists_with_layers):
+        self.artists_with_layers = artists_with_layers
+        self.radices = [len(layers) for _, layers in artists_with_layers]
+        self.size = 1 if self.radices else 0
+        for radix in self.radices:
+            self.size *= radix
+
+        # "artist:file" key part -> (artist position, layer index)
+        self._parts = {}
+        for position, (artist_name, layers) in enumerate(artists_with_layers):
+            for layer_idx, layer in enumerate(layers):
+                self._parts[f"{artist_name}:{layer['file_name']}"] = (position, layer_idx)
+
+        layout = [[artist_name, [layer['file_name'] for layer in layers]] for artist_name, layers in artists_with_layers]
+        self.signature = hashlib.sha1(json.dumps(layout).encode('utf-8')).hexdigest()
+
+        self._count = 0
+        if self.size <= self.BITSET_MAX_SIZE:
+            self._bits = bytearray((self.size + 7) // 8)
+            self._codes = None
+        else:
+            self._bits = None
+            self._codes = set()
+
+    def encode(self, layer_indices):
+        """Convert one layer index per artist into the combination's integer code"""
+        code = 0
+        for digit, radix in zip(layer_indices, self.radices):
+            code = code * radix + digit
+        return code
+
+    def encode_key(self, combination_key):
+        """Convert a text combination key into its code, or None if it is not in this layout"""
+        digits = [None] * len(self.radices)
+        for part in combination_key.split('|'):
+            location = self._parts.get(part)
+            if location is None or digits[location[0]] is not None:
+                return None
+            digits[location[0]] = location[1]
+        if None in digits:
+            return None
+        return self.encode(digits)
+
+    def add(self, code):
+        """Add a code; returns True if it was not present yet"""
+        if self._bits is not None:
+            byte, bit = code >> 3, 1 << (code & 7)
+            if self._bits[byte] & bit:
+                return False
+            self._bits[byte] |= bit
+        else:
+            if code in self._codes:
+                return False
+            self._codes.add(code)
+        self._count += 1
+        return True
+
+    def add_key(self, combination_key):
+        """Add a text combination key; keys from another layout are ignored"""
+        code = self.encode_key(combination_key)
+        return code is not None and self.add(code)
+
+    def __contains__(self, code):
+        if self._bits is not None:
+            return bool(self._bits[code >> 3] & (1 << (code & 7)))
+        return code in self._codes
+
+    def __len__(self):
+        return self._count
+
+    def _code_width(self):
+        return max(1, ((max(self.size - 1, 1)).bit_length() + 7) // 8)
+
+    def save(self, path, checkpoint):
+        """
+        Write the index to a binary sidecar file
+        checkpoint is the journal replay state (see GenerationJournal.replay) the index reflects
+        """
+        if self._bits is not None:
+            kind = 'bitset'
+            payload = bytes(self._bits)
+        else:
+            kind = 'codes'
+            width = self._code_width()
+            if width <= 8:
+                codes = array('Q', sorted(self._codes))
+                if sys.byteorder != 'little':
+                    codes.byteswap()
+                payload = codes.tobytes()
+            else:
+                payload = b''.join(code.to_bytes(width, 'little') for code in sorted(self._codes))
+
+        header = json.dumps({'signature': self.signature, 'kind': kind, 'count': self._count,
+                             'checkpoint': checkpoint}).encode('utf-8')
+        write_file_atomic(path, self.MAGIC + struct.pack('<I', len(header)) + header + payload)
+
+    @classmethod
+    def load(cls, path, artists_with_layers):
+        """
+        Read a sidecar written by save for the same layer layout
+        Returns (index, checkpoint), or (None, None) if it is missing, stale or damaged
+        """
+        if not os.path.exists(path):
+            return None, None
+
+        index = cls(artists_with_layers)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(cls.MAGIC):
+                return None, None
+            offset = len(cls.MAGIC)
+            (header_size,) = struct.unpack_from('<I', data, offset)
+            offset += 4
+            header = json.loads(data[offset:offset + header_size].decode('utf-8'))
+            payload = memoryview(data)[offset + header_size:]
+
+            if header.get('signature') != index.signature:
+                return None, None
+
+            if header['kind'] == 'bitset':
+                if index._bits is None or len(payload) != len(index._bits):
+                    return None, None
+                index._bits[:] = payload
+            else:
+                if index._codes is None:
+                    return None, None
+                width = index._code_width()
+                if width <= 8:
+                    codes = array('Q')
+                    codes.frombytes(payload)
+                    if sys.byteorder != 'little':
+                        codes.byteswap()
+                    index._codes = set(codes)
+                else:
+                    index._codes = {int.from_bytes(payload[i:i + width], 'little')
+                                    for i in range(0, len(payload), width)}
+            index._count = header['count']
+            return index, header['checkpoint']
+        except (OSError, ValueError, KeyError, struct.error):
+            return None, None
@@ -0,0 +1,169 @@
+import os
+import json
+import sqlite3
+import threading
+
+
+class EditionIndex:
+    """
+    SQLite index of generated editions (workspace/edition_index.sqlite).
+    One row per committed edition: its image and metadata file names, combination key,
+    image size in bytes and metadata document (name and traits), so listing, paging and
+    finding the latest edition never touch the generated folder. The index is derived from
+    the journal: editions are added as they are committed, and sync() catches up on
+    commits appended since it last ran, so a missing or damaged file is simply rebuilt.
+    Safe to use from several threads.
+    """
+
+    FILE_NAME = 'edition_index.sqlite'
+    SCHEMA_VERSION = 1
+
+    def __init__(self, project_path):
+        self.generated_dir = os.path.join(project_path, 'workspace', 'generated')
+        self.path = os.path.join(project_path, 'workspace', self.FILE_NAME)
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def open(self):
+        """Open (or create) the index file, starting over if it is damaged or from another version"""
+        try:
+            self._connection = self._connect()
+        except sqlite3.DatabaseError as e:
+            print(f"Rebuilding edition index: {e}")
+            self.close()
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+            self._connection = self._connect()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            # Losing the last few commits to a crash is fine: sync() re-adds them from the journal
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if connection.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                connection.executescript(f"""
+                    DROP TABLE IF EXISTS editions;
+                    DROP TABLE IF EXISTS state;
+                    CREATE TABLE editions (
+                        edition INTEGER PRIMARY KEY,
+                        image TEXT NOT NULL,
+                        metadata_file TEXT NOT NULL,
+                        combination_key TEXT,
+                        file_size INTEGER,
+                        metadata TEXT NOT NULL
+                    );
+                    CREATE TABLE state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                    PRAGMA user_version = {self.SCHEMA_VERSION};
+                """)
+            return connection
+        except sqlite3.DatabaseError:
+            connection.close()
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def add(self, edition, combination_key, image_path, metadata_path, metadata):
+        """Index a committed edition (replacing any earlier row for the same number)"""
+        with self._lock:
+            if self._connection is None:
+                return
+            self._insert(edition, combination_key, image_path, metadata_path, metadata)
+            self._connection.commit()
+
+    def _insert(self, edition, combination_key, image_path, metadata_path, metadata):
+        try:
+            file_size = os.path.getsize(image_path)
+        except OSError:
+            file_size = None
+        self._connection.execute(
+            'INSERT OR REPLACE INTO editions VALUES (?, ?, ?, ?, ?, ?)',
+            (edition, os.path.basename(image_path), os.path.basename(metadata_path), combination_key, file_size,
+             json.dumps(metadata, separators=(',', ':'))))
+
+    def sync(self, journal):
+        """
+        Index the journal commits appended since the last sync
+        Commits already indexed by add() are skipped without reading their files; the index
+        starts over if the journal is shorter than the offset it was synced to.
+        """
+        with self._lock:
+            if self._connection is None:
+                return
+            row = self._connection.execute("SELECT value FROM state WHERE key = 'journal_offset'").fetchone()
+            offset = row[0] if row else 0
+            journal_size = os.path.getsize(journal.path) if journal.exists() else 0
+            if offset > journal_size:
+                self._connection.execute('DELETE FROM editions')
+                offset = 0
+
+            indexed = 0
+            for record, offset in journal.iter_records(offset):
+                if record.get('op') != 'commit' or self._get(record['edition']) is not None:
+                    continue
+                image_path = os.path.join(self.generated_dir, record['image'])
+                metadata_path = os.path.join(self.generated_dir, record['metadata'])
+                try:
+                    with open(metadata_path, 'r') as f:
+                        metadata = json.load(f)
+                except Exception as e:
+                    print(f"Error loading metadata for {record['edition']}: {e}")
+                    continue
+                self._insert(record['edition'], record.get('key'), image_path, metadata_path, metadata)
+                indexed += 1
+
+            self._connection.execute("INSERT OR REPLACE INTO state VALUES ('journal_offset', ?)", (offset,))
+            self._connection.commit()
+            if indexed:
+                print(f"Indexed {indexed} editions from the generation journal")
+
+    def _get(self, edition):
+        return self._connection.execute('SELECT * FROM editions WHERE edition = ?', (edition,)).fetchone()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            if self._connection is None:
+                return []
+            return [self._row_to_entry(row) for row in self._connection.execute(sql, parameters)]
+
+    @staticmethod
+    def _row_to_entry(row):
+        edition, image, metadata_file, combination_key, file_size, metadata = row
+        return {'edition': edition, 'image': image, 'metadata_file': metadata_file,
+                'combination_key': combination_key, 'file_size': file_size, 'metadata': json.loads(metadata)}
+
+    def get(self, edition):
+        """Entry (dict of the row's columns, metadata decoded) of an edition, or None"""
+        entries = self._query('SELECT * FROM editions WHERE edition = ?', (edition,))
+        return entries[0] if entries else None
+
+    def latest(self):
+        """Entry of the highest-numbered edition, or None"""
+        entries = self._query('SELECT * FROM editions ORDER BY edition DESC LIMIT 1')
+        return entries[0] if entries else None
+
+    def page(self, offset=0, limit=100):
+        """Entries of up to limit editions in edition order, skipping the first offset"""
+        return self._query('SELECT * FROM editions ORDER BY edition LIMIT ? OFFSET ?', (limit, offset))
+
+    def page_after(self, edition, limit=100):
+        """Entries of up to limit editions numbered after edition (cheap at any depth, unlike an offset)"""
+        return self._query('SELECT * FROM editions WHERE edition > ? ORDER BY edition LIMIT ?', (edition, limit))
+
+    def editions(self):
+        """All indexed edition numbers in order"""
+        with self._lock:
+            if self._connection is None:
+                return []
+            return [row[0] for row in self._connection.execute('SELECT edition FROM editions ORDER BY edition')]
+
+    def __len__(self):
+        with self._lock:
+            if self._connection is None:
+                return 0
+            return self._connection.execute('SELECT COUNT(*) FROM editions').fetchone()[0]
@@ -0,0 +1,138 @@
+import os
+import json
+import uuid
+from datetime import datetime
+
+
+class GenerationJournal:
+    """
+    Append-only record of generation progress (workspace/generation_journal.jsonl).
+    An edition counts as generated once its 'commit' line is durably appended, so the
+    journal is the single source of truth for generated combinations and edition numbers.
+    Batches are bracketed by 'batch' / 'batch_end' lines so an interrupted run can resume.
+    """
+
+    FILE_NAME = 'generation_journal.jsonl'
+
+    def __init__(self, project_path):
+        self.path = os.path.join(project_path, 'workspace', self.FILE_NAME)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, record):
+        """Durably append one record"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Durably append several records with a single fsync"""
+        ts = datetime.now().isoformat()
+        with open(self.path, 'a') as f:
+            for record in records:
+                f.write(json.dumps(dict(record, ts=ts), separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def repair(self):
+        """Truncate a torn final line left by a crash so new records start on a clean line"""
+        if not self.exists():
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            tail_size = min(size, 64 * 1024)
+            f.seek(size - tail_size)
+            tail = f.read(tail_size)
+            if not tail or tail.endswith(b'\n'):
+                return
+            f.truncate(size - tail_size + tail.rfind(b'\n') + 1)
+
+    def iter_records(self, offset=0):
+        """
+        Stream (record, end_offset) pairs in order starting at byte offset, ignoring a torn
+        final line left by a crash
+        """
+        if not self.exists():
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                yield record, offset
+
+    def begin_batch(self, target, mode, start_edition, resumes=None):
+        """Record the start of a batch and return its id"""
+        batch_id = resumes or uuid.uuid4().hex[:12]
+        self.append({'op': 'batch', 'batch_id': batch_id, 'target': target, 'mode': mode,
+                     'start_edition': start_edition, 'resumed': resumes is not None})
+        return batch_id
+
+    def end_batch(self, batch_id, committed, status):
+        self.append({'op': 'batch_end', 'batch_id': batch_id, 'committed': committed, 'status': status})
+
+    def commit(self, edition, combination_key, image_path, metadata_path, checksum, batch_id=None, unique=True):
+        """Record a fully written edition; unique=False editions do not reserve their combination"""
+        self.append(self.commit_record(edition, combination_key, image_path, metadata_path, checksum,
+                                       batch_id, unique))
+
+    @staticmethod
+    def commit_record(edition, combination_key, image_path, metadata_path, checksum, batch_id=None, unique=True):
+        return {'op': 'commit', 'edition': edition, 'key': combination_key, 'unique': unique,
+                'image': os.path.basename(image_path), 'metadata': os.path.basename(metadata_path),
+                'sha256': checksum, 'batch_id': batch_id}
+
+    def replay(self, checkpoint=None, on_key=None):
+        """
+        Rebuild generation state in one streaming pass
+        Returns the highest committed edition, the number of commits, the last batch that
+        never reached its 'batch_end' (or None), and a checkpoint of that state at the end of
+        the journal. Passing an earlier checkpoint replays only the records appended since.
+        on_key(combination_key) is called for every commit that reserves its combination.
+        """
+        checkpoint = checkpoint or {}
+        offset = checkpoint.get('offset', 0)
+        current_edition = checkpoint.get('current_edition', 0)
+        generated_count = checkpoint.get('generated_count', 0)
+        open_batches = {batch['batch_id']: dict(batch) for batch in checkpoint.get('open_batches', [])}
+        last_open_batch = open_batches.get(checkpoint.get('last_open_batch'))
+
+        for record, offset in self.iter_records(offset):
+            op = record.get('op')
+            if op == 'commit':
+                if on_key is not None and record.get('key') and record.get('unique', True):
+                    on_key(record['key'])
+                current_edition = max(current_edition, record['edition'])
+                generated_count += 1
+                batch = open_batches.get(record.get('batch_id'))
+                if batch is not None:
+                    batch['committed'] += 1
+            elif op == 'batch':
+                batch = open_batches.get(record['batch_id'])
+                if batch is None:
+                    batch = {'batch_id': record['batch_id'], 'target': record.get('target'),
+                             'mode': record.get('mode'), 'committed': 0}
+                    open_batches[record['batch_id']] = batch
+                last_open_batch = batch
+            elif op == 'batch_end':
+                batch = open_batches.pop(record['batch_id'], None)
+                if batch is last_open_batch:
+                    last_open_batch = None
+
+        return {
+            'current_edition': current_edition,
+            'generated_count': generated_count,
+            'interrupted_batch': dict(last_open_batch) if last_open_batch else None,
+            'checkpoint': {
+                'offset': offset,
+                'current_edition': current_edition,
+                'generated_count': generated_count,
+                'open_batches': [dict(batch) for batch in open_batches.values()],
+                'last_open_batch': last_open_batch['batch_id'] if last_open_batch else None
+            }
+        }
@@ -0,0 +1,135 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from PIL import Image
+from ..utils.file_utils import file_sha256
+from ..utils.image_utils import normalize_layer
+
+# Threads validating, hashing and copying layer files; the work is mostly file I/O and
+# hashing, which release the GIL
+LAYER_IMPORT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+# Longest wait (seconds) between progress callbacks while an import runs
+PROGRESS_INTERVAL = 0.1
+
+
+def inspect_layer_file(file_path):
+    """Check that a file is a readable image and hash it; returns (sha256, error message or None)"""
+    try:
+        with Image.open(file_path) as img:
+            img.verify()  # Verify it's a valid image
+        return file_sha256(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def hash_layer_files(file_paths, max_workers=LAYER_IMPORT_WORKERS):
+    """SHA-256 of each file, in order, hashed in a thread pool"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(file_sha256, file_paths))
+
+
+def unique_layer_file_name(file_name, taken_names):
+    """file_name, or file_name with a _2, _3, ... suffix if it is already taken"""
+    base_name, extension = os.path.splitext(file_name)
+    candidate = file_name
+    counter = 1
+    while candidate in taken_names:
+        counter += 1
+        candidate = f"{base_name}_{counter}{extension}"
+    return candidate
+
+
+def copy_layer_file(source_path, file_path, normalize_size=None):
+    """Copy a layer file into the project, then normalize the copy for normalize_size renders if given"""
+    shutil.copy2(source_path, file_path)
+    if normalize_size is not None:
+        normalize_layer(file_path, normalize_size)
+
+
+def import_layer_files(source_paths, artist_dir, known_hashes, taken_names, progress_callback=None,
+                       max_workers=LAYER_IMPORT_WORKERS, normalize_size=None, should_cancel=None):
+    """
+    Validate, hash and copy layer files into artist_dir using a thread pool
+    Files whose content hash is in known_hashes (or repeats an earlier file of the batch) are
+    skipped; copies that would overwrite a name in taken_names get a numbered name instead.
+    With normalize_size, each copy is also normalized for that render size (see normalize_layer);
+    a layer that can't be normalized is still imported.
+    progress_callback(done, total) is called from the calling thread as files finish (copied
+    and normalized, or skipped) and at least every PROGRESS_INTERVAL seconds in between;
+    should_cancel() is polled as often, and once it returns True files not yet being
+    copied are left out.
+    Returns one result per source, in order: a dict with source, status ('added',
+    'duplicate', 'failed' or 'cancelled'), file_name, file_path and sha256 of the copy,
+    and a message.
+    """
+    known_hashes = dict(known_hashes)
+    taken_names = set(taken_names)
+    results = [{'source': source_path, 'status': 'cancelled', 'file_name': None, 'file_path': None,
+                'sha256': None, 'message': "Import cancelled"} for source_path in source_paths]
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        inspections = {executor.submit(inspect_layer_file, source_path): index
+                       for index, source_path in enumerate(source_paths)}
+        copies = {}  # copy future -> index
+        inspected = {}  # index -> (sha256, error), until its turn to be named
+        next_index = 0  # Names and duplicates are decided in source order
+        pending = set(inspections)
+        while pending:
+            if should_cancel is not None and should_cancel():
+                for future in pending:
+                    future.cancel()
+                break
+
+            finished, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in inspections:
+                    inspected[inspections[future]] = future.result()
+                else:
+                    _finish_copy(results[copies[future]], future)
+                    done += 1
+
+            while next_index in inspected:
+                result = results[next_index]
+                sha256, error = inspected.pop(next_index)
+                result['sha256'] = sha256
+                result['status'] = 'failed'
+                result['message'] = None
+                if error is not None:
+                    result['message'] = f"Invalid image file: {error}"
+                    done += 1
+                elif sha256 in known_hashes:
+                    result['status'] = 'duplicate'
+                    result['message'] = f"Same content as {known_hashes[sha256]}"
+                    done += 1
+                else:
+                    file_name = unique_layer_file_name(os.path.basename(result['source']), taken_names)
+                    taken_names.add(file_name)
+                    known_hashes[sha256] = file_name
+                    result['file_name'] = file_name
+                    result['file_path'] = os.path.join(artist_dir, file_name)
+                    future = executor.submit(copy_layer_file, result['source'], result['file_path'], normalize_size)
+                    copies[future] = next_index
+                    pending.add(future)
+                next_index += 1
+
+            if progress_callback is not None:
+                progress_callback(done, len(source_paths))
+
+    # After a cancel, copies that were already running have finished by now
+    for future, index in copies.items():
+        result = results[index]
+        if future.cancelled():
+            result.update(status='cancelled', file_name=None, file_path=None, message="Import cancelled")
+        elif result['status'] == 'failed' and result['message'] is None:
+            _finish_copy(result, future)
+    return results
+
+
+def _finish_copy(result, future):
+    try:
+        future.result()
+        result['status'] = 'added'
+    except Exception as e:
+        result['message'] = f"Copy failed: {e}"
@@ -3,12 +3,14 @@ import json
 
 class MetadataGenerator:
     @staticmethod
-    def generate_metadata(edition_number, layer_composition, project_info):
+    def generate_metadata(edition_number, layer_composition, project_info, animation_file=None):
+        """
+        Build an edition's metadata
+        image is always the static PNG (the poster of animated editions); animation_file is
+        the file name of the animation, if the edition is animated
+        """
         attributes = []
 
-        # Check if any layer is a GIF
-        has_gif = any(layer['file_path'].lower().endswith('.gif') for layer in layer_composition)
-
         for layer in layer_composition:
             attributes.append({
                 "trait_type": layer['artist'],  # Use artist name as trait_type
@@ -23,11 +25,8 @@ class MetadataGenerator:
             "attributes": attributes
         }
 
-        # Set image field based on file type
-        if has_gif:
-            metadata["image"] = f"{edition_number}.gif"
-            metadata["animation_url"] = f"{edition_number}.gif"
-        else:
-            metadata["image"] = f"{edition_number}.png"
+        metadata["image"] = f"{edition_number}.png"
+        if animation_file:
+            metadata["animation_url"] = animation_file
 
         return metadata
\ No newline at end of file
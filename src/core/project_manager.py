@@ -2,13 +2,35 @@ import os
 import json
 import shutil
 import random
+import threading
 from datetime import datetime
-from ..utils.file_utils import ensure_directory
-from ..utils.image_utils import compose_layers, resize_image_to_2000x2000, get_gif_frame_count
+from concurrent.futures import ThreadPoolExecutor
+from ..utils.file_utils import ensure_directory, write_file_atomic, file_sha256
+from ..utils.image_utils import (compose_layers, save_composition, composition_nbytes, composition_palette_key,
+                                 find_composition_file, get_poster_path, is_animation_path, resize_image_to_fit,
+                                 get_gif_frame_count, configure_layer_cache, get_layer_cache_stats,
+                                 configure_derived_layers, normalize_layer,
+                                 DEFAULT_LAYER_CACHE_MB, DEFAULT_PREFIX_CACHE_MB, DEFAULT_RENDER_PROFILES)
+from ..utils.animation_timeline import DEFAULT_MAX_LOOP_MS
+from ..utils.layer_cache import LRUCache
+from ..utils.gif_encoder import GIF_PRESETS, DEFAULT_GIF_PRESET
+from ..utils.animation_encoders import get_animation_formats, DEFAULT_ANIMATION_FORMAT
+from ..utils.composition_graph import CompositionGraph
 from .metadata_generator import MetadataGenerator
+from .combination_enumerator import CombinationEnumerator
+from .batch_renderer import BatchRenderer
+from .generation_journal import GenerationJournal
+from .combination_index import CombinationIndex
+from .edition_index import EditionIndex
+from .project_store import JsonProjectStore, PROJECT_STORES, open_project_store
+from .layer_import import import_layer_files, hash_layer_files, LAYER_IMPORT_WORKERS
+from .sampler import CombinationSampler
 
 
 class ProjectManager:
+    # Memory budget for recently rendered previews, kept so switching back to one is instant
+    PREVIEW_CACHE_MB = 64
+
     def __init__(self):
         self.project_path = None
         self.project_data = {
@@ -18,10 +40,31 @@ class ProjectManager:
             'generation_settings': {},
             'generation_state': {}
         }
-        self.generated_combinations = set()
-
-    def create_new_project(self, project_path, collection_name):
+        self.store = None  # Where project_data is saved (see project_store)
+        self.journal = None
+        self.edition_index = None  # Generated editions for listing and paging (see EditionIndex)
+        self._combination_index = None  # Generated combinations as integer codes for the current layout
+        self._layer_lookup = None  # (artist, file name) -> layer data, rebuilt after layout changes
+        self._journal_checkpoint = None  # Journal replay state the combination index reflects
+        self._index_dirty = False
+        self.interrupted_batch = None  # Batch left unfinished by a crash, found when loading
+        self.last_batch_stats = None  # Prefix reuse of the most recent batch (see BatchRenderer.stats)
+        self.rng = random.Random()
+        self._sampler = None  # Compiled rarity sampler, rebuilt when weights or layers change
+        self._preview_cache = LRUCache(self.PREVIEW_CACHE_MB * 1024 * 1024, sizeof=composition_nbytes)
+
+        # Dirty-tracking persistence: mutations are coalesced and flushed by a debounce timer,
+        # at batch boundaries, or at explicit checkpoints (save_project)
+        self._state_lock = threading.RLock()
+        self._dirty = False
+        self._changes = set()  # Rows changed since the last save for stores that write per row; None = all
+        self._flush_timer = None
+
+    def create_new_project(self, project_path, collection_name, storage_backend=JsonProjectStore.BACKEND):
+        self.close_project()
         self.project_path = project_path
+        self.store = PROJECT_STORES[storage_backend](project_path)
+        self._changes = None
         self.project_data = {
             'project_info': {
                 'name': collection_name,
@@ -36,7 +79,19 @@ class ProjectManager:
             'generation_settings': {
                 'auto_generate': True,
                 'max_attempts': 1000,
-                'ensure_uniqueness': True
+                'ensure_uniqueness': True,
+                'enumeration_shuffle': True,
+                'enumeration_seed': None,
+                'random_seed': None,
+                'render_workers': 0,
+                'save_debounce_seconds': 1.0,
+                'layer_cache_mb': DEFAULT_LAYER_CACHE_MB,
+                'prefix_cache_mb': DEFAULT_PREFIX_CACHE_MB,
+                'render_profiles': dict(DEFAULT_RENDER_PROFILES),
+                'gif_preset': DEFAULT_GIF_PRESET,
+                'animation_format': DEFAULT_ANIMATION_FORMAT,
+                'max_loop_ms': DEFAULT_MAX_LOOP_MS,
+                'derived_layers': True
             },
             'generation_state': {
                 'current_edition': 0,
@@ -51,41 +106,292 @@ class ProjectManager:
         ensure_directory(os.path.join(project_path, 'assets', 'artists'))
         ensure_directory(os.path.join(project_path, 'workspace', 'generated'))
         ensure_directory(os.path.join(project_path, 'workspace', 'previews'))
-
+        ensure_directory(os.path.join(project_path, 'workspace', 'thumbnails'))
+        ensure_directory(os.path.join(project_path, 'workspace', 'derived'))
+
+        self.journal = GenerationJournal(project_path)
+        self.open_edition_index()
+        self.interrupted_batch = None
+        self.invalidate_layout()
+        self.set_random_seed(None)
+        self.apply_cache_settings()
         return self.save_project()
 
     def load_project(self, project_path):
+        self.close_project()
         self.project_path = project_path
-        config_file = os.path.join(project_path, 'config', 'project.json')
+        self.store = open_project_store(project_path)
 
-        if os.path.exists(config_file):
+        if self.store is not None:
             try:
-                with open(config_file, 'r') as f:
-                    self.project_data = json.load(f)
+                self.project_data = self.store.load()
+                self._changes = set()
                 # Load existing combinations for uniqueness checking
+                self.invalidate_layout()
                 self.load_generated_combinations()
+                self.set_random_seed(self.project_data['generation_settings'].get('random_seed'))
+                self.apply_cache_settings()
                 return True
             except Exception as e:
                 print(f"Error loading project: {e}")
                 return False
         return False
 
+    def get_render_size(self, profile='final'):
+        """Output edge length in pixels for a named render profile (final, preview, thumbnail, ...)"""
+        profiles = self.project_data.get('generation_settings', {}).get('render_profiles', {})
+        return profiles.get(profile) or DEFAULT_RENDER_PROFILES.get(profile) or DEFAULT_RENDER_PROFILES['final']
+
+    def get_gif_preset(self):
+        """Name of the GIF encoder preset used for animated editions and previews"""
+        preset = self.project_data.get('generation_settings', {}).get('gif_preset')
+        return preset if preset in GIF_PRESETS else DEFAULT_GIF_PRESET
+
+    def set_gif_preset(self, preset):
+        """Set the GIF encoder preset (fast, balanced or quality)"""
+        if preset not in GIF_PRESETS:
+            return False
+        with self._state_lock:
+            self.project_data['generation_settings']['gif_preset'] = preset
+        return self.mark_dirty(('setting', 'generation_settings', 'gif_preset'))
+
+    def get_animation_format(self):
+        """Output format of animated editions; GIF when the project's format can't be written here"""
+        animation_format = self.project_data.get('generation_settings', {}).get('animation_format')
+        if animation_format in get_animation_formats():
+            return animation_format
+        if animation_format and animation_format != DEFAULT_ANIMATION_FORMAT:
+            print(f"Animation format '{animation_format}' is not available, writing GIF instead")
+        return DEFAULT_ANIMATION_FORMAT
+
+    def set_animation_format(self, animation_format):
+        """Set the output format of animated editions (gif, webp, apng or mp4)"""
+        if animation_format not in get_animation_formats(available_only=False):
+            return False
+        with self._state_lock:
+            self.project_data['generation_settings']['animation_format'] = animation_format
+        return self.mark_dirty(('setting', 'generation_settings', 'animation_format'))
+
+    def get_max_loop_ms(self):
+        """Longest loop (ms) an animated edition may have while keeping every layer in sync"""
+        max_loop_ms = self.project_data.get('generation_settings', {}).get('max_loop_ms')
+        return max_loop_ms if isinstance(max_loop_ms, int) and max_loop_ms > 0 else DEFAULT_MAX_LOOP_MS
+
+    def set_max_loop_ms(self, max_loop_ms):
+        """Set the loop length cap for animated editions"""
+        if not isinstance(max_loop_ms, int) or max_loop_ms <= 0:
+            return False
+        with self._state_lock:
+            self.project_data['generation_settings']['max_loop_ms'] = max_loop_ms
+        return self.mark_dirty(('setting', 'generation_settings', 'max_loop_ms'))
+
+    def get_output_options(self, animation_format=None, gif_preset=None):
+        """
+        Keyword arguments for save_composition that carry the project's output settings
+        A given animation_format or gif_preset overrides the project's for one run without
+        being saved; an unknown preset or unavailable format falls back like a saved one would.
+        """
+        options = {'animation_format': self.get_animation_format(), 'gif_preset': self.get_gif_preset()}
+        if gif_preset is not None:
+            options['gif_preset'] = gif_preset if gif_preset in GIF_PRESETS else DEFAULT_GIF_PRESET
+        if animation_format is not None:
+            if animation_format in get_animation_formats():
+                options['animation_format'] = animation_format
+            else:
+                print(f"Animation format '{animation_format}' is not available, writing GIF instead")
+                options['animation_format'] = DEFAULT_ANIMATION_FORMAT
+        return options
+
+    def set_render_size(self, profile, size):
+        """Set the output size of a render profile"""
+        with self._state_lock:
+            profiles = self.project_data['generation_settings'].setdefault('render_profiles',
+                                                                           dict(DEFAULT_RENDER_PROFILES))
+            profiles[profile] = int(size)
+        return self.mark_dirty(('setting', 'generation_settings', 'render_profiles'))
+
+    def apply_cache_settings(self):
+        """Apply the project's prepared-layer cache memory ceiling and normalized layer directory"""
+        settings = self.project_data.get('generation_settings', {})
+        configure_layer_cache(settings.get('layer_cache_mb', DEFAULT_LAYER_CACHE_MB))
+        configure_derived_layers(self.get_derived_layer_dir())
+
+    def get_derived_layer_dir(self):
+        """
+        Directory of normalized layers (workspace/derived), or None when the project has them
+        turned off. Its files are rebuilt from the layer files as needed, so it is safe to delete.
+        """
+        if not self.project_path or not self.project_data.get('generation_settings', {}).get('derived_layers', True):
+            return None
+        return os.path.join(self.project_path, 'workspace', 'derived')
+
+    def set_derived_layers(self, enabled):
+        """Turn normalized layers on or off (off decodes layer files on every layer cache miss)"""
+        with self._state_lock:
+            self.project_data['generation_settings']['derived_layers'] = bool(enabled)
+            self.apply_cache_settings()
+        return self.mark_dirty(('setting', 'generation_settings', 'derived_layers'))
+
+    def normalize_all_layers(self, profiles=('final', 'preview'), progress_callback=None,
+                             max_workers=LAYER_IMPORT_WORKERS):
+        """
+        Write the normalized form of every layer for the sizes of the given render profiles
+        ahead of a batch, so no render worker has to decode or resize a layer file. Layers that
+        are already normalized are skipped. progress_callback(done, total) is called as layers
+        finish. Returns (normalized, failed) counts.
+        """
+        if self.get_derived_layer_dir() is None:
+            return 0, 0
+        sizes = sorted({self.get_render_size(profile) for profile in profiles})
+        tasks = [(layer['file_path'], size)
+                 for artist in self.project_data['artists'].values()
+                 for layer in artist['layers'] if os.path.exists(layer['file_path'])
+                 for size in sizes]
+
+        normalized = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for done, ok in enumerate(executor.map(lambda task: normalize_layer(*task), tasks), 1):
+                normalized += ok
+                if progress_callback is not None:
+                    progress_callback(done, len(tasks))
+        return normalized, len(tasks) - normalized
+
     def save_project(self):
+        """Checkpoint: save the project now (atomically), cancelling any pending debounced flush"""
+        if not self.project_path or self.store is None:
+            return False
+
+        with self._state_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+            try:
+                self.project_data['project_info']['last_modified'] = datetime.now().isoformat()
+                if self._changes is not None:
+                    self._changes.add(('setting', 'project_info', 'last_modified'))
+                self.store.save(self.project_data, self._changes)
+
+                self._dirty = False
+                self._changes = set()
+                self.save_combination_index()
+                return True
+            except Exception as e:
+                print(f"Error saving project: {e}")
+                return False
+
+    def mark_dirty(self, *changes):
+        """
+        Record an unsaved mutation; it is flushed by the debounce timer unless a checkpoint comes first
+        changes name what was modified so stores that write per row (SQLite) only write those:
+        ('setting', section, key), ('section', section), ('artist', artist) or
+        ('layer', artist, file_name). With none, the whole project is rewritten.
+        """
         if not self.project_path:
             return False
 
-        try:
-            self.project_data['project_info']['last_modified'] = datetime.now().isoformat()
+        with self._state_lock:
+            self._dirty = True
+            if not changes:
+                self._changes = None
+            elif self._changes is not None:
+                self._changes.update(changes)
+            if self._flush_timer is None:
+                delay = self.project_data['generation_settings'].get('save_debounce_seconds', 1.0)
+                self._flush_timer = threading.Timer(delay, self._on_flush_timer)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return True
+
+    def _on_flush_timer(self):
+        with self._state_lock:
+            self._flush_timer = None
+            if self._dirty:
+                self.save_project()
+
+    def flush_project(self):
+        """Write pending mutations, if any"""
+        with self._state_lock:
+            if self._dirty:
+                return self.save_project()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        return True
+
+    def get_storage_backend(self):
+        """Name of the store the project is saved in (json or sqlite), or None"""
+        return self.store.BACKEND if self.store is not None else None
+
+    def set_storage_backend(self, storage_backend):
+        """Move the project to another store (json or sqlite); the old file is removed once the new one is saved"""
+        if not self.project_path or storage_backend not in PROJECT_STORES:
+            return False
 
-            config_file = os.path.join(self.project_path, 'config', 'project.json')
-            with open(config_file, 'w') as f:
-                json.dump(self.project_data, f, indent=2)
+        with self._state_lock:
+            if storage_backend == self.store.BACKEND:
+                return True
+            previous_store = self.store
+            self.store = PROJECT_STORES[storage_backend](self.project_path)
+            self._changes = None
+            if not self.save_project():
+                self.store.remove()
+                self.store = previous_store
+                self._changes = None
+                return False
+            previous_store.remove()
+        return True
 
+    def export_project_json(self, output_path):
+        """Write the project's settings, artists and layers to output_path in the project.json format"""
+        if not self.project_path:
+            return False
+        try:
+            with self._state_lock:
+                serialized = json.dumps(self.project_data, indent=2)
+            write_file_atomic(output_path, serialized)
             return True
         except Exception as e:
-            print(f"Error saving project: {e}")
+            print(f"Error exporting project: {e}")
             return False
 
+    def import_project_json(self, input_path):
+        """
+        Replace the project's settings, artists and layers with a file in the project.json format
+        Generation state still comes from the project's journal.
+        """
+        if not self.project_path:
+            return False
+        try:
+            with open(input_path, 'r') as f:
+                project_data = json.load(f)
+        except Exception as e:
+            print(f"Error importing project: {e}")
+            return False
+
+        with self._state_lock:
+            self.project_data = project_data
+            self.invalidate_layout()
+            self.load_generated_combinations()
+            self.set_random_seed(self.project_data['generation_settings'].get('random_seed'))
+            self.apply_cache_settings()
+            self._changes = None
+            return self.save_project()
+
+    def close_project(self):
+        """Flush pending mutations before the project is closed or replaced"""
+        if self.project_path:
+            self.flush_project()
+        if self.edition_index is not None:
+            self.edition_index.sync(self.journal)
+            self.edition_index.close()
+            self.edition_index = None
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+        self._preview_cache.clear()
+        self.last_batch_stats = None
+
     def add_artist(self, artist_name):
         if not self.project_path:
             return False
@@ -93,143 +399,156 @@ class ProjectManager:
         if artist_name in self.project_data['artists']:
             return False
 
-        self.project_data['artists'][artist_name] = {
-            'name': artist_name,
-            'display_name': artist_name,
-            'layers': [],
-            'rarity_weights': {},
-            'layer_index': len(self.project_data['artist_order']) + 1  # Auto-assign layer index
-        }
+        with self._state_lock:
+            self.project_data['artists'][artist_name] = {
+                'name': artist_name,
+                'display_name': artist_name,
+                'layers': [],
+                'rarity_weights': {},
+                'layer_index': len(self.project_data['artist_order']) + 1  # Auto-assign layer index
+            }
 
-        # Add to artist order
-        self.project_data['artist_order'].append(artist_name)
+            # Add to artist order
+            self.project_data['artist_order'].append(artist_name)
 
         # Create artist directory
         artist_dir = os.path.join(self.project_path, 'assets', 'artists', artist_name)
         ensure_directory(artist_dir)
 
-        return self.save_project()
+        return self.mark_dirty(('artist', artist_name), ('setting', 'project', 'artist_order'))
 
     def remove_artist(self, artist_name):
         if not self.project_path:
             return False
 
         if artist_name in self.project_data['artists']:
-            # Remove from artist order
-            if artist_name in self.project_data['artist_order']:
-                self.project_data['artist_order'].remove(artist_name)
+            with self._state_lock:
+                # Remove from artist order
+                if artist_name in self.project_data['artist_order']:
+                    self.project_data['artist_order'].remove(artist_name)
 
-            # Update layer indexes for remaining artists
-            for i, remaining_artist in enumerate(self.project_data['artist_order']):
-                self.project_data['artists'][remaining_artist]['layer_index'] = i + 1
-                # Update all layers for this artist - THIS LINE WAS MISSING PROPER INDENTATION
-                for layer in self.project_data['artists'][remaining_artist]['layers']:
-                    layer['layer_index'] = i + 1
+                # Update layer indexes for remaining artists
+                for i, remaining_artist in enumerate(self.project_data['artist_order']):
+                    self.project_data['artists'][remaining_artist]['layer_index'] = i + 1
+                    # Update all layers for this artist - THIS LINE WAS MISSING PROPER INDENTATION
+                    for layer in self.project_data['artists'][remaining_artist]['layers']:
+                        layer['layer_index'] = i + 1
 
-            del self.project_data['artists'][artist_name]
+                del self.project_data['artists'][artist_name]
+                self.invalidate_layout()
 
             # Remove artist directory
             artist_dir = os.path.join(self.project_path, 'assets', 'artists', artist_name)
             if os.path.exists(artist_dir):
                 shutil.rmtree(artist_dir)
 
-            return self.save_project()
+            return self.mark_dirty()
         return False
 
     def add_layer_to_artist(self, artist_name, source_file_path):
-        if not self.project_path:
-            return False
-
-        if artist_name not in self.project_data['artists']:
-            return False
-
-        try:
-            # Validate the image file
-            try:
-                from PIL import Image
-                with Image.open(source_file_path) as img:
-                    img.verify()  # Verify it's a valid image
-            except Exception as e:
-                print(f"Invalid image file: {source_file_path}, error: {e}")
-                return False
-
-            # Copy file to artist directory
-            file_name = os.path.basename(source_file_path)
-            artist_dir = os.path.join(self.project_path, 'assets', 'artists', artist_name)
-            dest_path = os.path.join(artist_dir, file_name)
-
-            shutil.copy2(source_file_path, dest_path)
-
-            # Get the artist's layer index for default
-            artist_index = self.project_data['artists'][artist_name].get('layer_index', 1)
-
-            # Add to project data with default settings
-            layer_data = {
-                'file_name': file_name,
-                'display_name': os.path.splitext(file_name)[0].replace('_', ' ').title(),
-                'file_path': dest_path,
-                'rarity_weight': 1.0,  # Default rarity
-                'opacity': 1.0,  # Default opacity (fully opaque)
-                'layer_index': artist_index  # Use artist's layer index as default
-            }
-
-            self.project_data['artists'][artist_name]['layers'].append(layer_data)
-            self.project_data['artists'][artist_name]['rarity_weights'][file_name] = 1.0
+        results = self.add_layers_to_artist(artist_name, [source_file_path])
+        return bool(results) and results[0]['status'] == 'added'
+
+    def add_layers_to_artist(self, artist_name, source_file_paths, progress_callback=None,
+                             max_workers=LAYER_IMPORT_WORKERS, should_cancel=None):
+        """
+        Import layer files for an artist: validation, hashing and copying run in a thread
+        pool, then every new layer is added with a single save
+        Files with the same content (SHA-256) as one of the artist's layers, or as an earlier
+        file in the list, are skipped. progress_callback(done, total) and should_cancel() are
+        called from this thread while files are copied (see import_layer_files); layers copied
+        before a cancel are kept. Returns one result dict per file, in order, with source,
+        status ('added', 'duplicate', 'failed' or 'cancelled'), file_name and message.
+        """
+        if not self.project_path or artist_name not in self.project_data['artists']:
+            return [{'source': path, 'status': 'failed', 'file_name': None, 'file_path': None, 'sha256': None,
+                     'message': "No such artist"} for path in source_file_paths]
+
+        artist = self.project_data['artists'][artist_name]
+        artist_dir = os.path.join(self.project_path, 'assets', 'artists', artist_name)
+        ensure_directory(artist_dir)
 
-            return self.save_project()
+        # Layers imported before hashes were recorded are hashed once now
+        unhashed = [layer for layer in artist['layers'] if 'sha256' not in layer and os.path.exists(layer['file_path'])]
+        for layer, sha256 in zip(unhashed, hash_layer_files([layer['file_path'] for layer in unhashed], max_workers)):
+            layer['sha256'] = sha256
+        known_hashes = {layer['sha256']: layer['file_name'] for layer in artist['layers'] if layer.get('sha256')}
+        taken_names = set(os.listdir(artist_dir)) | {layer['file_name'] for layer in artist['layers']}
+
+        # New layers are normalized for final renders by the same pool that copies them
+        normalize_size = self.get_render_size() if self.get_derived_layer_dir() is not None else None
+        results = import_layer_files(source_file_paths, artist_dir, known_hashes, taken_names,
+                                     progress_callback, max_workers, normalize_size, should_cancel)
+
+        # Get the artist's layer index for default
+        artist_index = artist.get('layer_index', 1)
+        with self._state_lock:
+            for result in results:
+                if result['status'] != 'added':
+                    print(f"Skipped layer {result['source']}: {result['message']}")
+                    continue
 
-        except Exception as e:
-            print(f"Error adding layer: {e}")
-            return False
+                # Add to project data with default settings
+                file_name = result['file_name']
+                artist['layers'].append({
+                    'file_name': file_name,
+                    'display_name': os.path.splitext(file_name)[0].replace('_', ' ').title(),
+                    'file_path': result['file_path'],
+                    'rarity_weight': 1.0,  # Default rarity
+                    'opacity': 1.0,  # Default opacity (fully opaque)
+                    'layer_index': artist_index,  # Use artist's layer index as default
+                    'sha256': result['sha256']
+                })
+                artist['rarity_weights'][file_name] = 1.0
+            self.invalidate_layout()
+            self.mark_dirty(('artist', artist_name))
+            self.save_project()
+        return results
 
     def set_layer_rarity(self, artist_name, layer_name, rarity_weight):
         """Set rarity weight for a specific layer"""
         if artist_name in self.project_data['artists']:
-            self.project_data['artists'][artist_name]['rarity_weights'][layer_name] = rarity_weight
-            # Update the layer data as well
-            for layer in self.project_data['artists'][artist_name]['layers']:
-                if layer['file_name'] == layer_name:
+            with self._state_lock:
+                self.project_data['artists'][artist_name]['rarity_weights'][layer_name] = rarity_weight
+                # Update the layer data as well
+                layer = self.find_layer(artist_name, layer_name)
+                if layer is not None:
                     layer['rarity_weight'] = rarity_weight
-            return self.save_project()
+                self.invalidate_sampler()
+            return self.mark_dirty(('layer', artist_name, layer_name))
         return False
 
     def set_layer_opacity(self, artist_name, layer_name, opacity):
         """Set opacity for a specific layer"""
         if artist_name in self.project_data['artists']:
-            # Update the layer data
-            for layer in self.project_data['artists'][artist_name]['layers']:
-                if layer['file_name'] == layer_name:
+            with self._state_lock:
+                # Update the layer data
+                layer = self.find_layer(artist_name, layer_name)
+                if layer is not None:
                     layer['opacity'] = opacity
-            return self.save_project()
+            return self.mark_dirty(('layer', artist_name, layer_name))
         return False
 
     def set_layer_index(self, artist_name, layer_name, layer_index):
         """Set layer index (z-index) for a specific layer - override the default"""
         if artist_name in self.project_data['artists']:
-            # Update the layer data
-            for layer in self.project_data['artists'][artist_name]['layers']:
-                if layer['file_name'] == layer_name:
+            with self._state_lock:
+                # Update the layer data
+                layer = self.find_layer(artist_name, layer_name)
+                if layer is not None:
                     layer['layer_index'] = layer_index
-            return self.save_project()
+            return self.mark_dirty(('layer', artist_name, layer_name))
         return False
 
     def get_layer_opacity(self, artist_name, layer_name):
         """Get opacity for a specific layer"""
-        artist = self.get_artist(artist_name)
-        if artist:
-            for layer in artist['layers']:
-                if layer['file_name'] == layer_name:
-                    return layer.get('opacity', 1.0)
-        return 1.0
+        layer = self.find_layer(artist_name, layer_name)
+        return layer.get('opacity', 1.0) if layer is not None else 1.0
 
     def get_layer_index(self, artist_name, layer_name):
         """Get layer index for a specific layer"""
-        artist = self.get_artist(artist_name)
-        if artist:
-            for layer in artist['layers']:
-                if layer['file_name'] == layer_name:
-                    return layer.get('layer_index', 1)
-        return 1
+        layer = self.find_layer(artist_name, layer_name)
+        return layer.get('layer_index', 1) if layer is not None else 1
 
     def get_artist_layer_index(self, artist_name):
         """Get the default layer index for an artist"""
@@ -241,13 +560,14 @@ class ProjectManager:
     def set_artist_layer_index(self, artist_name, layer_index):
         """Set the default layer index for an artist and update all their layers"""
         if artist_name in self.project_data['artists']:
-            self.project_data['artists'][artist_name]['layer_index'] = layer_index
+            with self._state_lock:
+                self.project_data['artists'][artist_name]['layer_index'] = layer_index
 
-            # Update all layers for this artist
-            for layer in self.project_data['artists'][artist_name]['layers']:
-                layer['layer_index'] = layer_index
+                # Update all layers for this artist
+                for layer in self.project_data['artists'][artist_name]['layers']:
+                    layer['layer_index'] = layer_index
 
-            return self.save_project()
+            return self.mark_dirty(('artist', artist_name))
         return False
 
     def get_artists(self):
@@ -256,71 +576,273 @@ class ProjectManager:
     def get_artist(self, artist_name):
         return self.project_data['artists'].get(artist_name)
 
+    def find_layer(self, artist_name, layer_name):
+        """Get the data of an artist's layer by file name, or None"""
+        lookup = self._layer_lookup
+        if lookup is None:
+            with self._state_lock:
+                lookup = {(name, layer['file_name']): layer
+                          for name, artist in self.project_data['artists'].items() for layer in artist['layers']}
+                self._layer_lookup = lookup
+        return lookup.get((artist_name, layer_name))
+
     def get_artist_layer_count(self, artist_name):
         """Get number of layers for an artist"""
         artist = self.get_artist(artist_name)
         return len(artist['layers']) if artist else 0
 
+    def set_random_seed(self, seed):
+        """Seed the RNG used for random combinations so runs are reproducible (None = unseeded)"""
+        self.rng = random.Random(seed)
+
+    def invalidate_sampler(self):
+        """Drop the compiled rarity sampler after weights or the set of layers change"""
+        self._sampler = None
+
+    def invalidate_layout(self):
+        """Drop everything derived from the set of artists and layers after it changes"""
+        with self._state_lock:
+            self._sampler = None
+            self._combination_index = None
+            self._layer_lookup = None
+
+    def get_sampler(self):
+        """Get the compiled rarity sampler, building it on first use"""
+        sampler = self._sampler
+        if sampler is None:
+            with self._state_lock:
+                sampler = CombinationSampler(self.get_artists_with_layers())
+                self._sampler = sampler
+        return sampler
+
     def generate_random_combination(self):
         """Generate a random combination of layers (one per artist)"""
         if not self.project_path or not self.project_data['artists']:
             return None, None
 
-        combination = {}
-        combination_key_parts = []
+        # Only artists that actually have layers take part
+        sampler = self.get_sampler()
+        if not sampler.artists_with_layers:
+            return None, None
+
+        # Select one layer per artist based on rarity weights (O(1) per artist)
+        return self.build_combination(sampler.sample(self.rng), sampler.artists_with_layers)
 
-        # Filter artists that actually have layers
-        artists_with_layers = {
-            name: data for name, data in self.project_data['artists'].items()
-            if data['layers']
+    def _combination_entry(self, layer):
+        """Snapshot of the layer settings that go into a combination"""
+        return {
+            'file_name': layer['file_name'],
+            'display_name': layer['display_name'],
+            'file_path': layer['file_path'],
+            'opacity': layer.get('opacity', 1.0),
+            'layer_index': layer.get('layer_index', 1)  # Include layer index
         }
 
-        if not artists_with_layers:
-            return None, None
+    def get_artists_with_layers(self):
+        """Get (artist_name, layers) pairs for artists that have layers, in project order"""
+        return [(name, data['layers']) for name, data in self.project_data['artists'].items() if data['layers']]
 
-        for artist_name, artist_data in artists_with_layers.items():
-            layers = artist_data['layers']
-            if layers:
-                # Select random layer based on rarity weights
-                weights = [layer.get('rarity_weight', 1.0) for layer in layers]
-                selected_layer = random.choices(layers, weights=weights)[0]
-
-                # Include all settings in the combination
-                combination[artist_name] = {
-                    'file_name': selected_layer['file_name'],
-                    'display_name': selected_layer['display_name'],
-                    'file_path': selected_layer['file_path'],
-                    'opacity': selected_layer.get('opacity', 1.0),
-                    'layer_index': selected_layer.get('layer_index', 1)  # Include layer index
-                }
-                combination_key_parts.append(f"{artist_name}:{selected_layer['file_name']}")
+    def build_combination(self, layer_indices, artists_with_layers=None):
+        """Build a combination from one layer index per artist (see get_artists_with_layers)"""
+        if artists_with_layers is None:
+            artists_with_layers = self.get_artists_with_layers()
+
+        combination = {}
+        combination_key_parts = []
+        for (artist_name, layers), layer_idx in zip(artists_with_layers, layer_indices):
+            selected_layer = layers[layer_idx]
+            combination[artist_name] = self._combination_entry(selected_layer)
+            combination_key_parts.append(f"{artist_name}:{selected_layer['file_name']}")
 
         combination_key = "|".join(sorted(combination_key_parts))
         return combination, combination_key
 
+    def iter_unique_combinations(self, shuffle=None, seed=None):
+        """
+        Yield (combination, combination_key) for every combination not generated yet.
+        Walks the Cartesian product of artist layers in mixed-radix order (optionally
+        in a seeded shuffled order), so filling the whole space needs no retries.
+        """
+        if not self.project_path:
+            return
+
+        settings = self.project_data['generation_settings']
+        if shuffle is None:
+            shuffle = settings.get('enumeration_shuffle', True)
+        if seed is None:
+            seed = settings.get('enumeration_seed')
+
+        combination_index = self.get_combination_index()
+        artists_with_layers = combination_index.artists_with_layers
+        if not artists_with_layers:
+            return
+
+        enumerator = CombinationEnumerator(combination_index.radices, shuffle=shuffle, seed=seed)
+        for code in enumerator.iter_indices():
+            if code in combination_index:
+                continue
+
+            combination, combination_key = self.build_combination(enumerator.decode(code), artists_with_layers)
+
+            # Skip combinations whose layer files have gone missing
+            if not all(os.path.exists(layer_data['file_path']) for layer_data in combination.values()):
+                continue
+
+            yield combination, combination_key
+
     def is_combination_unique(self, combination_key):
         """Check if combination has been used before"""
-        return combination_key not in self.generated_combinations
+        combination_index = self.get_combination_index()
+        code = combination_index.encode_key(combination_key)
+        return code is None or code not in combination_index
 
     def register_combination(self, combination_key, edition_number):
-        """Register a combination as used"""
-        self.generated_combinations.add(combination_key)
-        # Save to file for persistence
-        combinations_file = os.path.join(self.project_path, 'workspace', 'generated_combinations.txt')
-        ensure_directory(os.path.dirname(combinations_file))
-        with open(combinations_file, 'a') as f:
-            f.write(f"{combination_key}|{edition_number}\n")
+        """Register a combination as used (persisted by the edition's journal commit)"""
+        with self._state_lock:
+            if self.get_combination_index().add_key(combination_key):
+                self._index_dirty = True
+
+    def get_combination_index_path(self):
+        return os.path.join(self.project_path, 'workspace', CombinationIndex.FILE_NAME)
+
+    def get_combination_index(self):
+        """Get the index of generated combinations, rebuilding it from the journal after a layout change"""
+        with self._state_lock:
+            if self._combination_index is None:
+                combination_index = CombinationIndex(self.get_artists_with_layers())
+                if self.journal is not None:
+                    replayed = self.journal.replay(on_key=combination_index.add_key)
+                    self._journal_checkpoint = replayed['checkpoint']
+                self._combination_index = combination_index
+                self._index_dirty = True
+                self.project_data['generation_state']['unique_combinations'] = len(combination_index)
+            return self._combination_index
+
+    def save_combination_index(self):
+        """Write the combination index sidecar if commits were added since it was last written"""
+        with self._state_lock:
+            if not self._index_dirty or self._combination_index is None or self.journal is None:
+                return
+            try:
+                # Advance the checkpoint over records appended since it was taken (already in the index)
+                checkpoint = self.journal.replay(checkpoint=self._journal_checkpoint)['checkpoint']
+                self._combination_index.save(self.get_combination_index_path(), checkpoint)
+                self._journal_checkpoint = checkpoint
+                self._index_dirty = False
+            except Exception as e:
+                print(f"Error saving combination index: {e}")
 
     def load_generated_combinations(self):
-        """Load previously generated combinations from file"""
+        """
+        Rebuild generated combinations and generation state from the journal
+        The combination index sidecar, when it matches the current layout, holds the state
+        up to a journal offset so only records appended after it are replayed
+        """
+        self.journal = GenerationJournal(self.project_path)
+        ensure_directory(os.path.dirname(self.journal.path))
+        self.journal.repair()
+        if not self.journal.exists():
+            self.migrate_legacy_generation_log()
+
+        combination_index, checkpoint = CombinationIndex.load(self.get_combination_index_path(),
+                                                              self.get_artists_with_layers())
+        journal_size = os.path.getsize(self.journal.path) if self.journal.exists() else 0
+        if combination_index is None or checkpoint.get('offset', 0) > journal_size:
+            combination_index = CombinationIndex(self.get_artists_with_layers())
+            checkpoint = None
+
+        replayed = self.journal.replay(checkpoint=checkpoint, on_key=combination_index.add_key)
+        self.interrupted_batch = replayed['interrupted_batch']
+
+        with self._state_lock:
+            self._combination_index = combination_index
+            self._journal_checkpoint = replayed['checkpoint']
+            self._index_dirty = checkpoint is None or replayed['checkpoint']['offset'] != checkpoint['offset']
+
+            generation_state = self.project_data['generation_state']
+            generation_state['current_edition'] = replayed['current_edition']
+            generation_state['generated_count'] = replayed['generated_count']
+            generation_state['unique_combinations'] = len(combination_index)
+
+        self.remove_uncommitted_outputs()
+        self.open_edition_index()
+
+    def open_edition_index(self):
+        """Open the edition index and index commits it hasn't seen (e.g. a journal from an older version)"""
+        if self.edition_index is not None:
+            self.edition_index.close()
+        self.edition_index = EditionIndex(self.project_path)
+        self.edition_index.open()
+        self.edition_index.sync(self.journal)
+
+    def migrate_legacy_generation_log(self):
+        """Convert generated_combinations.txt and existing editions into journal commits (one-time)"""
+        last_edition = self.project_data['generation_state'].get('current_edition', 0)
         combinations_file = os.path.join(self.project_path, 'workspace', 'generated_combinations.txt')
-        self.generated_combinations = set()
+        if last_edition <= 0 and not os.path.exists(combinations_file):
+            return
 
+        legacy_keys = {}
         if os.path.exists(combinations_file):
             with open(combinations_file, 'r') as f:
                 for line in f:
-                    combination_key = line.split('|')[0]
-                    self.generated_combinations.add(combination_key)
+                    # Keys contain '|' themselves; the edition number is the last field
+                    combination_key, _, edition = line.rstrip('\n').rpartition('|')
+                    if combination_key and edition.isdigit():
+                        legacy_keys[int(edition)] = combination_key
+
+        last_edition = max([last_edition] + list(legacy_keys))
+        print(f"Migrating {last_edition} editions to the generation journal...")
+        records = []
+        for edition in range(1, last_edition + 1):
+            path_base = self.get_edition_path_base(edition)
+            image_path = find_composition_file(path_base) or path_base + '.png'
+            records.append(GenerationJournal.commit_record(edition, legacy_keys.get(edition), image_path,
+                                                           path_base + '.json', checksum=None,
+                                                           unique=edition in legacy_keys))
+        self.journal.append_many(records)
+
+    def remove_uncommitted_outputs(self):
+        """Delete images/metadata written for editions that never reached the journal (e.g. after a crash)"""
+        generated_dir = os.path.join(self.project_path, 'workspace', 'generated')
+        if not os.path.exists(generated_dir):
+            return
+
+        current_edition = self.project_data['generation_state']['current_edition']
+        for file_name in os.listdir(generated_dir):
+            edition = file_name.split('.')[0]
+            if edition.isdigit() and int(edition) > current_edition:
+                print(f"Removing uncommitted output {file_name}")
+                os.remove(os.path.join(generated_dir, file_name))
+
+    def get_interrupted_batch(self):
+        """
+        Get the batch left unfinished by a crash as a dict with batch_id, mode, target,
+        committed and remaining (None = all remaining unique), or None
+        """
+        batch = self.interrupted_batch
+        if not batch:
+            return None
+        remaining = None
+        if batch.get('target') is not None:
+            remaining = max(0, batch['target'] - batch['committed'])
+        return dict(batch, remaining=remaining)
+
+    def resume_interrupted_batch(self, workers=None, progress_callback=None, should_cancel=None,
+                                 output_options=None, max_loop_ms=None):
+        """Continue an interrupted batch from the next edition; returns the number generated"""
+        batch = self.get_interrupted_batch()
+        if not batch:
+            return 0
+
+        if batch['mode'] == 'all_unique':
+            return self.generate_all_unique_nfts(max_count=batch['remaining'], workers=workers,
+                                                 progress_callback=progress_callback,
+                                                 should_cancel=should_cancel, resume_batch_id=batch['batch_id'],
+                                                 output_options=output_options, max_loop_ms=max_loop_ms)
+        return self.generate_batch_nfts(batch['remaining'], workers=workers, progress_callback=progress_callback,
+                                        should_cancel=should_cancel, resume_batch_id=batch['batch_id'],
+                                        output_options=output_options, max_loop_ms=max_loop_ms)
 
     def is_gif_combination(self, combination):
         """Check if combination contains any GIF layers"""
@@ -338,7 +860,103 @@ class ProjectManager:
                 max_frames = max(max_frames, frame_count)
         return max_frames
 
-    def generate_single_nft(self):
+    def select_random_combination(self, reserved_keys=()):
+        """
+        Draw random combinations until one has all its layer files present and is unique
+        (also against reserved_keys, e.g. editions still being rendered in a batch)
+        """
+        max_attempts = self.project_data['generation_settings'].get('max_attempts', 1000)
+        ensure_uniqueness = self.project_data['generation_settings'].get('ensure_uniqueness', True)
+
+        sampler = self.get_sampler()
+        combination_index = self.get_combination_index()
+        if not sampler.artists_with_layers:
+            print("Failed to generate combination")
+            return None, None
+
+        for attempt in range(max_attempts):
+            # Check the integer code first so rejected draws never build a combination
+            layer_indices = sampler.sample(self.rng)
+            if ensure_uniqueness and combination_index.encode(layer_indices) in combination_index:
+                continue
+
+            combination, combination_key = self.build_combination(layer_indices, sampler.artists_with_layers)
+
+            # Verify all layer files exist
+            all_files_exist = all(os.path.exists(layer_data['file_path']) for layer_data in combination.values())
+            if not all_files_exist:
+                print("Some layer files are missing, trying another combination...")
+                continue
+
+            if not ensure_uniqueness or combination_key not in reserved_keys:
+                return combination, combination_key
+
+        print(f"Failed to generate unique combination after {max_attempts} attempts")
+        return None, None
+
+    def build_layer_composition(self, combination, skip_missing=False):
+        """Convert a combination to the z-sorted layer composition format used by compose_layers"""
+        layer_composition = []
+        for artist_name, layer_data in combination.items():
+            if skip_missing and not os.path.exists(layer_data['file_path']):
+                continue
+            layer_composition.append({
+                'artist': artist_name,
+                'layer_name': layer_data['file_name'],
+                'display_name': layer_data['display_name'],
+                'file_path': layer_data['file_path'],
+                'z_index': layer_data.get('layer_index', 1),  # Use layer index for z-index
+                'blend_mode': 'normal',
+                'opacity': layer_data.get('opacity', 1.0)
+            })
+
+        # Sort by layer index (z-index) - lower numbers rendered first
+        layer_composition.sort(key=lambda x: x['z_index'])
+        return layer_composition
+
+    def get_edition_path_base(self, edition):
+        """Output path of an edition's image without extension"""
+        return os.path.join(self.project_path, 'workspace', 'generated', f'{edition}')
+
+    def commit_edition(self, edition, combination_key, layer_composition, nft_path, checksum=None, batch_id=None):
+        """
+        Write metadata and record a rendered edition as generated
+        The journal append is the commit point; project.json state is flushed at batch end
+        """
+        ensure_uniqueness = self.project_data['generation_settings'].get('ensure_uniqueness', True)
+        metadata_path = self.get_edition_path_base(edition) + '.json'
+
+        # Generate metadata
+        metadata = MetadataGenerator.generate_metadata(
+            edition,
+            layer_composition,
+            self.project_data['project_info'],
+            animation_file=os.path.basename(nft_path) if is_animation_path(nft_path) else None
+        )
+        write_file_atomic(metadata_path, json.dumps(metadata, indent=2))
+
+        if checksum is None:
+            checksum = file_sha256(nft_path)
+
+        # The journal append and the index update happen together so an index snapshot
+        # never covers a commit it is missing
+        with self._state_lock:
+            self.journal.commit(edition, combination_key, nft_path, metadata_path, checksum,
+                                batch_id=batch_id, unique=ensure_uniqueness)
+            if self.edition_index is not None:
+                self.edition_index.add(edition, combination_key, nft_path, metadata_path, metadata)
+
+            # Register combination and update state
+            if ensure_uniqueness:
+                self.register_combination(combination_key, edition)
+
+            self.project_data['generation_state']['current_edition'] = edition
+            self.project_data['generation_state']['generated_count'] += 1
+            self.project_data['generation_state']['unique_combinations'] = len(self.get_combination_index())
+        self.mark_dirty(('section', 'generation_state'))
+
+    def generate_single_nft(self, combination=None, combination_key=None):
+        """Generate the next edition, from a random unique combination unless one is given"""
         if not self.project_path:
             return False
 
@@ -346,107 +964,33 @@ class ProjectManager:
             # Get next edition number
             edition = self.project_data['generation_state']['current_edition'] + 1
 
-            # Generate unique combination
-            max_attempts = self.project_data['generation_settings'].get('max_attempts', 1000)
-            ensure_uniqueness = self.project_data['generation_settings'].get('ensure_uniqueness', True)
-
-            combination = None
-            combination_key = None
-
             # Check if we have any artists with layers
-            artists_with_layers = {
-                name: data for name, data in self.project_data['artists'].items()
-                if data['layers']
-            }
-
-            if not artists_with_layers:
+            if not self.get_artists_with_layers():
                 print("No artists with layers found!")
                 return False
 
-            for attempt in range(max_attempts):
-                combination, combination_key = self.generate_random_combination()
-
+            # Generate unique combination
+            if combination is None:
+                combination, combination_key = self.select_random_combination()
                 if combination is None:
-                    print("Failed to generate combination")
                     return False
 
-                # Verify all layer files exist
-                all_files_exist = all(os.path.exists(layer_data['file_path']) for layer_data in combination.values())
-                if not all_files_exist:
-                    print("Some layer files are missing, trying another combination...")
-                    continue
-
-                if not ensure_uniqueness or self.is_combination_unique(combination_key):
-                    break
-            else:
-                print(f"Failed to generate unique combination after {max_attempts} attempts")
-                return False
-
-            # Generate NFT files
-            nft_path = os.path.join(self.project_path, 'workspace', 'generated', f'{edition}')
-            metadata_path = os.path.join(self.project_path, 'workspace', 'generated', f'{edition}.json')
-
-            ensure_directory(os.path.dirname(nft_path))
-
-            # Convert combination to layer composition format
-            layer_composition = []
-            for artist_name, layer_data in combination.items():
-                layer_composition.append({
-                    'artist': artist_name,
-                    'layer_name': layer_data['file_name'],
-                    'display_name': layer_data['display_name'],
-                    'file_path': layer_data['file_path'],
-                    'z_index': layer_data.get('layer_index', 1),  # Use layer index for z-index
-                    'blend_mode': 'normal',
-                    'opacity': layer_data.get('opacity', 1.0)
-                })
+            nft_path_base = self.get_edition_path_base(edition)
+            ensure_directory(os.path.dirname(nft_path_base))
 
-            # Sort by layer index (z-index) - lower numbers rendered first
-            layer_composition.sort(key=lambda x: x['z_index'])
+            layer_composition = self.build_layer_composition(combination)
 
             # Generate image or GIF
             print(f"Generating NFT #{edition} with {len(layer_composition)} layers...")
 
-            result = compose_layers(layer_composition)
-
-            if isinstance(result, tuple):  # GIF result (frames, durations)
-                frames, durations = result
-                # Save as GIF
-                nft_path += '.gif'
-                frames[0].save(
-                    nft_path,
-                    format='GIF',
-                    save_all=True,
-                    append_images=frames[1:],
-                    duration=durations,
-                    loop=0,
-                    optimize=True
-                )
-                print(f"Successfully saved GIF NFT to {nft_path}")
-            else:  # Static image
-                nft_path += '.png'
-                result.save(nft_path, 'PNG')
-                print(f"Successfully saved static NFT to {nft_path}")
-
-            # Generate metadata
-            metadata = MetadataGenerator.generate_metadata(
-                edition,
-                layer_composition,
-                self.project_data['project_info']
-            )
-
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            result = compose_layers(layer_composition, size=self.get_render_size('final'),
+                                    max_loop_ms=self.get_max_loop_ms())
+            nft_path = save_composition(result, nft_path_base, palette_key=composition_palette_key(layer_composition),
+                                        **self.get_output_options())
+            print(f"Successfully saved NFT to {nft_path}")
 
-            # Register combination and update state
-            if ensure_uniqueness:
-                self.register_combination(combination_key, edition)
-
-            self.project_data['generation_state']['current_edition'] = edition
-            self.project_data['generation_state']['generated_count'] += 1
-            self.project_data['generation_state']['unique_combinations'] = len(self.generated_combinations)
+            self.commit_edition(edition, combination_key, layer_composition, nft_path)
             self.save_project()
-
             return True
 
         except Exception as e:
@@ -455,19 +999,67 @@ class ProjectManager:
             traceback.print_exc()
             return False
 
-    def generate_batch_nfts(self, count):
+    def get_render_workers(self):
+        """Number of render processes to use for batches (0 or unset = one per CPU core)"""
+        workers = self.project_data['generation_settings'].get('render_workers', 0)
+        return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+    def generate_batch_nfts(self, count, workers=None, progress_callback=None, should_cancel=None,
+                            resume_batch_id=None, output_options=None, max_loop_ms=None):
+        """
+        Generate count editions using a pool of render workers
+        progress_callback(done, total, edition) is called as each edition is committed and
+        should_cancel() is polled to stop the batch early; output_options (see get_output_options)
+        and max_loop_ms replace the project's settings for this batch only. Returns the
+        number generated
+        """
         if not self.project_path:
             return False
 
-        success_count = 0
-        for i in range(count):
-            if self.generate_single_nft():
-                success_count += 1
-            else:
-                break
+        if not self.get_artists_with_layers():
+            print("No artists with layers found!")
+            return 0
+
+        renderer = BatchRenderer(self, workers or self.get_render_workers())
+        success_count = renderer.run(count=count, progress_callback=progress_callback,
+                                     should_cancel=should_cancel, mode='random', resume_batch_id=resume_batch_id,
+                                     output_options=output_options, max_loop_ms=max_loop_ms)
+        self._report_batch_stats(renderer)
+
+        # Worker processes keep their own caches; only in-process renders use this one
+        if renderer.workers == 1:
+            cache_stats = get_layer_cache_stats()
+            print(f"Layer cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                  f"{cache_stats['current_bytes'] / (1024 * 1024):.0f}MB in use")
 
         return success_count
 
+    def generate_all_unique_nfts(self, max_count=None, shuffle=None, seed=None, workers=None,
+                                 progress_callback=None, should_cancel=None, resume_batch_id=None,
+                                 output_options=None, max_loop_ms=None):
+        """
+        Generate every remaining unique combination (or the first max_count of them)
+        output_options and max_loop_ms replace the project's settings for this batch only
+        """
+        if not self.project_path:
+            return False
+
+        renderer = BatchRenderer(self, workers or self.get_render_workers())
+        success_count = renderer.run(count=max_count,
+                                     combinations=self.iter_unique_combinations(shuffle=shuffle, seed=seed),
+                                     progress_callback=progress_callback, should_cancel=should_cancel,
+                                     mode='all_unique', resume_batch_id=resume_batch_id,
+                                     output_options=output_options, max_loop_ms=max_loop_ms)
+        self._report_batch_stats(renderer)
+        return success_count
+
+    def _report_batch_stats(self, renderer):
+        self.last_batch_stats = dict(renderer.stats)
+        stats = renderer.stats
+        if stats['editions']:
+            print(f"Prefix reuse: {stats['reused_layers']} of {stats['layers']} layers "
+                  f"({stats['reuse_ratio']:.0%}) came from shared composites")
+
     def get_possible_combinations_count(self):
         """Calculate total possible unique combinations"""
         if not self.project_data['artists']:
@@ -485,17 +1077,58 @@ class ProjectManager:
         """Get generation statistics"""
         possible = self.get_possible_combinations_count()
         generated = self.project_data['generation_state']['generated_count']
-        unique = self.project_data['generation_state']['unique_combinations']
+        unique = len(self.get_combination_index()) if self.project_path else 0
 
         return {
             'possible_combinations': possible,
             'generated_count': generated,
             'unique_combinations': unique,
-            'remaining_unique': possible - unique if possible > unique else 0
+            'remaining_unique': possible - unique if possible > unique else 0,
+            'layer_cache': get_layer_cache_stats(),
+            'last_batch': self.last_batch_stats
         }
 
-    def generate_preview_for_combination(self, combination):
-        """Generate preview for a specific combination"""
+    def render_preview(self, combination, profile='preview'):
+        """
+        Render a combination in memory at the given render profile's size
+        Returns a PIL image or (frames, durations) like compose_layers, or None if no layer
+        file exists. Recent previews are cached by their layers and settings, so results must
+        not be modified in place.
+        """
+        if not self.project_path:
+            return None
+
+        # Convert combination to layer composition format, skipping missing files
+        layer_composition = self.build_layer_composition(combination, skip_missing=True)
+        if not layer_composition:
+            print("No valid layers found for preview")
+            return None
+
+        size = self.get_render_size(profile)
+        max_loop_ms = self.get_max_loop_ms()
+        cache_key = (size, max_loop_ms) + tuple(
+            (layer['file_path'], os.path.getmtime(layer['file_path']), layer['z_index'], layer['opacity'],
+             layer['blend_mode'])
+            for layer in layer_composition
+        )
+        return self._preview_cache.get_or_create(
+            cache_key, lambda: compose_layers(layer_composition, size=size, max_loop_ms=max_loop_ms))
+
+    def create_preview_graph(self, combination, profile='preview'):
+        """
+        Build a CompositionGraph for live previews of a combination while its layer settings
+        are edited, or None when no layer file exists
+        """
+        if not self.project_path:
+            return None
+
+        layer_composition = self.build_layer_composition(combination, skip_missing=True)
+        if not layer_composition:
+            return None
+        return CompositionGraph(layer_composition, self.get_render_size(profile), self.get_max_loop_ms())
+
+    def generate_preview_for_combination(self, combination, profile='preview'):
+        """Generate preview for a specific combination at the given render profile's size"""
         if not self.project_path:
             return None
 
@@ -503,48 +1136,12 @@ class ProjectManager:
             preview_path = os.path.join(self.project_path, 'workspace', 'previews', 'combination_preview')
             ensure_directory(os.path.dirname(preview_path))
 
-            # Convert combination to layer composition format
-            layer_composition = []
-            for artist_name, layer_data in combination.items():
-                # Check if file exists before adding to composition
-                if os.path.exists(layer_data['file_path']):
-                    layer_composition.append({
-                        'artist': artist_name,
-                        'layer_name': layer_data['file_name'],
-                        'display_name': layer_data['display_name'],
-                        'file_path': layer_data['file_path'],
-                        'z_index': layer_data.get('layer_index', 1),  # Use layer index for z-index
-                        'blend_mode': 'normal',
-                        'opacity': layer_data.get('opacity', 1.0)
-                    })
-
-            if not layer_composition:
-                print("No valid layers found for preview")
+            result = self.render_preview(combination, profile)
+            if result is None:
                 return None
 
-            # Sort by layer index (z-index) - lower numbers rendered first
-            layer_composition.sort(key=lambda x: x['z_index'])
-
-            # Compose image
-            result = compose_layers(layer_composition)
-
-            if isinstance(result, tuple):  # GIF result
-                frames, durations = result
-                preview_path += '.gif'
-                frames[0].save(
-                    preview_path,
-                    format='GIF',
-                    save_all=True,
-                    append_images=frames[1:],
-                    duration=durations,
-                    loop=0,
-                    optimize=True
-                )
-            else:  # Static image
-                preview_path += '.png'
-                result.save(preview_path, 'PNG')
-
-            return preview_path
+            palette_key = composition_palette_key(self.build_layer_composition(combination, skip_missing=True))
+            return save_composition(result, preview_path, palette_key=palette_key, **self.get_output_options())
         except Exception as e:
             print(f"Error generating preview: {e}")
             import traceback
@@ -553,70 +1150,81 @@ class ProjectManager:
 
     def get_all_generated_nfts(self):
         """Get list of all generated NFTs with their metadata"""
-        if not self.project_path:
-            return []
+        return self.get_generated_nfts()
 
-        generated_dir = os.path.join(self.project_path, 'workspace', 'generated')
-        if not os.path.exists(generated_dir):
+    def get_generated_nfts(self, offset=0, limit=None):
+        """Get a page of generated NFTs in edition order (all of them from offset when limit is None)"""
+        if self.edition_index is None:
             return []
+        return [self._nft_from_index(entry) for entry in self.edition_index.page(offset, -1 if limit is None else limit)]
 
-        nfts = []
-        # Get all PNG and GIF files
-        for file_name in os.listdir(generated_dir):
-            if file_name.endswith('.png') or file_name.endswith('.gif'):
-                edition = file_name.split('.')[0]
-                metadata_path = os.path.join(generated_dir, f"{edition}.json")
-                image_path = os.path.join(generated_dir, file_name)
+    def get_generated_editions(self):
+        """Sorted edition numbers of all generated NFTs, without reading their metadata"""
+        if self.edition_index is None:
+            return []
+        return self.edition_index.editions()
 
-                if os.path.exists(metadata_path):
-                    try:
-                        with open(metadata_path, 'r') as f:
-                            metadata = json.load(f)
-                        nfts.append({
-                            'edition': edition,
-                            'image_path': image_path,
-                            'metadata': metadata
-                        })
-                    except Exception as e:
-                        print(f"Error loading metadata for {edition}: {e}")
+    def get_latest_generated_nft(self):
+        """Get the highest-numbered generated NFT, or None"""
+        if self.edition_index is None:
+            return None
+        entry = self.edition_index.latest()
+        return self._nft_from_index(entry) if entry else None
 
-        # Sort by edition number
-        nfts.sort(key=lambda x: int(x['edition']))
-        return nfts
+    def get_thumbnail_dir(self):
+        """Directory of cached gallery thumbnails (see get_thumbnail_path)"""
+        if not self.project_path:
+            return None
+        return os.path.join(self.project_path, 'workspace', 'thumbnails')
+
+    def get_generated_nft(self, edition):
+        """
+        Get image path, poster path and metadata of a single generated edition, or None
+        image_path is the animation of animated editions; poster_path is always a static PNG
+        """
+        if self.edition_index is None:
+            return None
+        entry = self.edition_index.get(int(edition))
+        return self._nft_from_index(entry) if entry else None
+
+    def _nft_from_index(self, entry):
+        image_path = os.path.join(self.project_path, 'workspace', 'generated', entry['image'])
+        poster_path = get_poster_path(image_path)
+        # Animations rendered before posters existed have none
+        if is_animation_path(image_path) and not os.path.exists(poster_path):
+            poster_path = image_path
+        return {
+            'edition': str(entry['edition']),
+            'image_path': image_path,
+            'poster_path': poster_path,
+            'metadata': entry['metadata'],
+            'combination_key': entry['combination_key'],
+            'file_size': entry['file_size']
+        }
 
     def get_latest_preview(self):
         if not self.project_path:
             return None
-        preview_path_png = os.path.join(self.project_path, 'workspace', 'previews', 'current_preview.png')
-        preview_path_gif = os.path.join(self.project_path, 'workspace', 'previews', 'current_preview.gif')
-
-        if os.path.exists(preview_path_gif):
-            return preview_path_gif
-        elif os.path.exists(preview_path_png):
-            return preview_path_png
-        else:
-            return None
+        return find_composition_file(os.path.join(self.project_path, 'workspace', 'previews', 'current_preview'))
 
     def get_latest_metadata(self):
         if not self.project_path:
             return {}
-        edition = self.project_data['generation_state']['current_edition']
-        if edition > 0:
-            metadata_path = os.path.join(self.project_path, 'workspace', 'generated', f'{edition}.json')
-            if os.path.exists(metadata_path):
-                with open(metadata_path, 'r') as f:
-                    return json.load(f)
-        return {}
+        nft = self.get_latest_generated_nft()
+        return nft['metadata'] if nft else {}
 
     def is_project_loaded(self):
         """Check if a project is currently loaded"""
         return self.project_path is not None
 
-    def resize_all_layers_to_2000x2000(self):
-        """Resize all existing layer images to 2000x2000px"""
+    def resize_all_layers(self, size=None):
+        """Resize all existing layer images to the final render size (or size x size px)"""
         if not self.project_path:
             return False
 
+        if size is None:
+            size = self.get_render_size('final')
+
         try:
             from PIL import Image
 
@@ -627,19 +1235,19 @@ class ProjectManager:
                     if os.path.exists(file_path) and not file_path.lower().endswith('.gif'):
                         try:
                             with Image.open(file_path) as img:
-                                if img.size != (2000, 2000):
-                                    resized_img = resize_image_to_2000x2000(img)
+                                if img.size != (size, size):
+                                    resized_img = resize_image_to_fit(img, size)
                                     resized_img.save(file_path, 'PNG')
                                     resized_count += 1
-                                    print(f"Resized {file_path} to 2000x2000")
+                                    print(f"Resized {file_path} to {size}x{size}")
                         except Exception as e:
                             print(f"Error resizing {file_path}: {e}")
 
-            print(f"Resized {resized_count} images to 2000x2000px")
+            print(f"Resized {resized_count} images to {size}x{size}px")
             return True
 
         except Exception as e:
-            print(f"Error in resize_all_layers_to_2000x2000: {e}")
+            print(f"Error in resize_all_layers: {e}")
             return False
 
     def validate_all_layer_files(self):
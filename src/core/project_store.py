@@ -0,0 +1,215 @@
+import os
+import json
+import sqlite3
+from ..utils.file_utils import write_file_atomic
+
+# project_data sections stored as one row per key by the SQLite store
+SETTING_SECTIONS = ('project_info', 'generation_settings', 'generation_state')
+
+
+class JsonProjectStore:
+    """
+    The default project storage: all of project_data serialized to config/project.json.
+    Every save rewrites the whole file, so change hints are ignored.
+    """
+
+    BACKEND = 'json'
+    FILE_NAME = 'project.json'
+
+    def __init__(self, project_path):
+        self.path = os.path.join(project_path, 'config', self.FILE_NAME)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def save(self, project_data, changes=None):
+        # Write to a temp file and rename over the config so a crash never leaves it truncated
+        write_file_atomic(self.path, json.dumps(project_data, indent=2))
+
+    def close(self):
+        pass
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+class SqliteProjectStore:
+    """
+    Optional project storage in config/project.sqlite with a row per setting, artist and layer.
+    save() takes the set of changes since the last save (see ProjectManager.mark_dirty):
+    ('setting', section, key), ('section', section), ('layer', artist, file_name) or
+    ('artist', artist), and writes only those rows in one transaction, so editing a layer
+    is a single-row UPDATE however large the project is. changes=None rewrites everything.
+    Generated editions and their combination keys are not stored here: the journal and
+    the indexes derived from it (EditionIndex, CombinationIndex) hold them.
+    """
+
+    BACKEND = 'sqlite'
+    FILE_NAME = 'project.sqlite'
+    SCHEMA_VERSION = 1
+
+    def __init__(self, project_path):
+        self.path = os.path.join(project_path, 'config', self.FILE_NAME)
+        self._connection = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        if self._connection is None:
+            # Saves happen under ProjectManager's state lock, on whichever thread flushes
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            if self._connection.execute('PRAGMA user_version').fetchone()[0] == 0:
+                self._connection.executescript(f"""
+                    CREATE TABLE settings (
+                        section TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        PRIMARY KEY (section, key)
+                    );
+                    CREATE TABLE artists (
+                        name TEXT PRIMARY KEY,
+                        position INTEGER NOT NULL,
+                        data TEXT NOT NULL
+                    );
+                    CREATE TABLE layers (
+                        artist TEXT NOT NULL,
+                        file_name TEXT NOT NULL,
+                        position INTEGER NOT NULL,
+                        rarity_weight REAL,
+                        data TEXT NOT NULL,
+                        PRIMARY KEY (artist, file_name)
+                    );
+                    CREATE INDEX layers_by_position ON layers (artist, position);
+                    PRAGMA user_version = {self.SCHEMA_VERSION};
+                """)
+        return self._connection
+
+    def load(self):
+        connection = self._connect()
+        project_data = {section: {} for section in SETTING_SECTIONS}
+        project_data['artists'] = {}
+        project_data['artist_order'] = []
+
+        for section, key, value in connection.execute('SELECT section, key, value FROM settings'):
+            if section == 'project':
+                project_data[key] = json.loads(value)
+            else:
+                project_data.setdefault(section, {})[key] = json.loads(value)
+
+        for name, data in connection.execute('SELECT name, data FROM artists ORDER BY position'):
+            artist = json.loads(data)
+            artist['layers'] = []
+            project_data['artists'][name] = artist
+
+        for artist_name, file_name, rarity_weight, data in connection.execute(
+                'SELECT artist, file_name, rarity_weight, data FROM layers ORDER BY artist, position'):
+            artist = project_data['artists'].get(artist_name)
+            if artist is None:
+                continue
+            artist['layers'].append(json.loads(data))
+            if rarity_weight is not None:
+                artist.setdefault('rarity_weights', {})[file_name] = rarity_weight
+        return project_data
+
+    def save(self, project_data, changes=None):
+        connection = self._connect()
+        with connection:
+            if changes is None:
+                connection.execute('DELETE FROM settings')
+                connection.execute('DELETE FROM artists')
+                connection.execute('DELETE FROM layers')
+                for section in SETTING_SECTIONS:
+                    self._write_section(connection, project_data, section)
+                # Other top-level entries (artist_order) are settings of the 'project' section
+                for key in project_data:
+                    if key != 'artists' and key not in SETTING_SECTIONS:
+                        self._write_setting(connection, project_data, 'project', key)
+                for artist_name in project_data['artists']:
+                    self._write_artist(connection, project_data, artist_name)
+                return
+
+            for change in changes:
+                kind = change[0]
+                if kind == 'setting':
+                    self._write_setting(connection, project_data, change[1], change[2])
+                elif kind == 'section':
+                    self._write_section(connection, project_data, change[1])
+                elif kind == 'artist':
+                    self._write_artist(connection, project_data, change[1])
+                elif kind == 'layer':
+                    self._write_layer(connection, project_data, change[1], change[2])
+
+    @staticmethod
+    def _write_setting(connection, project_data, section, key):
+        values = project_data if section == 'project' else project_data.get(section, {})
+        if key in values:
+            connection.execute('INSERT OR REPLACE INTO settings VALUES (?, ?, ?)',
+                               (section, key, json.dumps(values[key])))
+        else:
+            connection.execute('DELETE FROM settings WHERE section = ? AND key = ?', (section, key))
+
+    def _write_section(self, connection, project_data, section):
+        connection.execute('DELETE FROM settings WHERE section = ?', (section,))
+        for key in project_data.get(section, {}):
+            self._write_setting(connection, project_data, section, key)
+
+    def _write_artist(self, connection, project_data, artist_name):
+        """Rewrite an artist's row and all of its layer rows (or delete them if it was removed)"""
+        connection.execute('DELETE FROM layers WHERE artist = ?', (artist_name,))
+        artist = project_data['artists'].get(artist_name)
+        if artist is None:
+            connection.execute('DELETE FROM artists WHERE name = ?', (artist_name,))
+            return
+
+        # Weights of layers live on the layer rows; only weights of files that are not
+        # layers (if any) stay on the artist
+        layer_names = {layer['file_name'] for layer in artist['layers']}
+        data = {key: value for key, value in artist.items() if key not in ('layers', 'rarity_weights')}
+        data['rarity_weights'] = {file_name: weight for file_name, weight in artist.get('rarity_weights', {}).items()
+                                  if file_name not in layer_names}
+        position = list(project_data['artists']).index(artist_name)
+        connection.execute('INSERT OR REPLACE INTO artists VALUES (?, ?, ?)', (artist_name, position, json.dumps(data)))
+        for layer_position, layer in enumerate(artist['layers']):
+            connection.execute('INSERT OR REPLACE INTO layers VALUES (?, ?, ?, ?, ?)',
+                               (artist_name, layer['file_name'], layer_position,
+                                artist.get('rarity_weights', {}).get(layer['file_name']), json.dumps(layer)))
+
+    @staticmethod
+    def _write_layer(connection, project_data, artist_name, file_name):
+        artist = project_data['artists'].get(artist_name, {})
+        for layer in artist.get('layers', []):
+            if layer['file_name'] == file_name:
+                connection.execute('UPDATE layers SET rarity_weight = ?, data = ? WHERE artist = ? AND file_name = ?',
+                                   (artist.get('rarity_weights', {}).get(file_name), json.dumps(layer),
+                                    artist_name, file_name))
+                return
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def remove(self):
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+
+PROJECT_STORES = {store.BACKEND: store for store in (JsonProjectStore, SqliteProjectStore)}
+
+
+def open_project_store(project_path):
+    """The store a project was saved with (SQLite if config/project.sqlite exists), or None"""
+    for store_class in (SqliteProjectStore, JsonProjectStore):
+        store = store_class(project_path)
+        if store.exists():
+            return store
+    return None
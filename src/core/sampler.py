@@ -0,0 +1,57 @@
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw"""
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        self.size = count
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+
+        # All-zero weights fall back to a uniform choice
+        if total <= 0:
+            return
+
+        scaled = [weight * count / total for weight in weights]
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # Leftovers are 1.0 up to floating point error
+        for index in small + large:
+            self.probability[index] = 1.0
+
+    def sample(self, rng):
+        """Draw one index using a single uniform variate from rng"""
+        value = rng.random() * self.size
+        column = min(int(value), self.size - 1)
+        if value - column < self.probability[column]:
+            return column
+        return self.alias[column]
+
+
+class CombinationSampler:
+    """
+    Compiled weighted sampler over every artist's layers.
+    Built once from the rarity weights; the project manager rebuilds it only when
+    weights or the set of layers change.
+    """
+
+    def __init__(self, artists_with_layers):
+        self.artists_with_layers = artists_with_layers
+        self.tables = [AliasTable([layer.get('rarity_weight', 1.0) for layer in layers])
+                       for _, layers in artists_with_layers]
+
+    def sample(self, rng):
+        """Draw one layer index per artist (in artists_with_layers order)"""
+        return [table.sample(rng) for table in self.tables]
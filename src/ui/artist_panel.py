@@ -1,7 +1,7 @@
 import os
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
                              QListWidgetItem, QPushButton, QLabel, QMessageBox,
-                             QInputDialog, QFileDialog)
+                             QInputDialog, QFileDialog, QProgressDialog, QApplication)
 from PyQt6.QtCore import pyqtSignal, Qt
 from PyQt6.QtGui import QDragEnterEvent, QDropEvent
 
@@ -188,28 +188,47 @@ class ArtistPanel(QWidget):
         )
 
         if files:
-            success_count = 0
-            failed_files = []
+            self.import_layers(artist_name, files)
 
-            for file_path in files:
-                if self.project_manager.add_layer_to_artist(artist_name, file_path):
-                    success_count += 1
-                else:
-                    failed_files.append(os.path.basename(file_path))
+    def import_layers(self, artist_name, files, source_label=""):
+        """Bulk-import layer files for an artist with a progress dialog, then report per-file results"""
+        progress = QProgressDialog(f"Importing layers for {artist_name}...", "Cancel", 0, len(files), self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(500)
 
-            self.refresh_artist_layers(artist_name)
-            self.refresh_artists()  # Refresh to update layer counts
-            self.layers_changed.emit()  # NEW: Emit signal when layers change
-
-            if success_count > 0:
-                message = f"Added {success_count} layers to {artist_name}"
-                if failed_files:
-                    message += f"\nFailed to add {len(failed_files)} files: {', '.join(failed_files[:5])}"
-                    if len(failed_files) > 5:
-                        message += f"... and {len(failed_files) - 5} more"
-                QMessageBox.information(self, "Success", message)
-            else:
-                QMessageBox.warning(self, "Error", f"Failed to add any layers to {artist_name}")
+        def on_progress(done, total):
+            progress.setValue(done)
+            QApplication.processEvents()
+
+        results = self.project_manager.add_layers_to_artist(artist_name, files, progress_callback=on_progress,
+                                                            should_cancel=progress.wasCanceled)
+        progress.close()
+
+        self.refresh_artist_layers(artist_name)
+        self.refresh_artists()  # Refresh to update layer counts
+        self.layers_changed.emit()  # NEW: Emit signal when layers change
+
+        added = [result for result in results if result['status'] == 'added']
+        duplicates = [os.path.basename(result['source']) for result in results if result['status'] == 'duplicate']
+        failed_files = [os.path.basename(result['source']) for result in results if result['status'] == 'failed']
+        cancelled = [result for result in results if result['status'] == 'cancelled']
+
+        message = f"Added {len(added)} layers to {artist_name}{source_label}"
+        if duplicates:
+            message += f"\nSkipped {len(duplicates)} files already in {artist_name}'s layers: {', '.join(duplicates[:5])}"
+            if len(duplicates) > 5:
+                message += f"... and {len(duplicates) - 5} more"
+        if failed_files:
+            message += f"\nFailed to add {len(failed_files)} files: {', '.join(failed_files[:5])}"
+            if len(failed_files) > 5:
+                message += f"... and {len(failed_files) - 5} more"
+        if cancelled:
+            message += f"\nImport cancelled before {len(cancelled)} files"
+
+        if added or duplicates or cancelled:
+            QMessageBox.information(self, "Success", message)
+        else:
+            QMessageBox.warning(self, "Error", f"Failed to add any layers to {artist_name}{source_label}\n{message}")
 
     def on_artist_selected(self):
         if not self.project_manager.is_project_loaded():
@@ -254,26 +273,10 @@ class ArtistPanel(QWidget):
         display_text = current_item.text()
         artist_name = display_text.split(' (')[0]  # Remove layer count from display
 
-        success_count = 0
-        failed_files = []
-
-        for url in event.mimeData().urls():
-            file_path = url.toLocalFile()
-            if file_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-                if self.project_manager.add_layer_to_artist(artist_name, file_path):
-                    success_count += 1
-                else:
-                    failed_files.append(os.path.basename(file_path))
-
-        self.refresh_artist_layers(artist_name)
-        self.refresh_artists()  # Refresh to update layer counts
-        self.layers_changed.emit()  # NEW: Emit signal when layers change
-
-        if success_count > 0:
-            message = f"Added {success_count} layers to {artist_name} via drag & drop!"
-            if failed_files:
-                message += f"\nFailed to add {len(failed_files)} files"
-            QMessageBox.information(self, "Success", message)
+        files = [url.toLocalFile() for url in event.mimeData().urls()]
+        files = [file_path for file_path in files if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
+        if files:
+            self.import_layers(artist_name, files, " via drag & drop")
         else:
             QMessageBox.warning(self, "Error", "Failed to add any layers via drag & drop")
 
@@ -0,0 +1,161 @@
+from bisect import bisect_left
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QAbstractListModel, QModelIndex, QSize, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QIcon, QColor
+from ..utils.image_utils import get_thumbnail_path
+from ..utils.layer_cache import LRUCache
+
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(int, int, QImage)  # Model generation, edition, thumbnail (null if it failed)
+
+
+class ThumbnailTask(QRunnable):
+    """Creates (or reads back) the cached thumbnail of one edition on a worker thread"""
+
+    def __init__(self, signals, generation, edition, image_path, thumbnail_dir, size, icon_size):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.edition = edition
+        self.image_path = image_path
+        self.thumbnail_dir = thumbnail_dir
+        self.size = size
+        self.icon_size = icon_size
+
+    def run(self):
+        # QImage (unlike QPixmap) may be built off the GUI thread
+        image = QImage()
+        thumbnail_path = get_thumbnail_path(self.image_path, self.thumbnail_dir, self.size)
+        if thumbnail_path is not None and image.load(thumbnail_path):
+            image = image.scaled(self.icon_size, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        self.signals.loaded.emit(self.generation, self.edition, image)
+
+
+class GalleryModel(QAbstractListModel):
+    """
+    List model of the generated editions that only touches what the view shows
+    Rows are edition numbers; an edition's metadata is read the first time its row is
+    displayed, and its thumbnail is made by a worker pool from the static image and cached
+    under workspace/thumbnails. Rows show a placeholder icon until their thumbnail arrives.
+    Use with a view that has uniform item sizes, or it will ask for every row up front.
+    """
+
+    NFT_ROLE = Qt.ItemDataRole.UserRole
+
+    # Thread count of the thumbnail pool; decoding a 2000px PNG dominates, so a few suffice
+    THUMBNAIL_WORKERS = 4
+
+    # Rows whose NFT data and icon stay in memory after scrolling past them
+    MAX_CACHED_ROWS = 2000
+
+    def __init__(self, project_manager, icon_size=QSize(50, 50), parent=None):
+        super().__init__(parent)
+        self.project_manager = project_manager
+        self.icon_size = icon_size
+        self.editions = []
+        # Least recently shown rows are dropped first; sizes count entries, not bytes
+        self._nfts = LRUCache(self.MAX_CACHED_ROWS, sizeof=lambda nft: 1)  # Edition -> NFT data or None
+        self._icons = LRUCache(self.MAX_CACHED_ROWS, sizeof=lambda icon: 1)  # Edition -> thumbnail icon
+        self._requested = set()  # Editions with a thumbnail task queued or running
+        self._generation = 0  # Bumped on reset so late thumbnails of an old project are dropped
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(self.THUMBNAIL_WORKERS)
+        self._signals = ThumbnailSignals(self)
+        self._signals.loaded.connect(self._on_thumbnail_loaded)
+
+        placeholder = QPixmap(icon_size)
+        placeholder.fill(QColor('#3d3d3d'))
+        self._placeholder = QIcon(placeholder)
+
+    def refresh(self):
+        """Reload the list of editions from the project"""
+        self.beginResetModel()
+        self._generation += 1
+        self._pool.clear()
+        self.editions = self.project_manager.get_generated_editions()
+        self._nfts.clear()
+        self._icons.clear()
+        self._requested.clear()
+        self.endResetModel()
+
+    def add_nft(self, nft):
+        """Append a newly generated edition, reusing the NFT data already at hand"""
+        edition = int(nft['edition'])
+        self._nfts.put(edition, nft)
+        row = self._row_of(edition)
+        if row is not None:
+            self._icons.put(edition, None)
+            self.dataChanged.emit(self.index(row), self.index(row))
+            return
+
+        row = bisect_left(self.editions, edition)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.editions.insert(row, edition)
+        self.endInsertRows()
+
+    def nft(self, row):
+        """NFT data (edition, image_path, poster_path, metadata) of a row, or None"""
+        if not 0 <= row < len(self.editions):
+            return None
+        edition = self.editions[row]
+        if edition in self._nfts:
+            return self._nfts.get(edition)
+        return self._nfts.put(edition, self.project_manager.get_generated_nft(edition))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.editions)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        edition = self.editions[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            nft = self.nft(index.row())
+            name = nft['metadata'].get('name', 'Unknown') if nft else 'Unavailable'
+            return f"#{edition} - {name}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            icon = self._icons.get(edition)
+            if icon is None:
+                self._request_thumbnail(index.row())
+                return self._placeholder
+            return icon
+        if role == self.NFT_ROLE:
+            return self.nft(index.row())
+        return None
+
+    def _request_thumbnail(self, row):
+        edition = self.editions[row]
+        nft = self.nft(row)
+        if nft is None or edition in self._requested:
+            return
+        self._requested.add(edition)
+        # Thumbnails come from the static image (the poster of animated editions)
+        self._pool.start(ThumbnailTask(self._signals, self._generation, edition,
+                                       nft.get('poster_path', nft['image_path']),
+                                       self.project_manager.get_thumbnail_dir(),
+                                       self.project_manager.get_render_size('thumbnail'), self.icon_size))
+
+    def _on_thumbnail_loaded(self, generation, edition, image):
+        if generation != self._generation:
+            return
+        self._requested.discard(edition)
+        self._icons.put(edition, QIcon(QPixmap.fromImage(image)) if not image.isNull() else self._placeholder)
+
+        row = self._row_of(edition)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def _row_of(self, edition):
+        # Editions are kept sorted
+        row = bisect_left(self.editions, edition)
+        return row if row < len(self.editions) and self.editions[row] == edition else None
+
+    def shutdown(self):
+        """Drop queued thumbnail tasks and wait for running ones (call before the app quits)"""
+        self._generation += 1
+        self._pool.clear()
+        self._pool.waitForDone()
@@ -1,8 +1,11 @@
 import os
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
-                             QListWidgetItem, QLabel, QScrollArea, QSplitter)
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QPixmap, QIcon, QMovie
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView,
+                             QLabel, QScrollArea, QSplitter)
+from PyQt6.QtCore import Qt, QSize, pyqtSignal
+from PyQt6.QtGui import QPixmap, QMovie
+from ..utils.image_utils import is_animation_path
+from .preview_player import movie_supports
+from .gallery_model import GalleryModel
 
 
 class GalleryPanel(QWidget):
@@ -26,21 +29,25 @@ class GalleryPanel(QWidget):
         splitter = QSplitter(Qt.Orientation.Horizontal)
         layout.addWidget(splitter)
 
-        # Left side - NFT list
-        self.nft_list = QListWidget()
-        self.nft_list.itemSelectionChanged.connect(self.on_nft_selected)
+        # Left side - NFT list; only visible rows are materialized, thumbnails load in the background
+        self.nft_model = GalleryModel(self.project_manager, QSize(50, 50), self)
+        self.nft_list = QListView()
+        self.nft_list.setModel(self.nft_model)
+        self.nft_list.setUniformItemSizes(True)
+        self.nft_list.setIconSize(QSize(50, 50))
+        self.nft_list.selectionModel().currentChanged.connect(self.on_nft_selected)
         self.nft_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background: #2d2d2d;
                 color: #f0f0f0;
                 border: 1px solid #444444;
                 border-radius: 4px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 8px;
                 border-bottom: 1px solid #3d3d3d;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background: #2a82da;
                 color: #f0f0f0;
             }
@@ -81,78 +88,41 @@ class GalleryPanel(QWidget):
 
     def refresh_gallery(self):
         """Refresh the gallery with all generated NFTs"""
-        self.nft_list.clear()
-
         # Stop any currently playing GIF
         if self.current_movie:
             self.current_movie.stop()
             self.current_movie = None
 
+        self.nft_model.refresh()
         if not self.project_manager.is_project_loaded():
             self.nft_info.setText("No project loaded")
             return
 
-        nfts = self.project_manager.get_all_generated_nfts()
-
-        for nft in nfts:
-            edition = nft['edition']
-            metadata = nft['metadata']
-
-            item_text = f"#{edition} - {metadata.get('name', 'Unknown')}"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.ItemDataRole.UserRole, nft)
-
-            # Try to load thumbnail
-            thumb_path = nft['image_path']
-            if os.path.exists(thumb_path):
-                if thumb_path.lower().endswith('.gif'):
-                    # For GIFs, use first frame as thumbnail
-                    try:
-                        from PIL import Image
-                        gif = Image.open(thumb_path)
-                        gif.seek(0)
-                        thumb = gif.copy()
-                        thumb = thumb.convert('RGBA')
-                        # Create thumbnail (50x50)
-                        thumb = thumb.resize((50, 50), Image.Resampling.LANCZOS)
-                        # Convert PIL Image to QPixmap
-                        from PIL.ImageQt import ImageQt
-                        qim = ImageQt(thumb)
-                        pixmap = QPixmap.fromImage(qim)
-                        icon = QIcon(pixmap)
-                        item.setIcon(icon)
-                    except Exception as e:
-                        print(f"Error creating GIF thumbnail: {e}")
-                else:
-                    # For PNGs
-                    pixmap = QPixmap(thumb_path)
-                    if not pixmap.isNull():
-                        # Create thumbnail (50x50)
-                        thumb = pixmap.scaled(50, 50, Qt.AspectRatioMode.KeepAspectRatio,
-                                              Qt.TransformationMode.SmoothTransformation)
-                        # Convert QPixmap to QIcon
-                        icon = QIcon(thumb)
-                        item.setIcon(icon)
-
-            self.nft_list.addItem(item)
-
         # Update status
-        if nfts:
-            self.nft_info.setText(f"Loaded {len(nfts)} NFTs")
-            # Select the first item if there are NFTs
-            if self.nft_list.count() > 0:
-                self.nft_list.setCurrentRow(0)
+        count = self.nft_model.rowCount()
+        if count:
+            self.nft_info.setText(f"Loaded {count} NFTs")
+            # Select the first NFT
+            self.nft_list.setCurrentIndex(self.nft_model.index(0))
         else:
             self.nft_info.setText("No NFTs generated yet")
 
-    def on_nft_selected(self):
+    def add_nft(self, nft):
+        """Append a newly generated NFT without rebuilding the whole gallery"""
+        self.nft_model.add_nft(nft)
+        self.nft_info.setText(f"Loaded {self.nft_model.rowCount()} NFTs")
+
+    def on_nft_selected(self, current, previous=None):
         """When NFT is selected in the list"""
-        current_item = self.nft_list.currentItem()
-        if current_item:
-            nft_data = current_item.data(Qt.ItemDataRole.UserRole)
+        nft_data = self.nft_model.nft(current.row()) if current.isValid() else None
+        if nft_data:
             self.show_nft_preview(nft_data)
             self.nft_selected.emit(nft_data)
 
+    def shutdown(self):
+        """Stop the thumbnail workers (call before the window closes)"""
+        self.nft_model.shutdown()
+
     def show_nft_preview(self, nft_data):
         """Show large preview of selected NFT"""
         image_path = nft_data['image_path']
@@ -164,16 +134,16 @@ class GalleryPanel(QWidget):
             self.current_movie = None
 
         if os.path.exists(image_path):
-            if image_path.lower().endswith('.gif'):
-                # Handle GIF preview with animation
+            if is_animation_path(image_path) and movie_supports(image_path):
+                # Handle animated preview
                 self.large_preview.setText("")  # Clear text
                 self.current_movie = QMovie(image_path)
                 self.current_movie.setScaledSize(self.large_preview.size())
                 self.large_preview.setMovie(self.current_movie)
                 self.current_movie.start()
             else:
-                # Handle PNG preview
-                pixmap = QPixmap(image_path)
+                # Handle PNG preview (or the poster of an animation Qt can't play)
+                pixmap = QPixmap(nft_data.get('poster_path', image_path))
                 if not pixmap.isNull():
                     # Scale to fit preview area while maintaining aspect ratio
                     scaled_pixmap = pixmap.scaled(380, 380, Qt.AspectRatioMode.KeepAspectRatio,
@@ -190,7 +160,7 @@ class GalleryPanel(QWidget):
         # Show NFT info
         info_text = f"Edition: #{nft_data['edition']}\n"
         info_text += f"Name: {metadata.get('name', 'Unknown')}\n"
-        info_text += f"File Type: {'GIF' if image_path.lower().endswith('.gif') else 'PNG'}\n"
+        info_text += f"File Type: {os.path.splitext(image_path)[1].lstrip('.').upper()}\n"
         info_text += f"Attributes: {len(metadata.get('attributes', []))} traits\n"
 
         # Add attributes
@@ -0,0 +1,69 @@
+import time
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
+
+
+class GenerationWorker(QObject):
+    """Runs batch or full-collection generation on a background QThread"""
+    progress = pyqtSignal(int, int, float, float)  # done, total, NFTs/sec, ETA seconds (-1 if unknown)
+    edition_finished = pyqtSignal(dict)  # Generated NFT data (edition, image_path, metadata)
+    finished = pyqtSignal(int)  # Number of editions generated
+    failed = pyqtSignal(str)
+
+    def __init__(self, project_manager, count=None, all_unique=False, resume=False):
+        super().__init__()
+        self.project_manager = project_manager
+        self.count = count
+        self.all_unique = all_unique
+        self.resume = resume
+        self.total = count or 0
+        self._cancelled = False
+        self._start_time = None
+
+    def cancel(self):
+        """Request cooperative cancellation; in-flight renders stop at their next layer or frame"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        self._start_time = time.perf_counter()
+        try:
+            if self.resume:
+                success_count = self.project_manager.resume_interrupted_batch(
+                    progress_callback=self.on_progress, should_cancel=self.is_cancelled)
+            elif self.all_unique:
+                self.total = self.count or self.project_manager.get_generation_stats()['remaining_unique']
+                success_count = self.project_manager.generate_all_unique_nfts(
+                    max_count=self.count, progress_callback=self.on_progress, should_cancel=self.is_cancelled)
+            else:
+                success_count = self.project_manager.generate_batch_nfts(
+                    self.count, progress_callback=self.on_progress, should_cancel=self.is_cancelled)
+            self.finished.emit(success_count or 0)
+        except Exception as e:
+            print(f"Error in generation worker: {e}")
+            import traceback
+            traceback.print_exc()
+            self.failed.emit(str(e))
+
+    def on_progress(self, done, total, edition):
+        elapsed = time.perf_counter() - self._start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 and self.total else -1.0
+        self.progress.emit(done, self.total, rate, eta)
+
+        nft = self.project_manager.get_generated_nft(edition)
+        if nft:
+            self.edition_finished.emit(nft)
+
+
+def start_generation_thread(worker):
+    """Move worker to a new QThread, start it, and return the thread"""
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    # quit() is thread-safe; a direct connection stops the thread even while the GUI waits on it
+    worker.finished.connect(thread.quit, Qt.ConnectionType.DirectConnection)
+    worker.failed.connect(thread.quit, Qt.ConnectionType.DirectConnection)
+    thread.start()
+    return thread
@@ -10,6 +10,9 @@ from ..core.project_manager import ProjectManager
 from .artist_panel import ArtistPanel
 from .rarity_panel import RarityPanel
 from .gallery_panel import GalleryPanel
+from .generation_worker import GenerationWorker, start_generation_thread
+from .preview_player import show_composition, movie_supports
+from ..utils.image_utils import is_animation_path
 
 
 class MainWindow(QMainWindow):
@@ -17,6 +20,11 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.project_manager = ProjectManager()
         self.current_preview_movie = None  # Track current preview GIF
+        self.preview_player = None  # Plays in-memory animated previews
+        self.preview_graph = None  # Re-composites the shown static preview as layer settings change
+        self.generation_thread = None  # Background generation run, if any
+        self.generation_worker = None
+        self.generation_progress = None
         self.apply_dark_theme()
         self.init_ui()
 
@@ -126,6 +134,7 @@ class MainWindow(QMainWindow):
         # Connect signals
         self.artist_panel.artists_changed.connect(self.rarity_panel.refresh_artists)
         self.artist_panel.layers_changed.connect(self.rarity_panel.refresh_artists)
+        self.rarity_panel.layer_settings_changed.connect(self.on_layer_settings_changed)
 
     def setup_generation_tab(self):
         """Setup the generation tab with artists, rarity, and controls"""
@@ -347,6 +356,7 @@ class MainWindow(QMainWindow):
                 self.update_project_status()
 
                 QMessageBox.information(self, "Success", "Project loaded!")
+                self.offer_batch_resume()
             else:
                 QMessageBox.warning(self, "Error", "Failed to load project")
 
@@ -372,29 +382,17 @@ class MainWindow(QMainWindow):
             return
 
         # Stop any currently playing preview GIF
-        if self.current_preview_movie:
-            self.current_preview_movie.stop()
-            self.current_preview_movie = None
+        self.stop_preview_animation()
+        self.preview_graph = None
 
         combination, combination_key = self.project_manager.generate_random_combination()
         if combination:
-            preview_path = self.project_manager.generate_preview_for_combination(combination)
-            if preview_path and os.path.exists(preview_path):
-                if preview_path.lower().endswith('.gif'):
-                    # Handle GIF preview with animation
-                    self.current_preview_movie = QMovie(preview_path)
-                    self.current_preview_movie.setScaledSize(self.preview_label.size())
-                    self.preview_label.setMovie(self.current_preview_movie)
-                    self.current_preview_movie.start()
-                    self.preview_label.setText("")  # Clear text
-                else:
-                    # Handle PNG preview
-                    pixmap = QPixmap(preview_path)
-                    if not pixmap.isNull():
-                        scaled_pixmap = pixmap.scaled(300, 300, Qt.AspectRatioMode.KeepAspectRatio,
-                                                      Qt.TransformationMode.SmoothTransformation)
-                        self.preview_label.setPixmap(scaled_pixmap)
-                        self.preview_label.setText("")  # Clear text when image is shown
+            # Rendered in memory and handed straight to Qt, no file round-trip
+            result = self.project_manager.render_preview(combination)
+            if result is not None:
+                self.preview_label.setText("")  # Clear text
+                self.preview_player = show_composition(self.preview_label, result, self)
+            self.preview_graph = self.project_manager.create_preview_graph(combination)
 
             # Show combination info
             combo_text = "Preview Combination:\n"
@@ -403,12 +401,32 @@ class MainWindow(QMainWindow):
                 combo_text += f"• {artist}: {layer['display_name']} ({file_type})\n"
             self.preview_label.setToolTip(combo_text)
 
-    def clear_preview(self):
-        """Clear the preview area"""
-        # Stop any currently playing preview GIF
+    def on_layer_settings_changed(self, artist_name, layer_name):
+        """Live-update the preview when a layer it shows has its opacity or stack order changed"""
+        if self.preview_graph is None or not self.preview_graph.has_layer(artist_name, layer_name):
+            return
+
+        result = self.preview_graph.update_layer(
+            artist_name,
+            opacity=self.project_manager.get_layer_opacity(artist_name, layer_name),
+            z_index=self.project_manager.get_layer_index(artist_name, layer_name))
+        self.stop_preview_animation()
+        self.preview_player = show_composition(self.preview_label, result, self)
+
+    def stop_preview_animation(self):
+        """Stop whichever animation (GIF file or in-memory frames) is playing in the preview"""
         if self.current_preview_movie:
             self.current_preview_movie.stop()
             self.current_preview_movie = None
+        if self.preview_player:
+            self.preview_player.stop()
+            self.preview_player = None
+
+    def clear_preview(self):
+        """Clear the preview area"""
+        # Stop any currently playing preview GIF
+        self.stop_preview_animation()
+        self.preview_graph = None
 
         self.preview_label.clear()
         self.preview_label.setText("Preview will appear here")
@@ -430,26 +448,24 @@ class MainWindow(QMainWindow):
             self.gallery_panel.refresh_gallery()
 
             # Update preview with the newly generated NFT
-            nfts = self.project_manager.get_all_generated_nfts()
-            if nfts:
-                latest_nft = nfts[-1]
+            latest_nft = self.project_manager.get_latest_generated_nft()
+            if latest_nft:
                 image_path = latest_nft['image_path']
                 if os.path.exists(image_path):
                     # Stop any currently playing preview GIF
-                    if self.current_preview_movie:
-                        self.current_preview_movie.stop()
-                        self.current_preview_movie = None
+                    self.stop_preview_animation()
+                    self.preview_graph = None
 
-                    if image_path.lower().endswith('.gif'):
-                        # Show animated GIF
+                    if is_animation_path(image_path) and movie_supports(image_path):
+                        # Show the animation
                         self.current_preview_movie = QMovie(image_path)
                         self.current_preview_movie.setScaledSize(self.preview_label.size())
                         self.preview_label.setMovie(self.current_preview_movie)
                         self.current_preview_movie.start()
                         self.preview_label.setText("")
                     else:
-                        # Show static PNG
-                        pixmap = QPixmap(image_path)
+                        # Show static PNG (or the poster of an animation Qt can't play)
+                        pixmap = QPixmap(latest_nft['poster_path'])
                         if not pixmap.isNull():
                             scaled_pixmap = pixmap.scaled(300, 300, Qt.AspectRatioMode.KeepAspectRatio,
                                                           Qt.TransformationMode.SmoothTransformation)
@@ -479,42 +495,8 @@ class MainWindow(QMainWindow):
 
         count, ok = QInputDialog.getInt(self, "Batch Generation", "How many NFTs to generate?", 10, 1, 10000)
         if ok:
-            progress = QProgressDialog(f"Generating {count} NFTs...", "Cancel", 0, count, self)
-            progress.setWindowTitle("Generating NFTs")
-            progress.setStyleSheet("""
-                QProgressDialog {
-                    background: #232323;
-                    color: #f0f0f0;
-                }
-                QLabel {
-                    color: #f0f0f0;
-                }
-            """)
-            progress.show()
-
-            success_count = 0
-            for i in range(count):
-                if progress.wasCanceled():
-                    break
-
-                if self.project_manager.generate_single_nft():
-                    success_count += 1
-                    progress.setValue(i + 1)
-                    QApplication.processEvents()  # Update UI
-                else:
-                    break
-
-            progress.close()
-
-            # Refresh gallery and update display
-            self.gallery_panel.refresh_gallery()
-            self.update_stats_display()
-
-            if success_count == count:
-                QMessageBox.information(self, "Complete", f"Successfully generated {success_count} NFTs!")
-            else:
-                QMessageBox.information(self, "Complete",
-                                        f"Generated {success_count} out of {count} NFTs. May have run out of unique combinations.")
+            worker = GenerationWorker(self.project_manager, count=count)
+            self.start_generation(worker, "Generating NFTs", f"Generating {count} NFTs...", count)
 
     def generate_full_collection(self):
         if not self.check_project_loaded("generating full collection"):
@@ -539,38 +521,117 @@ class MainWindow(QMainWindow):
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
 
         if reply == QMessageBox.StandardButton.Yes:
-            progress = QProgressDialog(f"Generating {remaining} unique NFTs...", "Cancel", 0, remaining, self)
-            progress.setWindowTitle("Generating Full Collection")
-            progress.setStyleSheet("""
-                QProgressDialog {
-                    background: #232323;
-                    color: #f0f0f0;
-                }
-                QLabel {
-                    color: #f0f0f0;
-                }
-            """)
-            progress.show()
+            # Walks the remaining combinations directly instead of drawing random ones until unique
+            worker = GenerationWorker(self.project_manager, all_unique=True)
+            self.start_generation(worker, "Generating Full Collection",
+                                  f"Generating {remaining} unique NFTs...", remaining)
+
+    def offer_batch_resume(self):
+        """Offer to continue a batch that was interrupted by a crash"""
+        batch = self.project_manager.get_interrupted_batch()
+        if not batch:
+            return
 
-            success_count = 0
-            for i in range(remaining):
-                if progress.wasCanceled():
-                    break
+        remaining = batch['remaining']
+        if remaining is None:
+            remaining = self.project_manager.get_generation_stats()['remaining_unique']
+        if remaining <= 0:
+            return
 
-                if self.project_manager.generate_single_nft():
-                    success_count += 1
-                    progress.setValue(i + 1)
-                    QApplication.processEvents()
-                else:
-                    break
+        reply = QMessageBox.question(self, "Resume Generation",
+                                     f"A previous generation run stopped after {batch['committed']} NFTs.\n"
+                                     f"Resume it and generate the remaining {remaining:,}?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply == QMessageBox.StandardButton.Yes:
+            worker = GenerationWorker(self.project_manager, count=remaining, resume=True)
+            self.start_generation(worker, "Resuming Generation", f"Generating {remaining} NFTs...", remaining)
 
-            progress.close()
+    def start_generation(self, worker, title, label_text, total):
+        """Run a generation worker on a background thread with a non-blocking progress dialog"""
+        if self.generation_thread is not None:
+            QMessageBox.warning(self, "Busy", "A generation run is already in progress!")
+            return
 
-            # Refresh gallery and update display
-            self.gallery_panel.refresh_gallery()
-            self.update_stats_display()
+        progress = QProgressDialog(label_text, "Cancel", 0, total, self)
+        progress.setWindowTitle(title)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+        progress.setStyleSheet("""
+            QProgressDialog {
+                background: #232323;
+                color: #f0f0f0;
+            }
+            QLabel {
+                color: #f0f0f0;
+            }
+        """)
+        progress.setValue(0)
+        self.generation_progress = progress
+        self.generation_label = label_text
+        self.generation_total = total
+
+        # Slots are MainWindow methods so cross-thread signals are queued onto the GUI thread
+        worker.progress.connect(self.on_generation_progress)
+        worker.edition_finished.connect(self.on_edition_generated)
+        worker.finished.connect(self.on_generation_finished)
+        worker.failed.connect(self.on_generation_failed)
+        progress.canceled.connect(self.cancel_generation)
+
+        self.set_generation_controls_enabled(False)
+        self.generation_worker = worker
+        self.generation_thread = start_generation_thread(worker)
+        progress.show()
+
+    def cancel_generation(self):
+        """Ask the running worker to stop; called directly since its own event loop is busy rendering"""
+        if self.generation_worker is not None:
+            self.generation_worker.cancel()
+            self.generation_progress.setLabelText("Cancelling after in-flight renders stop...")
+
+    def set_generation_controls_enabled(self, enabled):
+        """Lock project-mutating controls while a background generation is running"""
+        for widget in (self.btn_generate_single, self.btn_generate_batch, self.btn_generate_full,
+                       self.btn_generate_preview, self.btn_new_project, self.btn_load_project,
+                       self.artist_panel, self.rarity_panel):
+            widget.setEnabled(enabled)
+
+    def on_generation_progress(self, done, total, rate, eta):
+        if self.generation_worker is None or self.generation_worker.is_cancelled():
+            return
+        self.generation_progress.setValue(done)
+        text = f"{self.generation_label}\n{done}/{total} done - {rate:.2f} NFTs/sec"
+        if eta >= 0:
+            text += f" - ETA {int(eta // 60)}m {int(eta % 60)}s"
+        self.generation_progress.setLabelText(text)
+
+    def on_edition_generated(self, nft):
+        """Show each edition in the gallery as soon as it is committed"""
+        self.gallery_panel.add_nft(nft)
+        self.metadata_display.setPlainText(json.dumps(nft['metadata'], indent=2))
+
+    def finish_generation(self):
+        self.generation_progress.close()
+        self.generation_thread.wait()
+        self.generation_thread = None
+        self.generation_worker = None
+        self.generation_progress = None
+        self.set_generation_controls_enabled(True)
+        self.update_stats_display()
+
+    def on_generation_finished(self, success_count):
+        total = self.generation_total
+        self.finish_generation()
+        if success_count == total:
+            QMessageBox.information(self, "Complete", f"Successfully generated {success_count} NFTs!")
+        else:
+            QMessageBox.information(self, "Complete",
+                                    f"Generated {success_count} out of {total} NFTs. "
+                                    f"Cancelled or ran out of unique combinations.")
 
-            QMessageBox.information(self, "Complete", f"Generated {success_count} new unique NFTs!")
+    def on_generation_failed(self, message):
+        self.finish_generation()
+        QMessageBox.warning(self, "Error", f"Generation failed: {message}")
 
     def copy_metadata(self):
         if not self.check_project_loaded("copying metadata"):
@@ -592,6 +653,15 @@ class MainWindow(QMainWindow):
         if nft_data and 'metadata' in nft_data:
             self.metadata_display.setPlainText(json.dumps(nft_data['metadata'], indent=2))
 
+    def closeEvent(self, event):
+        """Stop a running generation cleanly before the window closes"""
+        if self.generation_worker is not None:
+            self.generation_worker.cancel()
+            self.generation_thread.wait()
+        self.gallery_panel.shutdown()
+        self.project_manager.close_project()
+        super().closeEvent(event)
+
     def resizeEvent(self, event):
         """Handle resize events to adjust GIF size"""
         super().resizeEvent(event)
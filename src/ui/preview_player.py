@@ -0,0 +1,76 @@
+import os
+from PyQt6.QtCore import Qt, QObject, QTimer
+from PyQt6.QtGui import QImage, QPixmap, QMovie
+from ..utils.animation_timeline import MIN_FRAME_DURATION
+
+
+def pil_to_qimage(image):
+    """Convert a PIL image to a QImage that owns its pixels (no encode/decode round-trip)"""
+    image = image.convert('RGBA')
+    width, height = image.size
+    data = image.tobytes('raw', 'RGBA')
+    return QImage(data, width, height, width * 4, QImage.Format.Format_RGBA8888).copy()
+
+
+def pil_to_qpixmap(image, size=None):
+    """Convert a PIL image to a QPixmap, scaled to fit size (a QSize) if given"""
+    pixmap = QPixmap.fromImage(pil_to_qimage(image))
+    if size is not None:
+        pixmap = pixmap.scaled(size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return pixmap
+
+
+def movie_supports(file_path):
+    """Whether QMovie can play the animation at file_path (GIF, WebP with Qt's image format plugins)"""
+    extension = os.path.splitext(file_path)[1].lstrip('.').lower().encode()
+    return extension in [bytes(image_format).lower() for image_format in QMovie.supportedFormats()]
+
+
+class FramePlayer(QObject):
+    """Plays in-memory animation frames on a QLabel, honoring per-frame durations"""
+
+    # Same floor as the timeline, which already turned shorter frames into 100ms ones
+    MIN_FRAME_MS = MIN_FRAME_DURATION
+
+    def __init__(self, label, pixmaps, durations, parent=None):
+        super().__init__(parent)
+        self.label = label
+        self.pixmaps = pixmaps
+        self.durations = durations
+        self.index = 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.next_frame)
+
+    def start(self):
+        self.index = 0
+        self.show_frame()
+
+    def stop(self):
+        self.timer.stop()
+
+    def show_frame(self):
+        self.label.setPixmap(self.pixmaps[self.index])
+        if len(self.pixmaps) > 1:
+            duration = self.durations[self.index] if self.index < len(self.durations) else 100
+            self.timer.start(max(self.MIN_FRAME_MS, duration))
+
+    def next_frame(self):
+        self.index = (self.index + 1) % len(self.pixmaps)
+        self.show_frame()
+
+
+def show_composition(label, result, parent=None):
+    """
+    Show a compose_layers result on label, scaled to the label's size
+    Returns the FramePlayer driving an animation (stop it before replacing the preview), or None
+    """
+    size = label.size()
+    if isinstance(result, tuple):
+        frames, durations = result
+        player = FramePlayer(label, [pil_to_qpixmap(frame, size) for frame in frames], durations, parent)
+        player.start()
+        return player
+
+    label.setPixmap(pil_to_qpixmap(result, size))
+    return None
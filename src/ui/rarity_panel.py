@@ -7,6 +7,7 @@ from PyQt6.QtCore import pyqtSignal, Qt
 
 class RarityPanel(QWidget):
     rarity_changed = pyqtSignal()
+    layer_settings_changed = pyqtSignal(str, str)  # artist name, layer file name (opacity or stack order)
 
     def __init__(self, project_manager):
         super().__init__()
@@ -235,7 +236,9 @@ class RarityPanel(QWidget):
     def on_opacity_changed(self, artist_name, layer_name, opacity):
         if self.project_manager.set_layer_opacity(artist_name, layer_name, opacity):
             self.rarity_changed.emit()
+            self.layer_settings_changed.emit(artist_name, layer_name)
 
     def on_layer_index_changed(self, artist_name, layer_name, layer_index):
         if self.project_manager.set_layer_index(artist_name, layer_name, layer_index):
-            self.rarity_changed.emit()
\ No newline at end of file
+            self.rarity_changed.emit()
+            self.layer_settings_changed.emit(artist_name, layer_name)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import shutil
+import subprocess
+from math import gcd
+from functools import reduce
+from PIL import features
+from .gif_encoder import save_gif, DEFAULT_GIF_PRESET
+
+DEFAULT_ANIMATION_FORMAT = 'gif'
+
+# Lossy animated WebP: quality 0-100 and libwebp effort 0 (fastest) - 6 (smallest); at 2000px
+# effort 0 is about 2.5x faster than 4 for files only a few percent larger
+WEBP_QUALITY = 80
+WEBP_METHOD = 0
+
+# zlib level for APNG frames; Pillow already stores only the changed region of each frame
+APNG_COMPRESS_LEVEL = 3
+
+# H.264 settings for MP4: constant quality (lower is better) and x264 speed preset
+MP4_CRF = 20
+MP4_PRESET = 'fast'
+
+
+class AnimationEncoder:
+    """
+    An output format for animated editions
+    encode(frames, durations, output_path, options) writes RGBA frames with per-frame
+    durations in milliseconds; options carries format settings such as gif_preset.
+    is_available() reports whether the format can be written on this machine.
+    """
+
+    def __init__(self, name, extension, encode, is_available=None):
+        self.name = name
+        self.extension = extension
+        self.encode = encode
+        self._is_available = is_available
+
+    def is_available(self):
+        return self._is_available is None or self._is_available()
+
+
+_encoders = {}
+
+
+def register_animation_encoder(name, extension, encode, is_available=None):
+    """Add (or replace) an animated output format"""
+    _encoders[name] = AnimationEncoder(name, extension, encode, is_available)
+
+
+def get_animation_encoder(name):
+    """Get a registered encoder by name, or None"""
+    return _encoders.get(name)
+
+
+def get_animation_formats(available_only=True):
+    """Names of the registered animated output formats (only those usable here by default)"""
+    return [name for name, encoder in _encoders.items() if not available_only or encoder.is_available()]
+
+
+def get_animation_extensions():
+    """File extensions of every registered animated output format"""
+    return tuple(encoder.extension for encoder in _encoders.values())
+
+
+def save_animation(frames, durations, path_base, animation_format=DEFAULT_ANIMATION_FORMAT, **options):
+    """
+    Write an animation next to path_base (no extension) in the given format
+    Falls back to GIF when the format is unknown or unavailable; returns the written path
+    """
+    encoder = _encoders.get(animation_format)
+    if encoder is None or not encoder.is_available():
+        encoder = _encoders[DEFAULT_ANIMATION_FORMAT]
+    output_path = path_base + encoder.extension
+    encoder.encode(frames, durations, output_path, options)
+    return output_path
+
+
+def _encode_gif(frames, durations, output_path, options):
+    save_gif(frames, durations, output_path, options.get('gif_preset', DEFAULT_GIF_PRESET),
+             options.get('palette_key'))
+
+
+def _encode_webp(frames, durations, output_path, options):
+    frames[0].save(
+        output_path,
+        format='WEBP',
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        quality=WEBP_QUALITY,
+        method=WEBP_METHOD
+    )
+
+
+def _encode_apng(frames, durations, output_path, options):
+    frames[0].save(
+        output_path,
+        format='PNG',
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        compress_level=APNG_COMPRESS_LEVEL
+    )
+
+
+def find_ffmpeg():
+    """Path of a local ffmpeg binary, or None"""
+    return shutil.which('ffmpeg')
+
+
+def _encode_mp4(frames, durations, output_path, options):
+    # MP4 has a fixed frame rate: use the largest tick that divides every duration and
+    # repeat frames that last several ticks
+    tick = reduce(gcd, [max(1, int(duration)) for duration in durations])
+    width, height = frames[0].size
+    command = [
+        find_ffmpeg(), '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-framerate', f'1000/{tick}',
+        '-i', '-',
+        # yuv420p (needed by most players) requires even dimensions
+        '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+        '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-crf', str(MP4_CRF), '-preset', MP4_PRESET,
+        '-movflags', '+faststart',
+        output_path
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for frame, duration in zip(frames, durations):
+            data = frame.convert('RGB').tobytes()
+            for _ in range(max(1, int(duration) // tick)):
+                process.stdin.write(data)
+        process.stdin.close()
+    except BrokenPipeError:
+        pass
+    error = process.stderr.read().decode('utf-8', errors='replace').strip()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {output_path}: {error}")
+
+
+register_animation_encoder('gif', '.gif', _encode_gif)
+register_animation_encoder('webp', '.webp', _encode_webp, lambda: features.check('webp'))
+register_animation_encoder('apng', '.apng', _encode_apng)
+register_animation_encoder('mp4', '.mp4', _encode_mp4, lambda: find_ffmpeg() is not None)
@@ -0,0 +1,91 @@
+from bisect import bisect_right
+from math import gcd
+from functools import reduce
+
+# Longest loop (ms) an output animation may have before layers are no longer kept in sync
+DEFAULT_MAX_LOOP_MS = 10000
+
+# Browsers play GIF frames of 10ms or less (including 0) at 100ms; do the same. Longer frames,
+# down to MIN_FRAME_DURATION, play as they are
+MIN_FRAME_DURATION = 11
+DEFAULT_FRAME_DURATION = 100
+
+
+def normalize_frame_duration(duration):
+    """Duration in ms a GIF frame is actually shown for"""
+    return duration if duration and duration >= MIN_FRAME_DURATION else DEFAULT_FRAME_DURATION
+
+
+def _lcm(a, b):
+    return a * b // gcd(a, b)
+
+
+class AnimationTimeline:
+    """
+    Output frames of a composition whose animated layers each loop with their own frame
+    durations.
+    The output loops after the least common multiple of the layers' loop lengths, so every
+    layer plays at its own speed and wraps seamlessly. When that exceeds max_loop_ms the
+    output loops with the longest layer instead (shorter layers are cut at the wrap). An
+    output frame starts at every moment any layer changes frame; frames is a list of
+    (frame_indices, duration) with one source frame index per layer (None for static
+    layers), and consecutive frames showing the same source frames are merged.
+    """
+
+    def __init__(self, layer_durations, max_loop_ms=DEFAULT_MAX_LOOP_MS):
+        """layer_durations: per layer, its frame durations in ms, or None for a static layer"""
+        self.layer_count = len(layer_durations)
+        animated = [(position, [normalize_frame_duration(duration) for duration in durations])
+                    for position, durations in enumerate(layer_durations) if durations]
+
+        if not animated:
+            self.loop_ms = DEFAULT_FRAME_DURATION
+            self.frames = [((None,) * self.layer_count, DEFAULT_FRAME_DURATION)]
+            return
+
+        loops = [sum(durations) for _, durations in animated]
+        self.loop_ms = reduce(_lcm, loops)
+        if self.loop_ms > max_loop_ms:
+            self.loop_ms = max(loops)
+
+        # Start time of every frame within each layer's own loop
+        layer_starts = []
+        for durations in (durations for _, durations in animated):
+            starts = [0]
+            for duration in durations[:-1]:
+                starts.append(starts[-1] + duration)
+            layer_starts.append(starts)
+
+        timestamps = set()
+        for starts, loop in zip(layer_starts, loops):
+            for offset in range(0, self.loop_ms, loop):
+                timestamps.update(offset + start for start in starts if offset + start < self.loop_ms)
+        timestamps = sorted(timestamps)
+
+        self.frames = []
+        for start, end in zip(timestamps, timestamps[1:] + [self.loop_ms]):
+            frame_indices = [None] * self.layer_count
+            for (position, _), starts, loop in zip(animated, layer_starts, loops):
+                frame_indices[position] = bisect_right(starts, start % loop) - 1
+            frame_indices = tuple(frame_indices)
+
+            if self.frames and self.frames[-1][0] == frame_indices:
+                self.frames[-1] = (frame_indices, self.frames[-1][1] + end - start)
+            else:
+                self.frames.append((frame_indices, end - start))
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def merge_identical_frames(frames, durations):
+    """Merge consecutive frames with identical pixels into one longer frame"""
+    merged_frames = []
+    merged_durations = []
+    for frame, duration in zip(frames, durations):
+        if merged_frames and (frame is merged_frames[-1] or frame.tobytes() == merged_frames[-1].tobytes()):
+            merged_durations[-1] += duration
+            continue
+        merged_frames.append(frame)
+        merged_durations.append(duration)
+    return merged_frames, merged_durations
@@ -0,0 +1,178 @@
+import numpy as np
+from PIL import Image
+
+
+def _normal(backdrop, source):
+    return source
+
+
+def _multiply(backdrop, source):
+    return backdrop * source
+
+
+def _screen(backdrop, source):
+    return backdrop + source - backdrop * source
+
+
+def _overlay(backdrop, source):
+    # Hard light with the layers swapped: multiply in the backdrop's shadows, screen in its highlights
+    return np.where(backdrop <= 0.5,
+                    2.0 * backdrop * source,
+                    1.0 - 2.0 * (1.0 - backdrop) * (1.0 - source))
+
+
+def _soft_light(backdrop, source):
+    darkened = backdrop - (1.0 - 2.0 * source) * backdrop * (1.0 - backdrop)
+    curve = np.where(backdrop <= 0.25, ((16.0 * backdrop - 12.0) * backdrop + 4.0) * backdrop, np.sqrt(backdrop))
+    lightened = backdrop + (2.0 * source - 1.0) * (curve - backdrop)
+    return np.where(source <= 0.5, darkened, lightened)
+
+
+def _add(backdrop, source):
+    return np.minimum(backdrop + source, 1.0)
+
+
+# Separable blend functions B(Cb, Cs) on straight (non-premultiplied) colors in [0, 1]
+BLEND_MODES = {
+    'normal': _normal,
+    'multiply': _multiply,
+    'screen': _screen,
+    'overlay': _overlay,
+    'soft-light': _soft_light,
+    'add': _add,
+    'darken': np.minimum,
+    'lighten': np.maximum,
+}
+
+
+def image_to_premultiplied(image, opacity=1.0):
+    """
+    Convert a PIL image to a float32 4xHxW array of planar premultiplied RGBA in [0, 1]
+    opacity scales every channel, which in premultiplied form is the same as scaling alpha
+    """
+    width, height = image.size
+    planes = np.empty((4, height, width), dtype=np.float32)
+    for index, band in enumerate(image.convert('RGBA').split()):
+        scale = opacity / 255.0 if index == 3 else 1.0 / 255.0
+        np.multiply(np.asarray(band), scale, out=planes[index], casting='unsafe')
+    planes[:3] *= planes[3]
+    return planes
+
+
+def premultiplied_to_image(planes):
+    """Convert a planar premultiplied float RGBA array back to an 8-bit straight-alpha PIL image"""
+    alpha = planes[3]
+    color = _unpremultiply(planes[:3], alpha)
+    bands = []
+    for plane in (color[0], color[1], color[2], alpha):
+        plane = np.clip(plane, 0.0, 1.0)
+        plane *= 255.0
+        plane += 0.5
+        bands.append(Image.fromarray(plane.astype(np.uint8), 'L'))
+    return Image.merge('RGBA', bands)
+
+
+def _unpremultiply(color, alpha):
+    # Premultiplied color is 0 wherever alpha is, so a floored reciprocal is safe
+    return color * (1.0 / np.maximum(alpha, 1e-6))
+
+
+class BlendCanvas:
+    """
+    RGBA canvas that layers are blended into in place.
+    Compositing follows the W3C compositing model (source-over with a separable blend
+    function), so blend modes only affect color where both layers are opaque and the
+    alpha channel is never multiplied or screened. While only normal layers have been
+    blended at full opacity the canvas stays an 8-bit PIL image composited by Pillow's
+    native source-over; the first other blend mode or opacity promotes it to a float
+    premultiplied buffer that every later layer is blended into. Layer opacity is a
+    scalar applied while converting the layer, so source images are never modified.
+    Convert to PIL once at the end with to_image.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._image = Image.new('RGBA', size, (0, 0, 0, 0))
+        self.pixels = None  # float32 4xHxW planar premultiplied RGBA in [0, 1] once promoted
+
+    def blend(self, image, blend_mode='normal', opacity=1.0, offset=(0, 0)):
+        """
+        Blend a PIL image (or planar premultiplied array) over the canvas with its top-left
+        corner at offset; only that region of the canvas is touched, so layers cropped to
+        their bounding box cost in proportion to their area
+        """
+        if opacity <= 0.0:
+            return
+
+        if isinstance(image, Image.Image) and image.mode != 'RGBA':
+            image = image.convert('RGBA')
+
+        blend_function = BLEND_MODES.get(blend_mode, _normal)
+        if self.pixels is None:
+            if blend_function is _normal and opacity >= 1.0 and isinstance(image, Image.Image):
+                self._image.alpha_composite(image, dest=tuple(offset))
+                return
+            self.promote()
+
+        if isinstance(image, Image.Image):
+            source = image_to_premultiplied(image, opacity)
+        else:
+            source = image * opacity if opacity < 1.0 else image
+
+        left, top = offset
+        height, width = source.shape[1:]
+        region = self.pixels[:, top:top + height, left:left + width]
+        backdrop_color = region[:3]
+        backdrop_alpha = region[3]
+        source_color = source[:3]
+        source_alpha = source[3]
+        source_transparency = 1.0 - source_alpha
+
+        if blend_function is _normal:
+            # Source-over: co = cs + cb * (1 - as)
+            region *= source_transparency
+            region += source
+            return
+
+        blended = blend_function(_unpremultiply(backdrop_color, backdrop_alpha),
+                                 _unpremultiply(source_color, source_alpha))
+        np.clip(blended, 0.0, 1.0, out=blended)
+
+        # co = cs * (1 - ab) + cb * (1 - as) + as * ab * B(Cb, Cs)
+        backdrop_transparency = 1.0 - backdrop_alpha
+        blended *= source_alpha * backdrop_alpha
+        blended += source_color * backdrop_transparency
+        backdrop_color *= source_transparency
+        backdrop_color += blended
+        backdrop_alpha += source_alpha * backdrop_transparency
+
+    def promote(self):
+        """Switch to the float premultiplied buffer (no-op if already promoted)"""
+        if self.pixels is None:
+            self.pixels = image_to_premultiplied(self._image)
+            self._image = None
+
+    def copy(self):
+        """Snapshot the canvas, e.g. to cache a partial composite"""
+        canvas = BlendCanvas.__new__(BlendCanvas)
+        canvas.size = self.size
+        canvas._image = self._image.copy() if self._image is not None else None
+        canvas.pixels = self.pixels.copy() if self.pixels is not None else None
+        return canvas
+
+    @property
+    def nbytes(self):
+        if self.pixels is not None:
+            return self.pixels.nbytes
+        width, height = self.size
+        return width * height * 4
+
+    def content(self):
+        """The canvas as something blend accepts: the 8-bit PIL image or the premultiplied buffer"""
+        return self._image if self.pixels is None else self.pixels
+
+    def to_image(self):
+        """Get the result as an 8-bit straight-alpha PIL image"""
+        if self.pixels is None:
+            return self._image
+        return premultiplied_to_image(self.pixels)
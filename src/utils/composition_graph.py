@@ -0,0 +1,141 @@
+from .blend_engine import BlendCanvas, image_to_premultiplied
+from .image_utils import load_layer_frame, blend_prepared_layer, build_animation_timeline, DEFAULT_OUTPUT_SIZE
+from .animation_timeline import merge_identical_frames, DEFAULT_MAX_LOOP_MS
+
+
+class CompositionGraph:
+    """
+    Live preview of one composition that re-composites only what an edit touches.
+    Layers are kept in z order. For the layer being edited (the focus) the graph caches, per
+    frame, the composite of every layer below it (prefix) and of every layer above it
+    (suffix). Normal source-over is associative, so as long as the layers above are all
+    normal the suffix can be blended as one image; changing the focused layer's opacity or
+    blend mode then costs two blends per frame instead of a full re-composite. Moving the
+    focused layer in the stack rebuilds both caches for its new position.
+    """
+
+    def __init__(self, layer_composition, size=DEFAULT_OUTPUT_SIZE, max_loop_ms=DEFAULT_MAX_LOOP_MS):
+        self.size = size
+        self.layers = sorted((dict(layer) for layer in layer_composition), key=lambda layer: layer['z_index'])
+        self.animated = any(layer['file_path'].lower().endswith('.gif') for layer in self.layers)
+
+        # Output frames follow the layers' merged timeline; source frame indices are kept per
+        # artist because z-index edits reorder the layers
+        timeline = build_animation_timeline(self.layers, max_loop_ms, size)
+        self.frame_count = len(timeline)
+        self.durations = [duration for _, duration in timeline.frames]
+        self._frame_indices = {layer['artist']: [frame_indices[position] for frame_indices, _ in timeline.frames]
+                               for position, layer in enumerate(self.layers)}
+
+        self._focus = None
+        self._focus_frames = None  # Per frame: (premultiplied pixels, offset) of the focused layer, or None
+        self._prefix = None  # Per frame canvas of the layers below the focus
+        self._suffix = None  # Per frame canvas of the layers above the focus, when all are normal
+
+    def _position(self, artist_name):
+        for position, layer in enumerate(self.layers):
+            if layer['artist'] == artist_name:
+                return position
+        return None
+
+    def _load(self, layer_config, frame_num):
+        return load_layer_frame(layer_config, self._frame_indices[layer_config['artist']][frame_num], self.size)
+
+    def _composite(self, layers, frame_num):
+        canvas = BlendCanvas((self.size, self.size))
+        for layer_config in layers:
+            blend_prepared_layer(canvas, self._load(layer_config, frame_num), layer_config)
+        return canvas
+
+    def _result(self, frames):
+        if self.animated:
+            return merge_identical_frames(frames, self.durations)
+        return frames[0]
+
+    def has_layer(self, artist_name, layer_name):
+        position = self._position(artist_name)
+        return position is not None and self.layers[position]['layer_name'] == layer_name
+
+    def update_layer(self, artist_name, opacity=None, blend_mode=None, z_index=None):
+        """
+        Change one layer's settings and return the re-composited result
+        (an image, or (frames, durations) when animated, like compose_layers)
+        """
+        position = self._position(artist_name)
+        if position is None:
+            return self.render()
+
+        if artist_name != self._focus:
+            self._focus = artist_name
+            self._prefix = None
+            self._suffix = None
+
+        layer = self.layers[position]
+        if opacity is not None:
+            layer['opacity'] = opacity
+        if blend_mode is not None:
+            layer['blend_mode'] = blend_mode
+        if z_index is not None and z_index != layer['z_index']:
+            layer['z_index'] = z_index
+            self.layers.sort(key=lambda item: item['z_index'])
+            self._prefix = None
+            self._suffix = None
+
+        return self.render()
+
+    def render(self):
+        """Composite the current layer settings, reusing the prefix/suffix around the focused layer"""
+        position = self._position(self._focus) if self._focus is not None else None
+        if position is None:
+            return self._result([self._composite(self.layers, frame_num).to_image()
+                                 for frame_num in range(self.frame_count)])
+
+        below = self.layers[:position]
+        above = self.layers[position + 1:]
+        layer_config = self.layers[position]
+
+        # Caches are kept in float form so each edit is a copy and a few in-place blends
+        if self._prefix is None:
+            self._prefix = []
+            self._focus_frames = []
+            # Output frames showing the same source frame (every frame, for a static layer) share
+            # one conversion; keyed by source frame index, as the prepared layers may be evicted
+            converted = {}
+            source_frames = self._frame_indices[layer_config['artist']]
+            for frame_num in range(self.frame_count):
+                prefix = self._composite(below, frame_num)
+                prefix.promote()
+                self._prefix.append(prefix)
+
+                source_frame = source_frames[frame_num]
+                if source_frame not in converted:
+                    prepared = self._load(layer_config, frame_num)
+                    converted[source_frame] = None
+                    if prepared.image is not None:
+                        converted[source_frame] = (image_to_premultiplied(prepared.image), prepared.offset)
+                self._focus_frames.append(converted[source_frame])
+
+        if self._suffix is None and above and all(layer.get('blend_mode', 'normal') == 'normal' for layer in above):
+            self._suffix = []
+            for frame_num in range(self.frame_count):
+                suffix = self._composite(above, frame_num)
+                suffix.promote()
+                self._suffix.append(suffix)
+
+        frames = []
+        for frame_num in range(self.frame_count):
+            canvas = self._prefix[frame_num].copy()
+            focus = self._focus_frames[frame_num]
+            if focus is not None:
+                source, offset = focus
+                canvas.blend(source, layer_config.get('blend_mode', 'normal'), layer_config.get('opacity', 1.0),
+                             offset)
+
+            if self._suffix is not None:
+                canvas.blend(self._suffix[frame_num].pixels)
+            else:
+                for above_config in above:
+                    blend_prepared_layer(canvas, self._load(above_config, frame_num), above_config)
+            frames.append(canvas.to_image())
+
+        return self._result(frames)
@@ -0,0 +1,130 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+
+# Bump when the stored layout changes so old derived files are ignored
+DERIVED_FORMAT_VERSION = 2
+
+
+def derived_layer_key(file_path, size, animated=False):
+    """
+    Name of a layer's derived files: '<source>-<mtime>', where source hashes the layer's path,
+    the render size the files were made for and whether they hold every GIF frame or just the
+    static image (the first frame), and mtime tells versions of the same source apart
+    """
+    source = f"{DERIVED_FORMAT_VERSION}|{os.path.abspath(file_path)}|{size}|{animated:d}"
+    return f"{hashlib.sha1(source.encode()).hexdigest()}-{os.stat(file_path).st_mtime_ns}"
+
+
+def _replace_version(directory, key):
+    """
+    Record key as its layer's current version and delete the files of the version it replaces
+    Each layer keeps a '<source>.version' file naming its current key, so an edited layer's
+    old files are found without listing the directory.
+    """
+    source = key.split('-')[0]
+    version_path = os.path.join(directory, source + '.version')
+    try:
+        with open(version_path, 'r') as f:
+            old_key = f.read().strip()
+    except OSError:
+        old_key = None
+    if old_key == key:
+        return
+    _write_atomic(version_path, lambda path: _save_text(path, key))
+    if not old_key:
+        return
+
+    old_manifest_path = os.path.join(directory, old_key + '.json')
+    try:
+        with open(old_manifest_path, 'r') as f:
+            old_files = [frame['file'] for frame in json.load(f)['frames'] if frame is not None]
+    except (OSError, ValueError, KeyError, TypeError):
+        old_files = []
+    for file_name in old_files + [old_key + '.json']:
+        try:
+            # Processes still mapping an old version keep their pages until they unmap them
+            os.remove(os.path.join(directory, file_name))
+        except OSError:
+            pass
+
+
+def _write_atomic(path, write):
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def write_derived_layer(directory, file_path, size, frames, durations=None, animated=False):
+    """
+    Store a layer resized for size x size as raw arrays that later renders memory-map
+    frames is a list of (cropped RGBA image or None, bounding box or None), one per GIF frame
+    (a single entry for static layers); durations are the GIF frame durations, if any.
+    Each frame becomes an uncompressed .npy of straight-alpha RGBA bytes (H x W x 4); a JSON
+    manifest, written last, holds the boxes and makes the set visible to readers. Files of
+    earlier versions of the layer are removed once the new set is in place.
+    """
+    os.makedirs(directory, exist_ok=True)
+    key = derived_layer_key(file_path, size, animated)
+    manifest = {'size': size, 'frames': [], 'durations': durations}
+    for index, (image, box) in enumerate(frames):
+        if image is None:
+            manifest['frames'].append(None)
+            continue
+        frame_file = f"{key}.{index}.npy"
+        pixels = np.asarray(image.convert('RGBA'))
+        _write_atomic(os.path.join(directory, frame_file), lambda path: _save_npy(path, pixels))
+        manifest['frames'].append({'file': frame_file, 'box': list(box)})
+    _write_atomic(os.path.join(directory, key + '.json'),
+                  lambda path: _save_text(path, json.dumps(manifest, separators=(',', ':'))))
+    _replace_version(directory, key)
+
+
+def _save_npy(path, pixels):
+    with open(path, 'wb') as f:
+        np.save(f, pixels)
+
+
+def _save_text(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def has_derived_layer(directory, file_path, size, animated=False):
+    """Whether a layer's derived files for size are in directory and up to date"""
+    try:
+        return os.path.exists(os.path.join(directory, derived_layer_key(file_path, size, animated) + '.json'))
+    except OSError:
+        return False
+
+
+def read_derived_layer(directory, file_path, size, animated=False):
+    """
+    Map a layer's derived arrays without decoding or copying them
+    Returns (frames, durations) like write_derived_layer took, with each image a read-only
+    PIL image backed by the memory-mapped file (pages are shared through the OS page cache
+    by every process rendering the layer), or None if the layer hasn't been derived.
+    """
+    try:
+        manifest_path = os.path.join(directory, derived_layer_key(file_path, size, animated) + '.json')
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+        frames = []
+        for frame in manifest['frames']:
+            if frame is None:
+                frames.append((None, None))
+                continue
+            pixels = np.load(os.path.join(directory, frame['file']), mmap_mode='r')
+            height, width = pixels.shape[:2]
+            image = Image.frombuffer('RGBA', (width, height), pixels, 'raw', 'RGBA', 0, 1)
+            frames.append((image, tuple(frame['box'])))
+        return frames, manifest.get('durations')
+    except Exception as e:
+        print(f"Error reading derived layer for {file_path}: {e}")
+        return None
@@ -1,4 +1,5 @@
 import os
+import hashlib
 
 
 def ensure_directory(directory_path):
@@ -19,4 +20,22 @@ def get_unique_filename(directory, base_name, extension):
         full_path = os.path.join(directory, filename)
         if not os.path.exists(full_path):
             return full_path
-        counter += 1
\ No newline at end of file
+        counter += 1
+
+def write_file_atomic(file_path, data):
+    """Write text or bytes to a temp file and rename it over file_path so readers never see a partial file"""
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb' if isinstance(data, bytes) else 'w') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Get hex SHA-256 digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,187 @@
+import numpy as np
+from PIL import Image, features
+from .layer_cache import LRUCache
+
+# Encoder presets trading speed for quality:
+#   colors  - palette size, including the index reserved for transparency
+#   method  - quantizer used to build the palette (libimagequant falls back to median cut)
+#   sample  - frames are downsampled by this factor before building the palette
+#   palette_pixels - at most this many of the sampled pixels are quantized
+#   dither  - Floyd-Steinberg dither frames against the palette
+GIF_PRESETS = {
+    'fast': {'colors': 128, 'method': 'fastoctree', 'sample': 8, 'palette_pixels': 1 << 16, 'dither': False},
+    'balanced': {'colors': 256, 'method': 'mediancut', 'sample': 4, 'palette_pixels': 1 << 18, 'dither': True},
+    'quality': {'colors': 256, 'method': 'libimagequant', 'sample': 2, 'palette_pixels': 1 << 20, 'dither': True},
+}
+
+DEFAULT_GIF_PRESET = 'balanced'
+
+# Pixels with less alpha than this are encoded as the transparent index
+ALPHA_THRESHOLD = 128
+
+_QUANTIZE_METHODS = {
+    'fastoctree': Image.Quantize.FASTOCTREE,
+    'mediancut': Image.Quantize.MEDIANCUT,
+    'libimagequant': Image.Quantize.LIBIMAGEQUANT,
+}
+
+# Shared palettes keyed by (palette_key, preset) so re-encoding the same trait set skips quantization
+_palette_cache = LRUCache(4 * 1024 * 1024, sizeof=len)
+
+
+def get_gif_preset(name):
+    """Get the settings of a preset by name, falling back to the default preset"""
+    return GIF_PRESETS.get(name, GIF_PRESETS[DEFAULT_GIF_PRESET])
+
+
+def build_palette(frames, preset=DEFAULT_GIF_PRESET):
+    """
+    Build one palette for all frames of an animation
+    The opaque pixels of every frame (downsampled) are quantized together, so colors stay
+    stable from frame to frame. Returns a flat [r, g, b, ...] list with at most
+    colors - 1 entries, leaving room for the transparent index.
+    """
+    settings = get_gif_preset(preset)
+    sample = settings['sample']
+
+    pixels = []
+    for frame in frames:
+        if sample > 1:
+            frame = frame.reduce(sample)
+        rgba = np.asarray(frame.convert('RGBA'))
+        pixels.append(rgba[rgba[..., 3] >= ALPHA_THRESHOLD][:, :3])
+    pixels = np.concatenate(pixels) if pixels else np.zeros((0, 3), dtype=np.uint8)
+    if not len(pixels):
+        return [0, 0, 0]
+    if len(pixels) > settings['palette_pixels']:
+        pixels = pixels[::-(-len(pixels) // settings['palette_pixels'])]
+
+    method = settings['method']
+    if method == 'libimagequant' and not features.check_feature('libimagequant'):
+        method = 'mediancut'
+
+    # Quantize the opaque pixels as a one-pixel-wide strip
+    strip = Image.fromarray(np.ascontiguousarray(pixels.reshape(-1, 1, 3)), 'RGB')
+    quantized = strip.quantize(colors=settings['colors'] - 1, method=_QUANTIZE_METHODS[method])
+    color_count = int(np.asarray(quantized).max()) + 1
+    return quantized.getpalette()[:color_count * 3]
+
+
+def _changed_box(changed):
+    """Bounding box (left, top, right, bottom) of the True pixels of a mask, or None"""
+    rows = np.flatnonzero(changed.any(axis=1))
+    if not len(rows):
+        return None
+    columns = np.flatnonzero(changed[rows[0]:rows[-1] + 1].any(axis=0))
+    return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+
+def _index_frames(frames, palette, dither):
+    """
+    Map every frame onto the shared palette
+    Returns (indices, changed) per frame, where changed marks the pixels that differ from
+    the previous frame (None for the first). After the first frame only the box around
+    the changed pixels is quantized; unchanged pixels keep the previous frame's index, so
+    dithering noise around moving parts doesn't leak into static areas.
+    """
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette(palette)
+    dither = Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+    transparent = len(palette) // 3
+
+    indexed = []
+    previous_pixels = None
+    for frame in frames:
+        frame = frame.convert('RGBA')
+        pixels = np.asarray(frame)
+
+        if previous_pixels is None:
+            indices = np.array(frame.convert('RGB').quantize(palette=palette_image, dither=dither))
+            indices[pixels[..., 3] < ALPHA_THRESHOLD] = transparent
+            changed = None
+        else:
+            # Compare whole RGBA pixels as 32-bit words
+            changed = pixels.view(np.uint32)[..., 0] != previous_pixels.view(np.uint32)[..., 0]
+            indices = indexed[-1][0]
+            box = _changed_box(changed)
+            if box is not None:
+                left, top, right, bottom = box
+                region = np.array(frame.crop(box).convert('RGB').quantize(palette=palette_image, dither=dither))
+                region[pixels[top:bottom, left:right, 3] < ALPHA_THRESHOLD] = transparent
+                indices = indices.copy()
+                region_changed = changed[top:bottom, left:right]
+                indices[top:bottom, left:right][region_changed] = region[region_changed]
+
+        indexed.append((indices, changed))
+        previous_pixels = pixels
+    return indexed, transparent
+
+
+def _centisecond_durations(durations):
+    """
+    Frame durations as GIF stores them: whole centiseconds, and at least 20ms since players
+    show shorter frames at 100ms. Rounding error is carried to the next frame to keep the
+    loop length.
+    """
+    rounded = []
+    carry = 0
+    for duration in durations:
+        output = max(20, int(round((duration + carry) / 10)) * 10)
+        carry += duration - output
+        rounded.append(output)
+    return rounded
+
+
+def save_gif(frames, durations, output_path, preset=DEFAULT_GIF_PRESET, palette_key=None):
+    """
+    Encode RGBA frames as a looping GIF with one global palette
+    Each frame is dithered once against the shared palette and, after the first, only
+    pixels that changed since the previous frame are kept; the rest are transparent, so
+    the encoder writes small rectangles that compress well. Identical consecutive frames
+    are merged into one longer frame. Pass palette_key (e.g. the trait set's layer paths)
+    to reuse the palette the next time the same key is encoded.
+    """
+    settings = get_gif_preset(preset)
+    palette = None
+    if palette_key is not None:
+        cache_key = (palette_key, preset)
+        palette = _palette_cache.get(cache_key)
+    if palette is None:
+        palette = build_palette(frames, preset)
+        if palette_key is not None:
+            _palette_cache.put(cache_key, palette)
+
+    indexed, transparent = _index_frames(frames, palette, settings['dither'])
+
+    # A pixel that turns transparent can't be drawn over a frame left in place, so such
+    # animations are written as full frames that are cleared between frames instead
+    clears = any(np.any(changed & (indices == transparent)) for indices, changed in indexed[1:])
+
+    output_frames = []
+    output_durations = []
+    for (indices, changed), duration in zip(indexed, durations):
+        if changed is not None:
+            if not changed.any():
+                output_durations[-1] += duration
+                continue
+            if not clears:
+                indices = np.where(changed, indices, transparent).astype(np.uint8)
+
+        frame = Image.frombytes('P', (indices.shape[1], indices.shape[0]), indices.tobytes())
+        frame.putpalette(palette + [0, 0, 0])
+        output_frames.append(frame)
+        output_durations.append(duration)
+
+    # The frames are already minimal; Pillow's own optimize pass would only redo the work
+    output_frames[0].save(
+        output_path,
+        format='GIF',
+        save_all=True,
+        append_images=output_frames[1:],
+        duration=_centisecond_durations(output_durations),
+        loop=0,
+        transparency=transparent,
+        disposal=2 if clears else 1,
+        optimize=False
+    )
+    return output_path
@@ -1,188 +1,531 @@
-from PIL import Image, ImageChops
+from PIL import Image, ImageSequence
 import os
+import hashlib
+import threading
+from .layer_cache import LRUCache, image_nbytes
+from .blend_engine import BlendCanvas
+from .gif_encoder import DEFAULT_GIF_PRESET
+from .animation_encoders import save_animation, get_animation_extensions, DEFAULT_ANIMATION_FORMAT
+from .animation_timeline import AnimationTimeline, merge_identical_frames, DEFAULT_MAX_LOOP_MS
+from .derived_layers import has_derived_layer, read_derived_layer, write_derived_layer
 
+# Default memory ceiling for the prepared-layer cache (a 2000x2000 RGBA layer is ~16MB)
+DEFAULT_LAYER_CACHE_MB = 1024
 
-def compose_layers(layer_composition):
+# Edge length in pixels of final output; every composition is square
+DEFAULT_OUTPUT_SIZE = 2000
+
+# Named output sizes: previews and thumbnails render at a fraction of the final pixel count
+DEFAULT_RENDER_PROFILES = {
+    'final': DEFAULT_OUTPUT_SIZE,
+    'preview': 512,
+    'thumbnail': 128
+}
+
+# Process-wide cache of decoded, resized layers keyed by (path, mtime, size). Opacity is applied by
+# the compositor, so every opacity setting of a file shares one entry. GIF layers are stored
+# as their full list of prepared frames. Layers mapped from the derived directory count their full
+# size too, which also bounds the number of open mappings.
+_prepared_layer_cache = LRUCache(DEFAULT_LAYER_CACHE_MB * 1024 * 1024, sizeof=image_nbytes)
+
+# Default memory ceiling for the shared-prefix composite cache used by batch renders
+DEFAULT_PREFIX_CACHE_MB = 256
+
+# Partial composites (canvases of a composition's bottom layers) keyed by size and the
+# z-sorted (path, mtime, opacity, blend mode) of those layers; see compose_with_prefix_cache
+_prefix_cache = LRUCache(DEFAULT_PREFIX_CACHE_MB * 1024 * 1024, sizeof=image_nbytes)
+
+# Memoized GIF frame counts and per-frame durations keyed by (path, mtime)
+_gif_info_cache = {}
+
+# Directory of normalized layers (see derived_layers); None decodes layer files on every cache miss
+_derived_layer_dir = None
+
+
+def configure_layer_cache(max_mb):
+    """Set the memory ceiling of the prepared-layer cache in megabytes"""
+    _prepared_layer_cache.set_max_bytes(int(max_mb * 1024 * 1024))
+
+
+def get_layer_cache_stats():
+    """Get hit/miss counters and memory usage of the prepared-layer cache"""
+    return _prepared_layer_cache.stats()
+
+
+def clear_layer_cache():
+    """Drop all cached prepared layers and GIF frame info"""
+    _prepared_layer_cache.clear()
+    _gif_info_cache.clear()
+
+
+def configure_derived_layers(directory):
+    """
+    Set the directory of normalized layers, or None to always decode the layer files
+    Layers prepared on a cache miss are read back from their memory-mapped arrays there, and
+    layers decoded from their files are written there for the next process that needs them.
+    """
+    global _derived_layer_dir
+    _derived_layer_dir = directory
+
+
+def configure_prefix_cache(max_mb):
+    """Set the memory ceiling of the shared-prefix composite cache in megabytes"""
+    _prefix_cache.set_max_bytes(int(max_mb * 1024 * 1024))
+
+
+def clear_prefix_cache():
+    """Drop all cached partial composites"""
+    _prefix_cache.clear()
+
+
+def _file_cache_key(file_path):
+    return os.path.abspath(file_path), os.path.getmtime(file_path)
+
+
+class PreparedLayer:
+    """
+    A decoded, resized layer cropped to its non-transparent bounding box
+    box is (left, top, right, bottom) on the full-size canvas, or None (and image None)
+    when the layer is fully transparent and can be skipped
+    """
+
+    __slots__ = ('image', 'box', 'size')
+
+    def __init__(self, image):
+        self.size = image.size
+        self.box = image.getchannel('A').getbbox()
+        if self.box is None:
+            self.image = None
+        elif self.box == (0, 0) + image.size:
+            self.image = image
+        else:
+            self.image = image.crop(self.box)
+
+    @classmethod
+    def from_crop(cls, image, box, size):
+        """A layer of size x size whose content is image at box (image and box None if it is empty)"""
+        layer = cls.__new__(cls)
+        layer.image = image
+        layer.box = box
+        layer.size = (size, size)
+        return layer
+
+    @property
+    def offset(self):
+        return self.box[:2]
+
+    @property
+    def nbytes(self):
+        return image_nbytes(self.image)
+
+    def to_image(self):
+        """Get the layer as a full-size RGBA image"""
+        if self.image is not None and self.image.size == self.size:
+            return self.image
+        image = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        if self.image is not None:
+            image.paste(self.image, self.offset)
+        return image
+
+
+def blend_prepared_layer(canvas, layer, layer_config):
+    """Blend a PreparedLayer into a BlendCanvas over just its bounding box"""
+    if layer.image is not None:
+        canvas.blend(layer.image, layer_config.get('blend_mode', 'normal'), layer_config.get('opacity', 1.0),
+                     layer.offset)
+
+
+class RenderCancelled(Exception):
+    """Raised from inside a render when its cancel_check reports cancellation"""
+
+
+def _check_cancelled(cancel_check):
+    if cancel_check is not None and cancel_check():
+        raise RenderCancelled()
+
+
+def compose_layers(layer_composition, cancel_check=None, size=DEFAULT_OUTPUT_SIZE, max_loop_ms=DEFAULT_MAX_LOOP_MS):
     """
     Compose multiple layers into a single image or GIF based on z-index order
-    All images are resized to 2000x2000px to ensure compatibility
+    All images are resized to fit a size x size canvas (see DEFAULT_RENDER_PROFILES)
+    cancel_check is polled between layers and frames; RenderCancelled is raised when it returns True
+    max_loop_ms caps the loop length of animations (see AnimationTimeline)
     """
     if not layer_composition:
         # Return transparent canvas if no layers
-        return Image.new('RGBA', (2000, 2000), (0, 0, 0, 0))
+        return Image.new('RGBA', (size, size), (0, 0, 0, 0))
 
     # Check if any layer is a GIF
     gif_layers = [layer for layer in layer_composition if layer['file_path'].lower().endswith('.gif')]
 
     if gif_layers:
-        frames, durations = compose_gif_layers(layer_composition, gif_layers)
+        frames, durations = compose_gif_layers(layer_composition, gif_layers, cancel_check, size, max_loop_ms)
         return frames, durations
     else:
-        return compose_static_layers(layer_composition)
+        return compose_static_layers(layer_composition, cancel_check, size)
 
 
-def compose_static_layers(layer_composition):
+def compose_static_layers(layer_composition, cancel_check=None, size=DEFAULT_OUTPUT_SIZE):
     """Compose static PNG layers"""
     # Sort by z-index (lowest first)
     sorted_layers = sorted(layer_composition, key=lambda x: x['z_index'])
 
     # Start with transparent canvas
-    canvas = Image.new('RGBA', (2000, 2000), (0, 0, 0, 0))
+    canvas = BlendCanvas((size, size))
 
-    # Composite all layers
+    # Composite all layers in place
     for layer_config in sorted_layers:
-        layer_image = load_and_prepare_layer(layer_config)
-        canvas = apply_blend_mode(canvas, layer_image, layer_config)
+        _check_cancelled(cancel_check)
+        blend_prepared_layer(canvas, load_and_prepare_layer(layer_config, size), layer_config)
 
-    return canvas
+    return canvas.to_image()
 
 
-def compose_gif_layers(layer_composition, gif_layers):
+def composition_trie_path(layer_composition):
     """
-    Compose layers where at least one is a GIF
-    All output frames will be GIFs with the same number of frames as the longest GIF
+    The z-sorted (file path, opacity, blend mode) of a composition's layers
+    Compositions whose paths share a prefix share the composite of those bottom layers
     """
-    # Find the maximum number of frames among all GIF layers
-    max_frames = 1
-    gif_data = {}
+    return tuple((layer['file_path'], layer.get('opacity', 1.0), layer.get('blend_mode', 'normal'))
+                 for layer in sorted(layer_composition, key=lambda x: x['z_index']))
+
 
-    for layer in gif_layers:
+def composition_palette_key(layer_composition):
+    """
+    Key under which GIF encodes of a composition share a palette (see gif_encoder.save_gif):
+    its trie path plus the mtime and size of each layer file, so a layer edited in place
+    gets a new palette
+    """
+    key = []
+    for file_path, opacity, blend_mode in composition_trie_path(layer_composition):
         try:
-            gif = Image.open(layer['file_path'])
-            frames = 0
-            while True:
-                frames += 1
-                try:
-                    gif.seek(frames)
-                except EOFError:
-                    break
-            max_frames = max(max_frames, frames)
-            gif_data[layer['file_path']] = frames
-        except Exception as e:
-            print(f"Error reading GIF {layer['file_path']}: {e}")
-            gif_data[layer['file_path']] = 1
+            stat = os.stat(file_path)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            version = None
+        key.append((file_path, version, opacity, blend_mode))
+    return tuple(key)
+
+
+def compose_with_prefix_cache(layer_composition, share_depth=0, cancel_check=None, size=DEFAULT_OUTPUT_SIZE,
+                              max_loop_ms=DEFAULT_MAX_LOOP_MS):
+    """
+    Compose like compose_layers, starting static compositions from the longest cached
+    composite of their bottom layers instead of a blank canvas
+    share_depth is how many bottom layers a composition rendered later shares with this one;
+    the composites of those prefixes are cached for it. Animated compositions are composed
+    from scratch. Returns (result, number of layers reused from the cache)
+    """
+    if not layer_composition or any(layer['file_path'].lower().endswith('.gif') for layer in layer_composition):
+        return compose_layers(layer_composition, cancel_check, size, max_loop_ms), 0
+
+    sorted_layers = sorted(layer_composition, key=lambda x: x['z_index'])
+    layer_keys = [(_file_cache_key(layer['file_path']), layer.get('opacity', 1.0), layer.get('blend_mode', 'normal'))
+                  for layer in sorted_layers]
+
+    def prefix_key(depth):
+        return (size,) + tuple(layer_keys[:depth])
+
+    # Resume from the deepest cached prefix; the full composition is never cached
+    canvas = None
+    start = 0
+    for depth in range(len(sorted_layers) - 1, 0, -1):
+        key = prefix_key(depth)
+        if key in _prefix_cache:
+            cached = _prefix_cache.get(key)
+            if cached is not None:
+                canvas = cached.copy()
+                start = depth
+                break
+    if canvas is None:
+        canvas = BlendCanvas((size, size))
+
+    for depth in range(start, len(sorted_layers)):
+        _check_cancelled(cancel_check)
+        layer_config = sorted_layers[depth]
+        blend_prepared_layer(canvas, load_and_prepare_layer(layer_config, size), layer_config)
+        if depth + 1 <= share_depth and depth + 1 < len(sorted_layers):
+            _prefix_cache.put(prefix_key(depth + 1), canvas.copy())
+
+    return canvas.to_image(), start
+
 
+def compose_gif_layers(layer_composition, gif_layers, cancel_check=None, size=DEFAULT_OUTPUT_SIZE,
+                       max_loop_ms=DEFAULT_MAX_LOOP_MS):
+    """
+    Compose layers where at least one is a GIF
+    Every GIF layer plays at its own frame durations; output frames follow the merged
+    timeline of all layers (see AnimationTimeline), each distinct combination of source
+    frames is composited once, and consecutive identical frames are merged
+    """
     # Sort all layers by z-index
     sorted_layers = sorted(layer_composition, key=lambda x: x['z_index'])
+    timeline = build_animation_timeline(sorted_layers, max_loop_ms, size)
 
-    # Create frames
+    rendered = {}  # frame indices -> composite
     frames = []
     durations = []
+    for frame_indices, duration in timeline.frames:
+        image = rendered.get(frame_indices)
+        if image is None:
+            _check_cancelled(cancel_check)
+
+            # Start with transparent canvas for this frame
+            canvas = BlendCanvas((size, size))
+            for layer_config, frame_index in zip(sorted_layers, frame_indices):
+                blend_prepared_layer(canvas, load_layer_frame(layer_config, frame_index, size), layer_config)
+            image = rendered[frame_indices] = canvas.to_image()
 
-    for frame_num in range(max_frames):
-        # Start with transparent canvas for this frame
-        canvas = Image.new('RGBA', (2000, 2000), (0, 0, 0, 0))
+        frames.append(image)
+        durations.append(duration)
 
-        for layer_config in sorted_layers:
-            layer_image = load_and_prepare_layer_for_frame(layer_config, frame_num, max_frames)
-            if layer_image:
-                canvas = apply_blend_mode(canvas, layer_image, layer_config)
+    return merge_identical_frames(frames, durations)
 
-        frames.append(canvas)
-        # Use a default duration of 100ms for GIFs
-        durations.append(100)
 
-    return frames, durations
+def build_animation_timeline(sorted_layers, max_loop_ms=DEFAULT_MAX_LOOP_MS, size=None):
+    """
+    AnimationTimeline of z-sorted layers from their GIF frame durations (PNG layers are static)
+    Given the render size, GIF frames are loaded first: loading them (from the normalized
+    layers when available) records their durations, so the GIF files aren't read just for those.
+    """
+    durations = []
+    for layer in sorted_layers:
+        if not layer['file_path'].lower().endswith('.gif'):
+            durations.append(None)
+            continue
+        if size is not None:
+            load_gif_frames(layer, size)
+        durations.append(get_gif_frame_durations(layer['file_path']))
+    return AnimationTimeline(durations, max_loop_ms)
 
 
-def load_and_prepare_layer_for_frame(layer_config, frame_num, max_frames):
-    """Load appropriate frame for GIF layers, or static image for PNG layers"""
-    file_path = layer_config['file_path']
+def composition_nbytes(result):
+    """Approximate in-memory size of a compose_layers result (image, or (frames, durations))"""
+    if isinstance(result, tuple):
+        return image_nbytes(result[0])
+    return image_nbytes(result)
+
+
+# Posters are written for every animated edition; fast compression keeps them cheap
+POSTER_COMPRESS_LEVEL = 1
+
+
+def save_composition(result, path_base, animation_format=DEFAULT_ANIMATION_FORMAT, gif_preset=DEFAULT_GIF_PRESET,
+                     palette_key=None):
+    """
+    Save a compose_layers result next to path_base (no extension)
+    Static results are written as PNG. Animated ones are written in animation_format (see
+    animation_encoders; GIFs use the gif_preset encoder preset and palette_key to share
+    palettes), plus their first frame as a static PNG poster (see get_poster_path).
+    Returns the written image or animation path
+    """
+    if isinstance(result, tuple):  # Animated result (frames, durations)
+        frames, durations = result
+        output_path = save_animation(frames, durations, path_base, animation_format,
+                                     gif_preset=gif_preset, palette_key=palette_key)
+        frames[0].save(path_base + '.png', 'PNG', compress_level=POSTER_COMPRESS_LEVEL)
+    else:  # Static image
+        output_path = path_base + '.png'
+        result.save(output_path, 'PNG')
+    return output_path
+
+
+def get_poster_path(output_path):
+    """Static image of a saved composition: the PNG itself, or the poster next to an animation"""
+    return os.path.splitext(output_path)[0] + '.png'
 
-    if file_path.lower().endswith('.gif'):
-        return load_gif_frame(layer_config, frame_num, max_frames)
-    else:
-        return load_and_prepare_layer(layer_config)
 
+def find_composition_file(path_base):
+    """Path of the composition saved next to path_base, preferring an animation over a poster, or None"""
+    for extension in get_animation_extensions() + ('.png',):
+        if os.path.exists(path_base + extension):
+            return path_base + extension
+    return None
 
-def load_gif_frame(layer_config, frame_num, max_frames):
-    """Load specific frame from GIF, handling looping for shorter GIFs"""
+
+def is_animation_path(file_path):
+    """Whether a saved composition path is an animation (as opposed to a PNG image)"""
+    return file_path.lower().endswith(get_animation_extensions())
+
+
+def get_thumbnail_path(image_path, thumbnail_dir, size):
+    """
+    Cached thumbnail of a saved image at size x size, created if missing, or None if the
+    image can't be read. Thumbnails are keyed by the image's path, mtime and the size, so a
+    re-rendered edition gets a fresh one; safe to call from several threads at once.
+    """
     try:
-        gif = Image.open(layer_config['file_path'])
-
-        # Get total frames in this GIF
-        total_frames = 0
-        while True:
-            total_frames += 1
-            try:
-                gif.seek(total_frames)
-            except EOFError:
-                break
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+
+    key = hashlib.sha1(f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{size}".encode()).hexdigest()
+    thumbnail_path = os.path.join(thumbnail_dir, key + '.png')
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+
+    try:
+        with Image.open(image_path) as image:
+            # reducing_gap lets the decoder shrink in integer steps before the final resample
+            image.thumbnail((size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+            thumbnail = image.convert('RGBA')
+    except Exception as e:
+        print(f"Error creating thumbnail for {image_path}: {e}")
+        return None
 
-        # Calculate which frame to use (loop if necessary)
-        frame_to_use = frame_num % total_frames
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    temp_path = f"{thumbnail_path}.{threading.get_ident()}.tmp"
+    thumbnail.save(temp_path, format='PNG', compress_level=POSTER_COMPRESS_LEVEL)
+    os.replace(temp_path, thumbnail_path)
+    return thumbnail_path
 
-        # Seek to the appropriate frame
-        gif.seek(frame_to_use)
-        frame = gif.convert('RGBA')
 
-        # Resize to 2000x2000
-        frame = resize_image_to_2000x2000(frame)
+def load_layer_frame(layer_config, frame_index, size=DEFAULT_OUTPUT_SIZE):
+    """Load frame frame_index of a GIF layer, or the static image when frame_index is None"""
+    if frame_index is None:
+        return load_and_prepare_layer(layer_config, size)
 
-        # Apply opacity
-        opacity = layer_config.get('opacity', 1.0)
-        if opacity < 1.0:
-            alpha = frame.split()[3]
-            alpha = alpha.point(lambda p: p * opacity)
-            frame.putalpha(alpha)
+    frames = load_gif_frames(layer_config, size)
+    return frames[frame_index % len(frames)]
 
-        return frame
 
+def load_gif_frames(layer_config, size=DEFAULT_OUTPUT_SIZE):
+    """
+    Load all frames of a GIF layer as PreparedLayers, resized to fit size x size (opacity is
+    applied when compositing). Frame sequences are decoded once per size and cached, so
+    returned frames must not be modified in place
+    """
+    file_path = layer_config['file_path']
+    try:
+        cache_key = _file_cache_key(file_path) + (size, 'frames')
+        return _prepared_layer_cache.get_or_create(cache_key, lambda: _prepare_gif_frames(file_path, size))
     except Exception as e:
-        print(f"Error loading GIF frame {layer_config['file_path']}: {e}")
-        return Image.new('RGBA', (2000, 2000), (0, 0, 0, 0))
+        print(f"Error loading GIF frames {file_path}: {e}")
+        return [PreparedLayer(Image.new('RGBA', (size, size), (0, 0, 0, 0)))]
+
+
+def _prepare_gif_frames(file_path, size):
+    """Map the normalized frames of a GIF, or decode and resize every frame once (uncached)"""
+    derived = _read_derived_layer(file_path, size, animated=True)
+    if derived is not None:
+        frames, durations = derived
+    else:
+        frames = []
+        durations = []
+        with Image.open(file_path) as gif:
+            for frame in ImageSequence.Iterator(gif):
+                durations.append(frame.info.get('duration', 100))
+                frames.append(PreparedLayer(resize_image_to_fit(frame.convert('RGBA'), size)))
+        _write_derived_layer(file_path, size, frames, durations, animated=True)
+
+    # Decoding the full sequence gives the frame info for free
+    _gif_info_cache[_file_cache_key(file_path)] = {'frame_count': len(frames), 'durations': durations}
+    return frames
 
 
-def load_and_prepare_layer(layer_config):
-    """Load layer image, resize to 2000x2000, and apply opacity"""
+def load_and_prepare_layer(layer_config, size=DEFAULT_OUTPUT_SIZE):
+    """
+    Load layer image, resize to fit size x size and crop it to its bounding box (see PreparedLayer)
+    Opacity is applied when compositing. Prepared layers are cached, so the returned layer's
+    image must not be modified in place
+    """
+    file_path = layer_config['file_path']
     try:
-        image = Image.open(layer_config['file_path']).convert('RGBA')
+        cache_key = _file_cache_key(file_path) + (size,)
+        return _prepared_layer_cache.get_or_create(cache_key, lambda: _prepare_layer(file_path, size))
+    except Exception as e:
+        print(f"Error loading layer {file_path}: {e}")
+        # Return transparent layer as fallback
+        return PreparedLayer(Image.new('RGBA', (size, size), (0, 0, 0, 0)))
 
-        # Resize image to 2000x2000 while maintaining aspect ratio
-        image = resize_image_to_2000x2000(image)
 
-        # Apply opacity
-        opacity = layer_config.get('opacity', 1.0)
-        if opacity < 1.0:
-            # Create new image with adjusted alpha
-            alpha = image.split()[3]
-            alpha = alpha.point(lambda p: p * opacity)
-            image.putalpha(alpha)
+def _prepare_layer(file_path, size):
+    """Map the normalized layer, or decode, resize and crop the layer file (uncached)"""
+    derived = _read_derived_layer(file_path, size)
+    if derived is not None:
+        return derived[0][0]
 
-        return image
+    with Image.open(file_path) as source:
+        image = source.convert('RGBA')
+
+    # Resize image to size x size while maintaining aspect ratio
+    layer = PreparedLayer(resize_image_to_fit(image, size))
+    _write_derived_layer(file_path, size, [layer])
+    return layer
+
+
+def _read_derived_layer(file_path, size, animated=False):
+    """(PreparedLayers, GIF durations) of a normalized layer, or None if it must be decoded"""
+    if _derived_layer_dir is None:
+        return None
+    derived = read_derived_layer(_derived_layer_dir, file_path, size, animated)
+    if derived is None:
+        return None
+    frames, durations = derived
+    return [PreparedLayer.from_crop(image, box, size) for image, box in frames], durations
+
+
+def _write_derived_layer(file_path, size, layers, durations=None, animated=False):
+    if _derived_layer_dir is None:
+        return
+    try:
+        write_derived_layer(_derived_layer_dir, file_path, size, [(layer.image, layer.box) for layer in layers],
+                            durations, animated)
+    except Exception as e:
+        # Renders carry on from the decoded layer; only the next process's head start is lost
+        print(f"Error writing normalized layer for {file_path}: {e}")
+
+
+def normalize_layer(file_path, size=DEFAULT_OUTPUT_SIZE):
+    """
+    Write the normalized (resized, cropped, raw RGBA) form of a layer file for size x size
+    renders unless it is already there, without keeping it in this process's cache. GIFs
+    get both their frame sequence and their static image.
+    Returns True if the layer has normalized files afterwards.
+    """
+    if _derived_layer_dir is None:
+        return False
+    try:
+        if not has_derived_layer(_derived_layer_dir, file_path, size):
+            _prepare_layer(file_path, size)
+        if not file_path.lower().endswith('.gif'):
+            return has_derived_layer(_derived_layer_dir, file_path, size)
+        if not has_derived_layer(_derived_layer_dir, file_path, size, animated=True):
+            _prepare_gif_frames(file_path, size)
+        return (has_derived_layer(_derived_layer_dir, file_path, size)
+                and has_derived_layer(_derived_layer_dir, file_path, size, animated=True))
     except Exception as e:
-        print(f"Error loading layer {layer_config['file_path']}: {e}")
-        # Return transparent image as fallback
-        return Image.new('RGBA', (2000, 2000), (0, 0, 0, 0))
+        print(f"Error normalizing layer {file_path}: {e}")
+        return False
 
 
-def resize_image_to_2000x2000(image):
+def resize_image_to_fit(image, size=DEFAULT_OUTPUT_SIZE):
     """
-    Resize image to fit within 2000x2000 while maintaining aspect ratio
+    Resize image to fit within size x size while maintaining aspect ratio
     and centering the image on a transparent background
     """
-    if image.size == (2000, 2000):
+    if image.size == (size, size):
         return image
 
-    # Calculate the scaling factor to fit within 2000x2000
+    # Calculate the scaling factor to fit within size x size
     original_width, original_height = image.size
-    scale_x = 2000 / original_width
-    scale_y = 2000 / original_height
+    scale_x = size / original_width
+    scale_y = size / original_height
     scale = min(scale_x, scale_y)  # Use the smaller scale to fit within bounds
 
     # Calculate new dimensions
-    new_width = int(original_width * scale)
-    new_height = int(original_height * scale)
+    new_width = max(1, int(original_width * scale))
+    new_height = max(1, int(original_height * scale))
 
     # Resize the image
     resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-    # Create a new 2000x2000 transparent canvas
-    canvas = Image.new('RGBA', (2000, 2000), (0, 0, 0, 0))
+    # Create a new size x size transparent canvas
+    canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
 
     # Calculate position to center the image
-    x_offset = (2000 - new_width) // 2
-    y_offset = (2000 - new_height) // 2
+    x_offset = (size - new_width) // 2
+    y_offset = (size - new_height) // 2
 
     # Paste the resized image onto the canvas
     canvas.paste(resized_image, (x_offset, y_offset), resized_image)
@@ -191,85 +534,51 @@ def resize_image_to_2000x2000(image):
 
 
 def apply_blend_mode(background, foreground, layer_config):
-    """Apply blend mode to combine layers"""
-    blend_mode = layer_config.get('blend_mode', 'normal')
-
-    if blend_mode == 'normal':
-        return Image.alpha_composite(background, foreground)
-    elif blend_mode == 'multiply':
-        return multiply_blend(background, foreground)
-    elif blend_mode == 'screen':
-        return screen_blend(background, foreground)
-    elif blend_mode == 'overlay':
-        return overlay_blend(background, foreground)
-    else:
-        # Default to normal composite
-        return Image.alpha_composite(background, foreground)
-
-
-def multiply_blend(background, foreground):
-    """Multiply blend mode"""
-    # Ensure both images are the same size
-    if background.size != foreground.size:
-        foreground = foreground.resize(background.size, Image.Resampling.LANCZOS)
-    return ImageChops.multiply(background, foreground)
-
-
-def screen_blend(background, foreground):
-    """Screen blend mode"""
-    # Ensure both images are the same size
-    if background.size != foreground.size:
-        foreground = foreground.resize(background.size, Image.Resampling.LANCZOS)
-    return ImageChops.screen(background, foreground)
-
-
-def overlay_blend(background, foreground):
-    """Overlay blend mode (simplified implementation)"""
-    # Ensure both images are the same size
+    """
+    Apply blend mode to combine layers (see blend_engine.BLEND_MODES for the supported modes)
+    Compositions blend into one BlendCanvas instead; this is for combining two images
+    """
     if background.size != foreground.size:
         foreground = foreground.resize(background.size, Image.Resampling.LANCZOS)
-
-    # This is a simplified overlay - for production use a proper implementation
-    # Convert to RGB for blending, then back to RGBA
-    bg_rgb = background.convert('RGB')
-    fg_rgb = foreground.convert('RGB')
-
-    # Simple overlay using Image.blend
-    blended_rgb = Image.blend(bg_rgb, fg_rgb, 0.5)
-
-    # Convert back to RGBA and preserve alpha from foreground
-    alpha = foreground.split()[3]
-    blended_rgba = blended_rgb.convert('RGBA')
-    blended_data = blended_rgba.getdata()
-    alpha_data = alpha.getdata()
-
-    # Combine RGB from blended image with alpha from foreground
-    final_data = [
-        (r, g, b, a)
-        for (r, g, b, _), a in zip(blended_data, alpha_data)
-    ]
-
-    result = Image.new('RGBA', background.size)
-    result.putdata(final_data)
-
-    return result
+    canvas = BlendCanvas(background.size)
+    canvas.blend(background)
+    blend_prepared_layer(canvas, PreparedLayer(foreground.convert('RGBA')), layer_config)
+    return canvas.to_image()
+
+
+def get_gif_info(file_path):
+    """Get frame count and per-frame durations (ms) of a GIF file, memoized by path and mtime"""
+    cache_key = _file_cache_key(file_path)
+    info = _gif_info_cache.get(cache_key)
+    if info is None:
+        durations = []
+        with Image.open(file_path) as gif:
+            for frame in ImageSequence.Iterator(gif):
+                durations.append(frame.info.get('duration', 100))
+        info = {'frame_count': len(durations), 'durations': durations}
+        _gif_info_cache[cache_key] = info
+    return info
 
 
 def get_gif_frame_count(file_path):
     """Get number of frames in a GIF file"""
     try:
         if file_path.lower().endswith('.gif'):
-            gif = Image.open(file_path)
-            frame_count = 0
-            while True:
-                frame_count += 1
-                try:
-                    gif.seek(frame_count)
-                except EOFError:
-                    break
-            return frame_count
+            return get_gif_info(file_path)['frame_count']
         else:
             return 1
     except Exception as e:
         print(f"Error getting GIF frame count for {file_path}: {e}")
-        return 1
\ No newline at end of file
+        return 1
+
+
+def get_gif_frame_durations(file_path):
+    """Get per-frame durations in milliseconds of a GIF file"""
+    try:
+        if file_path.lower().endswith('.gif'):
+            return list(get_gif_info(file_path)['durations'])
+        else:
+            return [100]
+    except Exception as e:
+        print(f"Error getting GIF frame durations for {file_path}: {e}")
+        return [100]
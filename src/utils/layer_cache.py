@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+
+
+def image_nbytes(image):
+    """Approximate in-memory size of a PIL image, a sequence of frames, or an object with nbytes"""
+    if image is None:
+        return 0
+    if isinstance(image, (list, tuple)):
+        return sum(image_nbytes(frame) for frame in image)
+    nbytes = getattr(image, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by total entry size.
+    Entries are evicted oldest-first once the sum of their sizes exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes, sizeof=image_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return cached value for key (marking it most recently used) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Insert value, evicting least recently used entries to stay within budget"""
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+
+            # Values larger than the whole budget are never cached
+            if size > self.max_bytes:
+                return value
+
+            self._entries[key] = (value, size)
+            self._current_bytes += size
+            self._evict()
+        return value
+
+    def get_or_create(self, key, factory):
+        """Return cached value for key, building and caching it with factory() on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, factory())
+        return value
+
+    def set_max_bytes(self, max_bytes):
+        """Change the memory ceiling, evicting entries if the cache is now over budget"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self):
+        """Get hit/miss counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'current_bytes': self._current_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def _evict(self):
+        while self._current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._current_bytes -= size
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries